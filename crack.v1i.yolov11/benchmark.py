@@ -0,0 +1,267 @@
+# benchmark.py – edge-side benchmarks that never touch the production endpoint
+# Subcommands:
+#  • upload : issues/minute through uploader.Uploader against stub_server.py with a
+#             simulated cellular uplink; compares the old one-connection-per-request
+#             client with the pooled session at several --workers settings.
+#  • pipeline : replays test/images through inference.process_folder, or a
+#             synthetic panning camera through process_camera, posting to the stub;
+#             reports inferred frames/sec (camera mode also lists captured, gated
+#             and dropped frames) and p50/p95/p99 per stage
+#             (decode, predict, stitch, encode, upload).
+#  • tiles  : whole-frame vs tiled inference (tiling.py) on labelled test images,
+#             optionally upscaled to camera resolution; reports frames/sec and
+#             recall@IoU0.5 against the YOLO labels.
+# Examples:
+#   python benchmark.py upload --issues 40 --rtt_ms 400 --handshake_ms 600 --uplink_kbps 384
+#   python benchmark.py pipeline --batch 8
+#   python benchmark.py pipeline --camera_frames 300 -- --diff_threshold 2
+#   python benchmark.py tiles --scale 3 --tiles 640 960 --overlap 0.2
+
+import argparse
+import glob
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from stub_server import StubServer
+from uploader import Uploader
+
+
+def _print_table(headers, rows):
+    widths = [max(len(str(h)), *(len(str(r[i])) for r in rows)) for i, h in enumerate(headers)]
+    print(" | ".join(str(h).ljust(w) for h, w in zip(headers, widths)))
+    print("-+-".join("-"*w for w in widths))
+    for r in rows:
+        print(" | ".join(str(c).ljust(w) for c, w in zip(r, widths)))
+
+# -----------------------------------------------------------
+# upload
+# -----------------------------------------------------------
+
+def _one_issue(up: Uploader, jpg: bytes, i: int) -> bool:
+    key = f"issue_bench_{i:05d}"
+    return up.deliver(key, f"{key}.jpg", {"id": key, "length": 0, "width": 0}, jpg=jpg)
+
+
+def bench_upload(args):
+    if args.image:
+        with open(args.image, "rb") as f:
+            jpg = f.read()
+    else:
+        jpg = os.urandom(args.jpg_kb*1024)
+    modes = [("per-request", 1, False, False)] + [("pooled", w, True, False) for w in args.workers]
+    modes += [("ingest", w, True, True) for w in args.workers if args.ingest]
+    rows = []
+    for label, workers, pooled, ingest in modes:
+        stub = StubServer(rtt_ms=args.rtt_ms, handshake_ms=args.handshake_ms,
+                          uplink_kbps=args.uplink_kbps, error_rate=args.error_rate).start()
+        up = Uploader(stub.url, workers=workers, pooled=pooled, ingest=ingest)
+        t0 = time.time()
+        futs = [up.submit(_one_issue, up, jpg, i) for i in range(args.issues)]
+        up.close(wait=True)
+        dt = time.time()-t0
+        ok = sum(1 for f in futs if f.result())
+        rows.append((label, workers, f"{ok}/{args.issues}", f"{dt:.1f}", f"{ok*60/dt:.1f}",
+                     stub.counters.get("connections", 0),
+                     sum(stub.counters.get(k, 0) for k in ("presigned", "ingest", "metadata"))))
+        stub.stop()
+    print(f"\n[BENCH] upload  rtt={args.rtt_ms}ms handshake={args.handshake_ms}ms "
+          f"uplink={args.uplink_kbps or '∞'}kbps errors={args.error_rate:.0%}")
+    _print_table(["client", "workers", "issues ok", "seconds", "issues/min", "TCP conns", "API calls"], rows)
+
+# -----------------------------------------------------------
+# pipeline
+# -----------------------------------------------------------
+
+class SyntheticCamera:
+    """cv2.VideoCapture stand-in: pans across dataset images so consecutive
+    frames overlap like a camera on a moving vehicle; closes after n frames."""
+    def __init__(self, paths, n_frames: int, hold: int = 6, step: int = 40):
+        import cv2
+        self._imgs = [cv2.imread(p) for p in paths]
+        self._imgs = [im for im in self._imgs if im is not None]
+        self.n_frames, self.hold, self.step = n_frames, hold, step
+        self.served = 0
+
+    def isOpened(self) -> bool:
+        return self.served < self.n_frames
+
+    def read(self):
+        if not self.isOpened():
+            return False, None
+        i, k = divmod(self.served, self.hold)
+        self.served += 1
+        return True, np.roll(self._imgs[i % len(self._imgs)], -k*self.step, axis=1)
+
+    def release(self):
+        self.n_frames = self.served
+
+
+def bench_pipeline(args):
+    from ultralytics import YOLO
+    import inference
+    from export import resolve_weights
+    from pipeline import STAGES
+
+    stub = StubServer(rtt_ms=args.rtt_ms, handshake_ms=args.handshake_ms,
+                      uplink_kbps=args.uplink_kbps, error_rate=args.error_rate).start()
+    out = tempfile.mkdtemp(prefix="bench_")
+    mode = (["--camera"]+[f"synthetic{i}" for i in range(args.cameras)]) if args.camera_frames else ["--source", args.source]
+    ns = inference.build_parser().parse_args(
+        mode+["--weights", args.weights, "--api_url", stub.url, "--output", out, "--outbox", "off", "--pred_cache", "off",
+              "--no_save_local", "--fps", "0", "--stats_every", "0", "--batch", str(args.batch)]
+        + [a for a in args.extra if a != "--"])
+    model = YOLO(resolve_weights(ns.weights, ns.backend, ns.int8, ns.imgsz), task="detect")
+    model.predict(source=np.zeros((ns.imgsz, ns.imgsz, 3), dtype=np.uint8), verbose=False)  # warm-up
+    uploader = Uploader(stub.url, workers=ns.upload_workers, ingest=ns.ingest)
+    STAGES.reset()
+    t0 = time.time()
+    try:
+        if args.camera_frames:
+            paths = sorted(glob.glob(os.path.join(args.source, "*.jpg")))
+            cams = [SyntheticCamera(paths[i::args.cameras], args.camera_frames) for i in range(args.cameras)]
+            counts = inference.process_camera(cams, model, ns, uploader)
+            frames = counts.get("inferred", 0)
+        else:
+            inference.process_folder(ns.source, model, ns, uploader)
+            frames = STAGES.summary().get("decode", {}).get("n", 0)
+            counts = {"inferred": frames}
+        uploader.close(wait=True)
+    finally:
+        stub.stop()
+        shutil.rmtree(out, ignore_errors=True)
+    dt = time.time()-t0
+    summary = STAGES.summary()
+    src = f"{args.cameras} synthetic camera(s)" if args.camera_frames else args.source
+    print(f"\n[BENCH] pipeline {src}: {frames} frames inferred in {dt:.1f}s → {frames/dt:.2f} inferred frames/s "
+          f"({summary.get('predict', {}).get('n', 0)} predict calls, batch={ns.batch}, backend={ns.backend})")
+    if args.camera_frames:
+        print(f"[BENCH] frames: captured={counts.get('captured', 0)} gated={counts.get('gated', 0)} "
+              f"dropped={counts.get('dropped', 0)} inferred={frames}")
+    print(f"[BENCH] stub: {stub.counters}")
+    rows = [(k, s["n"], f"{s['mean']:.1f}", f"{s['p50']:.1f}", f"{s['p95']:.1f}", f"{s['p99']:.1f}")
+            for k in ("decode", "predict", "stitch", "encode", "upload") if (s := summary.get(k))]
+    _print_table(["stage", "n", "mean ms", "p50 ms", "p95 ms", "p99 ms"], rows)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"frames": frames, "seconds": dt, "fps": frames/dt, "counts": counts, "stages": summary,
+                       "stub": stub.counters}, f, indent=2)
+
+# -----------------------------------------------------------
+# tiles
+# -----------------------------------------------------------
+
+def _labels(img_path: str, w: int, h: int) -> np.ndarray:
+    """YOLO txt labels (cx cy w h, normalised) → xyxy pixels."""
+    lbl = os.path.join(os.path.dirname(os.path.dirname(img_path)), "labels",
+                       os.path.splitext(os.path.basename(img_path))[0]+".txt")
+    if not os.path.exists(lbl):
+        return np.zeros((0, 4), dtype=np.float32)
+    rows = np.loadtxt(lbl, ndmin=2, usecols=(1, 2, 3, 4)).reshape(-1, 4)
+    cx, cy, bw, bh = rows.T*[[w], [h], [w], [h]]
+    return np.stack([cx-bw/2, cy-bh/2, cx+bw/2, cy+bh/2], 1).astype(np.float32)
+
+
+def _recall(gts, dets, iou: float = 0.5) -> float:
+    from tracker import iou_matrix
+    hit = total = 0
+    for gt, (boxes, _, _) in zip(gts, dets):
+        total += len(gt)
+        if len(gt) and boxes:
+            hit += int((iou_matrix(gt, np.asarray(boxes, dtype=np.float32)).max(1) >= iou).sum())
+    return hit/total if total else 0.0
+
+
+def bench_tiles(args):
+    import cv2
+    from ultralytics import YOLO
+    import inference
+    from export import resolve_weights
+
+    paths = sorted(glob.glob(os.path.join(args.source, "*.jpg")))[:args.n_images]
+    frames = [cv2.imread(p) for p in paths]
+    if args.scale != 1:
+        frames = [cv2.resize(f, None, fx=args.scale, fy=args.scale, interpolation=cv2.INTER_CUBIC) for f in frames]
+    gts = [_labels(p, f.shape[1], f.shape[0]) for p, f in zip(paths, frames)]
+    base = ["--source", args.source, "--weights", args.weights, "--conf", str(args.conf), "--grouping", "threshold"]
+    model = None
+    variants = [("whole frame", [])] + [
+        (f"tile {t} ov {args.overlap}{' +full' if args.full else ''} {args.merge}",
+         ["--tile", str(t), "--tile_overlap", str(args.overlap), "--tile_batch", str(args.tile_batch),
+          "--tile_merge", args.merge] + (["--tile_full"] if args.full else []))
+        for t in args.tiles]
+    rows = []
+    for label, extra in variants:
+        ns = inference.build_parser().parse_args(base+extra)
+        if model is None:
+            model = YOLO(resolve_weights(ns.weights, ns.backend, ns.int8, ns.imgsz), task="detect")
+            model.predict(source=frames[0], verbose=False)  # warm-up
+        detect = inference.make_detector(model, ns)
+        dets, t0 = [], time.time()
+        for i in range(0, len(frames), args.batch):
+            dets += detect(frames[i:i+args.batch])[0]
+        dt = time.time()-t0
+        rows.append((label, len(frames), f"{dt:.1f}", f"{len(frames)/dt:.2f}",
+                     sum(len(d[0]) for d in dets), f"{_recall(gts, dets):.3f}"))
+    h, w = frames[0].shape[:2]
+    print(f"\n[BENCH] tiles  {len(frames)} frames {w}×{h} (scale {args.scale}), conf={args.conf}")
+    _print_table(["mode", "frames", "seconds", "frames/s", "boxes", "recall@0.5"], rows)
+
+# -----------------------------------------------------------
+# Entrypoint
+# -----------------------------------------------------------
+
+def main():
+    ap = argparse.ArgumentParser("Edge pipeline benchmarks")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    up = sub.add_parser("upload", help="issues/minute over a simulated uplink")
+    up.add_argument("--issues", type=int, default=30)
+    up.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    up.add_argument("--image", help="JPG to upload (default: random bytes of --jpg_kb)")
+    up.add_argument("--jpg_kb", type=int, default=80)
+    up.add_argument("--rtt_ms", type=float, default=300)
+    up.add_argument("--handshake_ms", type=float, default=450)
+    up.add_argument("--uplink_kbps", type=float, default=512)
+    up.add_argument("--error_rate", type=float, default=0.0)
+    up.add_argument("--ingest", action="store_true", help="also run the Lambda ingest mode (presigned POST to S3)")
+    up.set_defaults(fn=bench_upload)
+
+    pipe = sub.add_parser("pipeline", help="frames/sec + per-stage latency percentiles")
+    pipe.add_argument("--source", default="test/images")
+    pipe.add_argument("--camera_frames", type=int, default=0, help="use a synthetic camera for N frames instead of folder mode")
+    pipe.add_argument("--cameras", type=int, default=1, help="synthetic cameras served by the shared model")
+    pipe.add_argument("--weights", default="runs/crack_detector/weights/best.pt")
+    pipe.add_argument("--batch", type=int, default=1)
+    pipe.add_argument("--rtt_ms", type=float, default=0)
+    pipe.add_argument("--handshake_ms", type=float, default=0)
+    pipe.add_argument("--uplink_kbps", type=float, default=0)
+    pipe.add_argument("--error_rate", type=float, default=0.0)
+    pipe.add_argument("--json", help="also write the report as JSON")
+    pipe.add_argument("extra", nargs=argparse.REMAINDER, help="after --: extra inference.py flags")
+    pipe.set_defaults(fn=bench_pipeline)
+
+    tl = sub.add_parser("tiles", help="whole-frame vs tiled inference: frames/sec + recall")
+    tl.add_argument("--source", default="test/images", help="images; labels are read from ../labels")
+    tl.add_argument("--n_images", type=int, default=100)
+    tl.add_argument("--scale", type=float, default=3.0, help="upscale factor to emulate camera resolution")
+    tl.add_argument("--weights", default="runs/crack_detector/weights/best.pt")
+    tl.add_argument("--conf", type=float, default=0.25)
+    tl.add_argument("--tiles", type=int, nargs="+", default=[640, 960])
+    tl.add_argument("--overlap", type=float, default=0.2)
+    tl.add_argument("--tile_batch", type=int, default=8)
+    tl.add_argument("--full", action="store_true", help="add the whole-frame pass to tiled runs")
+    tl.add_argument("--merge", choices=("nmm", "nms"), default="nmm")
+    tl.add_argument("--batch", type=int, default=1, help="frames per detector call")
+    tl.set_defaults(fn=bench_tiles)
+
+    args = ap.parse_args()
+    args.fn(args)
+
+
+if __name__ == "__main__":
+    main()
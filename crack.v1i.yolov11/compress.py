@@ -0,0 +1,218 @@
+# compress.py – distil + prune the trained detector into a smaller edge model
+# One command runs the whole pipeline:
+#  1. distil : train --student (yolo11n.pt) on data.yaml with the trained
+#              --teacher (runs/crack_detector best.pt) as soft target – BCE on the
+#              class logits and temperature-KL on the DFL box distributions,
+#              box term weighted by teacher confidence – added to the YOLO loss
+#  2. prune  : structured channel pruning of the distilled student with
+#              torch-pruning (L2 group magnitude, --prune_ratio, channels rounded
+#              to 8). C2f/C3k2 blocks are first rewritten as C2fSplit
+#              (pruned_blocks.py) so their two halves prune independently; the
+#              Detect head and C2PSA attention are left intact.
+#  3. finetune: train the pruned network itself (not rebuilt from YAML) for
+#              --finetune_epochs, still distilling from the teacher
+#  4. report : params, GFLOPs, CPU latency, mAP50/mAP50-95 on valid/ and deltas
+#              vs the teacher → runs/compress/report.csv
+# The final best.pt loads with YOLO() like any checkpoint, so inference.py
+# --weights / --backend onnx|openvino (export.py) use it as-is; it pickles
+# pruned_blocks.C2fSplit, which both of them import.
+# Usage:
+#   pip install torch-pruning
+#   python compress.py --student yolo11n.pt --prune_ratio 0.3
+
+import argparse
+import copy
+import csv
+import glob
+import os
+
+import cv2
+import torch
+import torch.nn.functional as F
+from torch import nn
+from ultralytics import YOLO
+from ultralytics.nn.modules import C2PSA, Detect
+from ultralytics.utils.torch_utils import get_flops
+
+from dataset_cache import MemmapTrainer, MemmapValidator
+from export import DEFAULT_WEIGHTS, _latency_ms
+from pruned_blocks import split_c2f
+
+DATA_YAML = "data.yaml"
+PROJECT   = "runs/compress"
+REG_MAX   = 16  # DFL bins per box side in YOLO11 heads
+
+# -----------------------------------------------------------
+# Distillation
+# -----------------------------------------------------------
+
+def _head(preds):
+    """(box DFL logits (B, 4*reg_max, A), class logits (B, nc, A)) from train- or eval-mode output."""
+    if isinstance(preds, tuple):
+        preds = preds[1]
+    if isinstance(preds, dict):
+        return preds["boxes"], preds["scores"]
+    x = torch.cat([p.view(p.shape[0], p.shape[1], -1) for p in preds], 2)  # older list-of-maps heads
+    return x[:, :4*REG_MAX], x[:, 4*REG_MAX:]
+
+
+class DistillLoss:
+    """YOLO criterion + teacher soft targets. Added to the summed loss only, so
+    the logged box/cls/dfl items stay comparable with plain training."""
+
+    def __init__(self, base, teacher: nn.Module, cls_w: float = 1.0, box_w: float = 1.0, temp: float = 2.0):
+        self.base, self.teacher = base, teacher
+        self.cls_w, self.box_w, self.temp = cls_w, box_w, temp
+
+    def __call__(self, preds, batch):
+        loss, items = self.base(preds, batch)
+        s_box, s_cls = _head(preds)
+        with torch.no_grad():
+            t_box, t_cls = _head(self.teacher(batch["img"]))
+        t_prob = t_cls.float().sigmoid()
+        kd_cls = F.binary_cross_entropy_with_logits(s_cls.float(), t_prob)
+        b, _, a = s_box.shape
+        T = self.temp
+        s_dfl = (s_box.float()/T).view(b, 4, -1, a).log_softmax(2)
+        t_dfl = (t_box.float()/T).view(b, 4, -1, a).softmax(2)
+        w = t_prob.max(1).values  # (B, A): distil boxes where the teacher sees something
+        kl = (t_dfl*(t_dfl.clamp_min(1e-9).log()-s_dfl)).sum(2).mean(1)
+        kd_box = (kl*w).sum()/w.sum().clamp_min(1.0)*T*T
+        kd = (self.cls_w*kd_cls+self.box_w*kd_box)*b
+        return loss+kd/loss.numel(), items
+
+
+def _kd_callback(teacher_weights: str, args):
+    def attach(trainer):
+        teacher = YOLO(teacher_weights).model.to(trainer.device).float().eval()
+        for p in teacher.parameters():
+            p.requires_grad_(False)
+        model = trainer.model.module if hasattr(trainer.model, "module") else trainer.model
+        nt, ns = teacher.model[-1].nc, model.model[-1].nc
+        if nt != ns:
+            raise SystemExit(f"[COMPRESS] teacher has {nt} classes, student {ns}: train both on {args.data}")
+        model.criterion = DistillLoss(model.init_criterion(), teacher, args.kd_cls, args.kd_box, args.kd_temp)
+        print(f"[COMPRESS] distilling from {teacher_weights} (cls={args.kd_cls}, box={args.kd_box}, T={args.kd_temp})")
+    return attach
+
+
+def _train(yolo: YOLO, name: str, epochs: int, args, trainer=MemmapTrainer) -> str:
+    if args.teacher:
+        yolo.add_callback("on_train_start", _kd_callback(args.teacher, args))
+    yolo.train(trainer=trainer, data=args.data, epochs=epochs, imgsz=args.imgsz, batch=args.batch,
+               device=args.device, workers=args.workers, project=PROJECT, name=name, exist_ok=True, plots=False)
+    return str(yolo.trainer.best)
+
+# -----------------------------------------------------------
+# Structured pruning
+# -----------------------------------------------------------
+
+def prune(weights: str, ratio: float, imgsz: int) -> nn.Module:
+    try:
+        import torch_pruning as tp
+    except ImportError as e:
+        raise SystemExit("[COMPRESS] structured pruning needs torch-pruning: pip install torch-pruning") from e
+    model = split_c2f(copy.deepcopy(YOLO(weights).model).float().cpu().eval())
+    for p in model.parameters():
+        p.requires_grad_(True)
+    ignored = [m for m in model.modules() if isinstance(m, (Detect, C2PSA))]
+    pruner = tp.pruner.BasePruner(model, torch.randn(1, 3, imgsz, imgsz),
+                                  importance=tp.importance.GroupMagnitudeImportance(p=2),
+                                  pruning_ratio=ratio, ignored_layers=ignored, round_to=8,
+                                  output_transform=lambda out: out[0] if isinstance(out, (tuple, list)) else out)
+    before = sum(p.numel() for p in model.parameters())
+    pruner.step()
+    after = sum(p.numel() for p in model.parameters())
+    print(f"[COMPRESS] pruned {weights}: {before/1e6:.2f}M → {after/1e6:.2f}M params (ratio {ratio})")
+    return model
+
+
+def _pruned_trainer(model: nn.Module):
+    class PrunedTrainer(MemmapTrainer):
+        """Fine-tunes *model* itself; the default get_model() would rebuild the
+        unpruned architecture from YAML and drop the pruned weights."""
+        def get_model(self, cfg=None, weights=None, verbose=True):
+            for p in model.parameters():
+                p.requires_grad_(True)
+            return model
+    return PrunedTrainer
+
+# -----------------------------------------------------------
+# Report
+# -----------------------------------------------------------
+
+def _stats(label: str, yolo: YOLO, images, args) -> dict:
+    model = yolo.model
+    mean_ms, p95_ms = _latency_ms(yolo, images, args.imgsz)
+    m = yolo.val(data=args.data, split="val", imgsz=args.imgsz, batch=16, device="cpu", workers=args.workers,
+                 plots=False, verbose=False, validator=MemmapValidator)
+    return {"stage": label, "params_M": round(sum(p.numel() for p in model.parameters())/1e6, 3),
+            "GFLOPs": round(get_flops(model, args.imgsz), 2), "latency_ms": round(mean_ms, 1),
+            "latency_p95_ms": round(p95_ms, 1), "mAP50": round(float(m.box.map50), 4),
+            "mAP50-95": round(float(m.box.map), 4)}
+
+
+def report(stages, args):
+    images = [cv2.imread(p) for p in sorted(glob.glob(os.path.join(args.images, "*.jpg")))[:args.n_images]]
+    rows = [_stats(label, yolo, images, args) for label, yolo in stages]
+    base = rows[0]
+    for r in rows:
+        r["dparams_%"] = round(100*(r["params_M"]/base["params_M"]-1), 1)
+        r["speedup"] = round(base["latency_ms"]/r["latency_ms"], 2)
+        r["dmAP50"] = round(r["mAP50"]-base["mAP50"], 4)
+        r["dmAP50-95"] = round(r["mAP50-95"]-base["mAP50-95"], 4)
+    cols = list(rows[0])
+    print("| " + " | ".join(cols) + " |")
+    print("|" + "---|"*len(cols))
+    for r in rows:
+        print("| " + " | ".join(str(r[c]) for c in cols) + " |")
+    out = os.path.join(PROJECT, "report.csv")
+    os.makedirs(PROJECT, exist_ok=True)
+    with open(out, "w", newline="") as f:
+        w = csv.DictWriter(f, fieldnames=cols)
+        w.writeheader()
+        w.writerows(rows)
+    print(f"[COMPRESS] report saved to {out}")
+
+# -----------------------------------------------------------
+# Entrypoint
+# -----------------------------------------------------------
+
+def main():
+    ap = argparse.ArgumentParser("Distil + prune the crack detector for the edge")
+    ap.add_argument("--teacher", default=DEFAULT_WEIGHTS, help="trained weights to distil from ('' = no distillation)")
+    ap.add_argument("--student", default="yolo11n.pt")
+    ap.add_argument("--data", default=DATA_YAML)
+    ap.add_argument("--imgsz", type=int, default=640)
+    ap.add_argument("--batch", type=int, default=16)
+    ap.add_argument("--device", default="0", help='"0" or "cpu"')
+    ap.add_argument("--workers", type=int, default=min(8, os.cpu_count() or 1))
+    ap.add_argument("--distill_epochs", type=int, default=100)
+    ap.add_argument("--finetune_epochs", type=int, default=50)
+    ap.add_argument("--prune_ratio", type=float, default=0.3, help="fraction of channels removed per prunable group")
+    ap.add_argument("--kd_cls", type=float, default=1.0, help="weight of the class-logit distillation term")
+    ap.add_argument("--kd_box", type=float, default=1.0, help="weight of the DFL box distillation term")
+    ap.add_argument("--kd_temp", type=float, default=2.0, help="softmax temperature for the box distributions")
+    ap.add_argument("--skip_distill", action="store_true", help="prune --student as given")
+    ap.add_argument("--images", default="valid/images", help="frames for the latency runs")
+    ap.add_argument("--n_images", type=int, default=50)
+    args = ap.parse_args()
+    if not torch.cuda.is_available():
+        args.device = "cpu"
+
+    student = args.student if args.skip_distill else _train(YOLO(args.student), "distill", args.distill_epochs, args)
+    pruned = prune(student, args.prune_ratio, args.imgsz)
+    pruned_yolo = YOLO(student)
+    pruned_yolo.model = copy.deepcopy(pruned)
+    tuned = YOLO(student)
+    tuned.model = pruned
+    final = _train(tuned, "finetune", args.finetune_epochs, args, trainer=_pruned_trainer(pruned))
+    print(f"[COMPRESS] final model: {final}  (python inference.py --weights {final} --backend openvino)")
+
+    stages = [("teacher", YOLO(args.teacher))] if args.teacher else []
+    stages += [("student", YOLO(student)), ("pruned", pruned_yolo), ("finetuned", YOLO(final))]
+    report(stages, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+# dataset_cache.py – preprocessed, memory-mapped image store for train.py / evaluation
+# ultralytics decodes and resizes every JPG on each epoch. This module does it
+# once per split:
+#  • images.u8  : raw uint8 memmap (N, S, S, 3), each image resized long side → S
+#                 (same rule as YOLODataset.load_image) and zero-padded
+#  • labels.f32 : all YOLO label rows (cls cx cy w h), sliced per image via the index
+#  • index.json : files, original / resized hw, label offsets and a fingerprint
+#                 of (name, size, mtime) of every image and label file
+# The fingerprint is recomputed on open, so adding, editing or deleting a file
+# in train/ valid/ test/ rebuilds the store on the next run. Stores live in
+# <split>/../.memmap/<split>_<S>/ and are built by a thread pool.
+# MemmapYOLODataset / MemmapTrainer / MemmapValidator read images from the store,
+# everything else (labels cache, augmentation) stays ultralytics'.
+# Usage:
+#   python dataset_cache.py build --imgsz 640
+#   python dataset_cache.py bench --workers 0 2 4 8   → loader images/sec, JPG vs memmap
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+VERSION   = 1
+IMG_EXTS  = (".jpg", ".jpeg", ".png", ".bmp")
+DATA_YAML = "data.yaml"
+
+# -----------------------------------------------------------
+# Store
+# -----------------------------------------------------------
+
+def _label_path(img_path: str) -> str:
+    d, name = os.path.split(img_path)
+    return os.path.join(os.path.dirname(d), "labels", os.path.splitext(name)[0]+".txt")
+
+
+def _fingerprint(files, imgsz: int) -> str:
+    h = hashlib.sha1(f"v{VERSION}:{imgsz}".encode())
+    for f in files:
+        for p in (f, _label_path(f)):
+            try:
+                st = os.stat(p)
+                h.update(f"{os.path.basename(p)}:{st.st_size}:{st.st_mtime_ns};".encode())
+            except OSError:
+                h.update(f"{os.path.basename(p)}:-;".encode())
+    return h.hexdigest()
+
+
+def _resize(im: np.ndarray, imgsz: int) -> np.ndarray:
+    h0, w0 = im.shape[:2]
+    r = imgsz/max(h0, w0)
+    if r != 1:
+        w, h = min(int(np.ceil(w0*r)), imgsz), min(int(np.ceil(h0*r)), imgsz)
+        im = cv2.resize(im, (w, h), interpolation=cv2.INTER_LINEAR)
+    return im
+
+
+def _read_labels(img_path: str) -> np.ndarray:
+    p = _label_path(img_path)
+    if not os.path.exists(p) or not os.path.getsize(p):
+        return np.zeros((0, 5), dtype=np.float32)
+    # polygon rows are reduced to cls + first four values, like a bbox-only reader
+    rows = [list(map(float, ln.split()[:5])) for ln in open(p) if len(ln.split()) >= 5]
+    return np.asarray(rows, dtype=np.float32).reshape(-1, 5)
+
+
+class MemmapStore:
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "index.json")) as f:
+            self.index = json.load(f)
+        self.imgsz = self.index["imgsz"]
+        self.files = self.index["files"]
+        self._pos = {os.path.basename(f): i for i, f in enumerate(self.files)}
+        self._images = self._labels = None  # opened lazily, so DataLoader workers map their own view
+
+    def __getstate__(self):
+        return {**self.__dict__, "_images": None, "_labels": None}
+
+    def __len__(self):
+        return len(self.files)
+
+    def _open(self):
+        n, s = len(self.files), self.imgsz
+        self._images = np.memmap(os.path.join(self.path, "images.u8"), dtype=np.uint8, mode="r", shape=(n, s, s, 3))
+        self._labels = np.fromfile(os.path.join(self.path, "labels.f32"), dtype=np.float32).reshape(-1, 5)
+
+    def find(self, img_path: str):
+        return self._pos.get(os.path.basename(img_path))
+
+    def image(self, i: int):
+        """(resized image view, original hw, resized hw)."""
+        if self._images is None:
+            self._open()
+        h0, w0 = self.index["hw0"][i]
+        h, w = self.index["hw"][i]
+        return self._images[i, :h, :w], (h0, w0), (h, w)
+
+    def labels(self, i: int) -> np.ndarray:
+        if self._labels is None:
+            self._open()
+        a, b = self.index["label_offsets"][i:i+2]
+        return self._labels[a:b]
+
+
+def store_path(img_dir: str, imgsz: int) -> str:
+    img_dir = os.path.normpath(img_dir)
+    split_dir = os.path.dirname(img_dir) if os.path.basename(img_dir) == "images" else img_dir
+    return os.path.join(os.path.dirname(split_dir), ".memmap", f"{os.path.basename(split_dir)}_{imgsz}")
+
+
+def _list_images(img_dir: str):
+    return sorted(p for p in glob.glob(os.path.join(img_dir, "*")) if p.lower().endswith(IMG_EXTS))
+
+
+def build(img_dir: str, imgsz: int = 640, workers: int = os.cpu_count() or 4) -> MemmapStore:
+    files = _list_images(img_dir)
+    if not files:
+        raise FileNotFoundError(f"no images in {img_dir}")
+    out = store_path(img_dir, imgsz)
+    tmp = f"{out}.tmp{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    t0 = time.time()
+    images = np.memmap(os.path.join(tmp, "images.u8"), dtype=np.uint8, mode="w+",
+                       shape=(len(files), imgsz, imgsz, 3))
+    hw0, hw = [None]*len(files), [None]*len(files)
+
+    def load(i):
+        im = cv2.imread(files[i])
+        if im is None:
+            raise FileNotFoundError(f"cannot decode {files[i]}")
+        r = _resize(im, imgsz)
+        images[i, :r.shape[0], :r.shape[1]] = r
+        hw0[i], hw[i] = im.shape[:2], r.shape[:2]
+        return _read_labels(files[i])
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        labels = list(pool.map(load, range(len(files))))
+    images.flush()
+    del images
+    np.concatenate(labels or [np.zeros((0, 5), np.float32)]).astype(np.float32).tofile(os.path.join(tmp, "labels.f32"))
+    offsets = np.concatenate([[0], np.cumsum([len(l) for l in labels])]).tolist()
+    with open(os.path.join(tmp, "index.json"), "w") as f:
+        json.dump({"version": VERSION, "imgsz": imgsz, "fingerprint": _fingerprint(files, imgsz),
+                   "source": os.path.abspath(img_dir), "files": [os.path.basename(p) for p in files],
+                   "hw0": hw0, "hw": hw, "label_offsets": offsets}, f)
+    shutil.rmtree(out, ignore_errors=True)
+    os.replace(tmp, out)
+    size = os.path.getsize(os.path.join(out, "images.u8"))
+    print(f"[CACHE] {img_dir} → {out}: {len(files)} images, {size/2**30:.2f} GiB in {time.time()-t0:.1f}s")
+    return MemmapStore(out)
+
+
+def ensure(img_dir: str, imgsz: int = 640, workers: int = os.cpu_count() or 4) -> MemmapStore:
+    """Open the store for *img_dir*, (re)building it if missing or stale."""
+    path = store_path(img_dir, imgsz)
+    try:
+        store = MemmapStore(path)
+        if store.index.get("fingerprint") == _fingerprint(_list_images(img_dir), imgsz):
+            return store
+        print(f"[CACHE] {img_dir} changed since {path} was built → rebuilding")
+    except (OSError, ValueError, KeyError):
+        pass
+    return build(img_dir, imgsz, workers)
+
+# -----------------------------------------------------------
+# ultralytics integration
+# -----------------------------------------------------------
+
+def _img_dir(img_path) -> str:
+    p = img_path[0] if isinstance(img_path, (list, tuple)) else img_path
+    return p if os.path.isdir(p) else os.path.dirname(p)
+
+
+def _with_store(dataset, imgsz: int):
+    """Turn a built YOLODataset into a MemmapYOLODataset reading from its store."""
+    dataset.__class__ = MemmapYOLODataset
+    dataset.store = ensure(_img_dir(dataset.img_path), imgsz)
+    return dataset
+
+
+try:
+    from ultralytics.data.dataset import YOLODataset
+    from ultralytics.models.yolo.detect import DetectionTrainer, DetectionValidator
+
+    class MemmapYOLODataset(YOLODataset):
+        """YOLODataset whose load_image() serves the long-side-resize path from
+        the memmap store; other modes and unknown files fall back to JPG."""
+
+        def load_image(self, i, rect_mode=True, resize_short=False):
+            j = self.store.find(self.im_files[i]) if rect_mode and not resize_short else None
+            if j is None or self.store.imgsz != self.imgsz:
+                return super().load_image(i, rect_mode, resize_short)
+            im, hw0, hw = self.store.image(j)
+            if self.augment:  # Mosaic / MixUp sample partner images from this buffer
+                self.buffer.append(i)
+                if 1 < len(self.buffer) >= self.max_buffer_length:
+                    self.buffer.pop(0)
+            return np.array(im), hw0, hw  # copy: augmentations write in place, the map is read-only
+
+    class MemmapValidator(DetectionValidator):
+        def build_dataset(self, img_path, mode="val", batch=None):
+            return _with_store(super().build_dataset(img_path, mode, batch), self.args.imgsz)
+
+    class MemmapTrainer(DetectionTrainer):
+        def build_dataset(self, img_path, mode="train", batch=None):
+            return _with_store(super().build_dataset(img_path, mode, batch), self.args.imgsz)
+
+        def get_validator(self):
+            v = super().get_validator()
+            v.__class__ = MemmapValidator
+            return v
+except ImportError:  # preprocessing / `build` works without ultralytics
+    MemmapYOLODataset = MemmapTrainer = MemmapValidator = None
+
+# -----------------------------------------------------------
+# Loader benchmark
+# -----------------------------------------------------------
+
+def bench(args):
+    from ultralytics.cfg import get_cfg
+    from ultralytics.data import build_dataloader, build_yolo_dataset
+    from ultralytics.data.utils import check_det_dataset
+
+    data = check_det_dataset(args.data)
+    cfg = get_cfg(overrides={"data": args.data, "imgsz": args.imgsz, "task": "detect", "mode": "train"})
+    rows = []
+    for source in ("jpg", "memmap"):
+        for workers in args.workers:
+            ds = build_yolo_dataset(cfg, data[args.split], args.batch, data, mode="train" if args.augment else "val")
+            if source == "memmap":
+                ds = _with_store(ds, args.imgsz)
+            loader = build_dataloader(ds, args.batch, workers, shuffle=True)
+            it = iter(loader)
+            next(it)  # worker start-up + first batch
+            n, t0 = 0, time.time()
+            for _ in range(args.batches):
+                try:
+                    n += len(next(it)["img"])
+                except StopIteration:
+                    break
+            dt = time.time()-t0
+            rows.append({"source": source, "workers": workers, "images": n,
+                         "seconds": round(dt, 2), "images_per_s": round(n/dt, 1)})
+            del it, loader
+    cols = list(rows[0])
+    print(f"\n[CACHE] loader benchmark split={args.split} imgsz={args.imgsz} batch={args.batch} "
+          f"augment={args.augment} cpus={os.cpu_count()}")
+    print("| " + " | ".join(cols) + " |")
+    print("|" + "---|"*len(cols))
+    for r in rows:
+        print("| " + " | ".join(str(r[c]) for c in cols) + " |")
+
+# -----------------------------------------------------------
+# Entrypoint
+# -----------------------------------------------------------
+
+def main():
+    ap = argparse.ArgumentParser("Memory-mapped dataset cache")
+    ap.add_argument("--imgsz", type=int, default=640)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    bd = sub.add_parser("build", help="(re)build stores for the given image folders")
+    bd.add_argument("dirs", nargs="*", default=["train/images", "valid/images", "test/images"])
+    bd.add_argument("--force", action="store_true", help="rebuild even if the fingerprint matches")
+    bd.add_argument("--threads", type=int, default=os.cpu_count() or 4)
+
+    bn = sub.add_parser("bench", help="DataLoader images/sec, JPG decode vs memmap store")
+    bn.add_argument("--data", default=DATA_YAML)
+    bn.add_argument("--split", default="train", choices=("train", "val", "test"))
+    bn.add_argument("--workers", type=int, nargs="+", default=[0, 2, 4, 8])
+    bn.add_argument("--batch", type=int, default=16)
+    bn.add_argument("--batches", type=int, default=30)
+    bn.add_argument("--augment", action="store_true", help="training augmentation (mosaic etc.) in the loop")
+
+    args = ap.parse_args()
+    if args.cmd == "build":
+        for d in args.dirs:
+            (build if args.force else ensure)(d, args.imgsz, args.threads)
+    else:
+        bench(args)
+
+
+if __name__ == "__main__":
+    main()
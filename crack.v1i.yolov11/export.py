@@ -0,0 +1,197 @@
+# export.py – CPU inference backends for the edge box (ICAM-540 has no CUDA)
+# Backends:
+#  • torch    : the trained .pt weights as-is
+#  • onnx     : ONNX Runtime, dynamic batch; --int8 = onnxruntime static QDQ
+#               quantization calibrated on valid/images
+#  • openvino : OpenVINO IR; --int8 = NNCF post-training quantization calibrated
+#               on the data.yaml val split (valid/images)
+# Exported artifacts sit next to the weights and are reused on later runs;
+# inference.py --backend resolves them via resolve_weights().
+# Usage:
+#   python export.py export  --backend openvino --int8
+#   python export.py compare --backends torch onnx openvino --int8
+#     → table of CPU latency and mAP, saved to runs/crack_detector/backends.csv
+
+import argparse
+import csv
+import glob
+import os
+import time
+
+import cv2
+import numpy as np
+from ultralytics import YOLO
+
+import pruned_blocks  # noqa: F401 – C2fSplit, unpickled from compress.py checkpoints
+
+DEFAULT_WEIGHTS = "runs/crack_detector/weights/best.pt"
+DATA_YAML       = "data.yaml"
+CALIB_DIR       = "valid/images"
+BACKENDS        = ("torch", "onnx", "openvino")
+
+
+def artifact_path(weights: str, backend: str, int8: bool = False) -> str:
+    stem = os.path.splitext(weights)[0]
+    if backend == "torch":
+        return weights
+    if backend == "onnx":
+        return f"{stem}.int8.onnx" if int8 else f"{stem}.onnx"
+    if backend == "openvino":
+        return f"{stem}_int8_openvino_model" if int8 else f"{stem}_openvino_model"
+    raise ValueError(f"unknown backend {backend!r} (choose from {BACKENDS})")
+
+# -----------------------------------------------------------
+# ONNX INT8 calibration
+# -----------------------------------------------------------
+
+def _letterbox(img: np.ndarray, size: int) -> np.ndarray:
+    h, w = img.shape[:2]
+    r = min(size/h, size/w)
+    nh, nw = int(round(h*r)), int(round(w*r))
+    out = np.full((size, size, 3), 114, dtype=np.uint8)
+    top, left = (size-nh)//2, (size-nw)//2
+    out[top:top+nh, left:left+nw] = cv2.resize(img, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    return out
+
+
+def _quantize_onnx(fp32: str, int8: str, imgsz: int, calib_dir: str, n_calib: int):
+    import onnx
+    from onnxruntime.quantization import (CalibrationDataReader, CalibrationMethod, QuantFormat,
+                                          QuantType, quantize_static)
+
+    paths = sorted(glob.glob(os.path.join(calib_dir, "*.jpg")))[:n_calib]
+    if not paths:
+        raise FileNotFoundError(f"no calibration images in {calib_dir}")
+    input_name = onnx.load(fp32, load_external_data=False).graph.input[0].name
+
+    class _Reader(CalibrationDataReader):
+        def __init__(self):
+            self._it = iter(paths)
+
+        def get_next(self):
+            p = next(self._it, None)
+            if p is None:
+                return None
+            im = _letterbox(cv2.imread(p), imgsz)[:, :, ::-1].transpose(2, 0, 1)  # BGR→RGB, HWC→CHW
+            return {input_name: np.ascontiguousarray(im[None], dtype=np.float32)/255.0}
+
+    print(f"[EXPORT] INT8 calibrating ONNX on {len(paths)} images from {calib_dir}")
+    quantize_static(fp32, int8, _Reader(), quant_format=QuantFormat.QDQ, per_channel=True,
+                    activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8,
+                    calibrate_method=CalibrationMethod.MinMax)
+    # keep the ultralytics metadata (names, stride, imgsz) so YOLO() can load the INT8 file
+    src, dst = onnx.load(fp32), onnx.load(int8)
+    del dst.metadata_props[:]
+    dst.metadata_props.extend(src.metadata_props)
+    onnx.save(dst, int8)
+
+# -----------------------------------------------------------
+# Export / resolve
+# -----------------------------------------------------------
+
+def export(weights: str, backend: str, int8: bool = False, imgsz: int = 640,
+           data: str = DATA_YAML, calib_dir: str = CALIB_DIR, n_calib: int = 200) -> str:
+    if backend == "torch":
+        return weights
+    out = artifact_path(weights, backend, int8)
+    model = YOLO(weights)
+    t0 = time.time()
+    if backend == "onnx":
+        fp32 = model.export(format="onnx", imgsz=imgsz, dynamic=True, simplify=True)
+        if int8:
+            _quantize_onnx(fp32, out, imgsz, calib_dir, n_calib)
+        elif os.path.abspath(fp32) != os.path.abspath(out):
+            os.replace(fp32, out)
+    else:
+        path = model.export(format="openvino", imgsz=imgsz, dynamic=True, int8=int8, data=data)
+        if os.path.abspath(path) != os.path.abspath(out):
+            os.replace(path, out)
+    print(f"[EXPORT] {backend}{' int8' if int8 else ''} → {out} ({time.time()-t0:.0f}s)")
+    return out
+
+
+def resolve_weights(weights: str, backend: str, int8: bool = False, imgsz: int = 640) -> str:
+    """Path YOLO() should load for *backend*; exports on first use."""
+    path = artifact_path(weights, backend, int8)
+    return path if os.path.exists(path) else export(weights, backend, int8, imgsz)
+
+# -----------------------------------------------------------
+# Latency / accuracy comparison
+# -----------------------------------------------------------
+
+def _latency_ms(model: YOLO, images, imgsz: int, warmup: int = 5):
+    for im in images[:warmup]:
+        model.predict(source=im, imgsz=imgsz, device="cpu", verbose=False)
+    times = []
+    for im in images:
+        t0 = time.perf_counter()
+        model.predict(source=im, imgsz=imgsz, device="cpu", verbose=False)
+        times.append((time.perf_counter()-t0)*1000)
+    return float(np.mean(times)), float(np.percentile(times, 95))
+
+
+def compare(args):
+    images = [cv2.imread(p) for p in sorted(glob.glob(os.path.join(args.images, "*.jpg")))[:args.n_images]]
+    variants = [(b, False) for b in args.backends]
+    if args.int8:
+        variants += [(b, True) for b in args.backends if b != "torch"]
+    rows = []
+    for backend, int8 in variants:
+        path = resolve_weights(args.weights, backend, int8, args.imgsz)
+        model = YOLO(path, task="detect")
+        mean_ms, p95_ms = _latency_ms(model, images, args.imgsz)
+        m = model.val(data=args.data, split="val", imgsz=args.imgsz, batch=1, device="cpu", plots=False, verbose=False)
+        rows.append({"backend": backend, "precision": "int8" if int8 else "fp32", "artifact": path,
+                     "latency_ms": round(mean_ms, 1), "latency_p95_ms": round(p95_ms, 1),
+                     "fps": round(1000/mean_ms, 2), "mAP50": round(float(m.box.map50), 4),
+                     "mAP50-95": round(float(m.box.map), 4)})
+    base = rows[0]
+    for r in rows:
+        r["speedup"] = round(base["latency_ms"]/r["latency_ms"], 2)
+        r["dmAP50-95"] = round(r["mAP50-95"]-base["mAP50-95"], 4)
+    cols = ["backend", "precision", "latency_ms", "latency_p95_ms", "fps", "speedup", "mAP50", "mAP50-95", "dmAP50-95"]
+    print("| " + " | ".join(cols) + " |")
+    print("|" + "---|"*len(cols))
+    for r in rows:
+        print("| " + " | ".join(str(r[c]) for c in cols) + " |")
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w", newline="") as f:
+        w = csv.DictWriter(f, fieldnames=cols+["artifact"])
+        w.writeheader()
+        w.writerows(rows)
+    print(f"[EXPORT] comparison saved to {args.out}")
+
+# -----------------------------------------------------------
+# Entrypoint
+# -----------------------------------------------------------
+
+def main():
+    ap = argparse.ArgumentParser("Export / compare CPU inference backends")
+    ap.add_argument("--weights", default=DEFAULT_WEIGHTS)
+    ap.add_argument("--imgsz", type=int, default=640)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    ex = sub.add_parser("export", help="export one backend")
+    ex.add_argument("--backend", choices=BACKENDS, required=True)
+    ex.add_argument("--int8", action="store_true", help="post-training INT8 quantization")
+    ex.add_argument("--data", default=DATA_YAML)
+    ex.add_argument("--calib_dir", default=CALIB_DIR)
+    ex.add_argument("--n_calib", type=int, default=200)
+
+    cp = sub.add_parser("compare", help="latency + mAP table across backends")
+    cp.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    cp.add_argument("--int8", action="store_true", help="also compare INT8 variants")
+    cp.add_argument("--data", default=DATA_YAML)
+    cp.add_argument("--images", default="test/images", help="frames for the latency run")
+    cp.add_argument("--n_images", type=int, default=50)
+    cp.add_argument("--out", default="runs/crack_detector/backends.csv")
+
+    args = ap.parse_args()
+    if args.cmd == "export":
+        export(args.weights, args.backend, args.int8, args.imgsz, args.data, args.calib_dir, args.n_calib)
+    else:
+        compare(args)
+
+
+if __name__ == "__main__":
+    main()
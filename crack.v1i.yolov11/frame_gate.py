@@ -0,0 +1,44 @@
+# frame_gate.py – cheap pre-filter that skips YOLO on static / near-duplicate frames
+# Each frame is shrunk to a size×size grayscale thumbnail (INTER_AREA) and compared
+# with the thumbnail of the last frame that was actually sent to inference. If the
+# mean absolute difference (0-255 scale) is below the threshold the frame is
+# skipped. Comparing against the last *inferred* frame, not the previous one,
+# means slow drift still adds up and eventually triggers inference.
+
+import cv2
+import numpy as np
+
+
+class FrameGate:
+    def __init__(self, threshold: float, size: int = 64, max_skip: int = 0):
+        """threshold <= 0 disables gating; max_skip > 0 forces inference after
+        that many consecutive skipped frames."""
+        self.threshold = threshold
+        self.size = size
+        self.max_skip = max_skip
+        self._ref = None
+        self._run = 0
+        self.inferred = 0
+        self.skipped = 0
+
+    def _thumb(self, frame: np.ndarray) -> np.ndarray:
+        small = cv2.resize(frame, (self.size, self.size), interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+
+    def should_infer(self, frame: np.ndarray) -> bool:
+        if self.threshold <= 0:
+            self.inferred += 1
+            return True
+        thumb = self._thumb(frame)
+        if (self._ref is None or (self.max_skip and self._run >= self.max_skip)
+                or float(cv2.absdiff(thumb, self._ref).mean()) >= self.threshold):
+            self._ref, self._run = thumb, 0
+            self.inferred += 1
+            return True
+        self._run += 1
+        self.skipped += 1
+        return False
+
+    def __str__(self):
+        total = self.inferred+self.skipped
+        return f"gate: skipped={self.skipped}/{total} ({self.skipped/total if total else 0:.0%})"
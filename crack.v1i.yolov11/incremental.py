@@ -0,0 +1,284 @@
+# incremental.py – incremental fine-tuning from harvested field detections
+# my_results/ (uploaded sequences) and cropped_results/ (detection crops) are
+# real field images the Roboflow set never saw. Instead of 100 epochs from
+# yolo11s.pt on the whole corpus, each round only learns what is new:
+#  1. harvest : run the current checkpoint over --sources; images whose best
+#               detection is uncertain (--low ≤ conf < --high) are copied to
+#               <root>/review/images with the model's boxes as YOLO pre-labels
+#               in review/labels. Images are keyed by content hash, so a file
+#               is never harvested twice; predictions are cached by image +
+#               weights hash (predcache.py), so re-scans only run new files.
+#  2. review  : the operator fixes review/labels/*.txt with any YOLO labelling
+#               tool (an empty file = no crack). A label that differs from the
+#               pre-label counts as operator-corrected.
+#  3. train   : corrected items (+ untouched pre-labels with --accept_pseudo)
+#               form the delta set; it moves to <root>/pool and the model is
+#               fine-tuned from the last checkpoint for --epochs on
+#               delta + --replay × |delta| images sampled from train/ and
+#               earlier pools (against forgetting). Cost grows with the delta,
+#               not the corpus.
+#  4. promote : the round's best.pt replaces the current checkpoint only if its
+#               valid/ mAP50-95 drops by at most --max_drop.
+# State lives in <root>/manifest.json (items by hash, rounds, current checkpoint).
+# Usage:
+#   python incremental.py harvest
+#   python incremental.py train --epochs 5
+#   python incremental.py status
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import shutil
+import time
+
+import torch
+import yaml
+from ultralytics import YOLO
+from ultralytics.data.utils import check_det_dataset
+
+from dataset_cache import MemmapValidator
+from export import DEFAULT_WEIGHTS
+from predcache import PredictionCache, image_digest
+
+DATA_YAML = "data.yaml"
+ROOT      = "runs/incremental"
+IMG_EXTS  = (".jpg", ".jpeg", ".png", ".bmp")
+
+# -----------------------------------------------------------
+# Manifest
+# -----------------------------------------------------------
+
+def _manifest_path(root: str) -> str:
+    return os.path.join(root, "manifest.json")
+
+
+def load_manifest(root: str) -> dict:
+    try:
+        with open(_manifest_path(root)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"checkpoint": None, "items": {}, "rounds": []}
+
+
+def save_manifest(root: str, man: dict):
+    os.makedirs(root, exist_ok=True)
+    tmp = _manifest_path(root)+".tmp"
+    with open(tmp, "w") as f:
+        json.dump(man, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, _manifest_path(root))
+
+
+def _sha1(data: bytes) -> str:
+    return hashlib.sha1(data).hexdigest()
+
+
+def _checkpoint(man: dict, args) -> str:
+    return args.weights or man["checkpoint"] or DEFAULT_WEIGHTS
+
+# -----------------------------------------------------------
+# Harvest
+# -----------------------------------------------------------
+
+def _images(sources):
+    for src in sources:
+        for name in sorted(os.listdir(src)) if os.path.isdir(src) else []:
+            if name.lower().endswith(IMG_EXTS):
+                yield os.path.join(src, name)
+
+
+def _yolo_labels(result, min_conf: float) -> str:
+    b = result.boxes
+    return "".join(f"{int(c)} {x:.6f} {y:.6f} {w:.6f} {h:.6f}\n"
+                   for c, cf, (x, y, w, h) in zip(b.cls.tolist(), b.conf.tolist(), b.xywhn.tolist()) if cf >= min_conf)
+
+
+def harvest(args):
+    man = load_manifest(args.root)
+    ckpt = _checkpoint(man, args)
+    model = YOLO(ckpt)
+    cache = PredictionCache(os.path.join(args.root, "predict_cache.sqlite3"), ckpt, conf=args.low, imgsz=args.imgsz)
+    img_dir, lbl_dir = (os.path.join(args.root, "review", d) for d in ("images", "labels"))
+    os.makedirs(img_dir, exist_ok=True); os.makedirs(lbl_dir, exist_ok=True)
+    seen = new = 0
+    for path in _images(args.sources):
+        with open(path, "rb") as f:
+            data = f.read()
+        key = image_digest(data)
+        seen += 1
+        if key in man["items"]:
+            continue
+        hit = cache.get(key)
+        if hit is None:
+            r = model.predict(source=path, conf=args.low, imgsz=args.imgsz, device=args.device, verbose=False)[0]
+            hit = {"conf": r.boxes.conf.tolist(), "labels": _yolo_labels(r, args.low)}
+            cache.put_many([(key, hit)])
+        conf, pre = hit["conf"], hit["labels"]
+        if not conf or max(conf) >= args.high:
+            continue  # nothing there, or the model is already sure
+        ext = os.path.splitext(path)[1].lower()
+        with open(os.path.join(img_dir, key+ext), "wb") as f:
+            f.write(data)
+        with open(os.path.join(lbl_dir, key+".txt"), "w") as f:
+            f.write(pre)
+        man["items"][key] = {"source": path, "ext": ext, "status": "review", "max_conf": round(max(conf), 3),
+                             "prelabel_sha1": _sha1(pre.encode()), "harvested": time.strftime("%Y-%m-%d %H:%M:%S"),
+                             "checkpoint": ckpt}
+        new += 1
+    save_manifest(args.root, man)
+    cache.close()
+    pending = sum(1 for it in man["items"].values() if it["status"] == "review")
+    print(f"[HARVEST] {seen} images scanned with {ckpt}, {new} uncertain added → {img_dir} "
+          f"({pending} awaiting review), {cache}")
+
+# -----------------------------------------------------------
+# Train
+# -----------------------------------------------------------
+
+def _take_delta(man: dict, args):
+    """Move corrected (or, with --accept_pseudo, all) review items into the pool
+    and save the manifest before any training starts; returns every pool image
+    not trained on yet (incl. ones left by a skipped or failed round)."""
+    review, pool = os.path.join(args.root, "review"), os.path.join(args.root, "pool")
+    os.makedirs(os.path.join(pool, "images"), exist_ok=True); os.makedirs(os.path.join(pool, "labels"), exist_ok=True)
+    for key, it in man["items"].items():
+        if it["status"] != "review":
+            continue
+        lbl = os.path.join(review, "labels", key+".txt")
+        pooled = os.path.join(pool, "labels", key+".txt")
+        if not os.path.exists(lbl) and os.path.exists(pooled):
+            lbl = pooled  # moved by a run that died before saving the manifest
+        elif not os.path.exists(lbl):
+            continue  # operator deleted the label: leave it out
+        with open(lbl, "rb") as f:
+            corrected = _sha1(f.read()) != it["prelabel_sha1"]
+        if lbl != pooled:
+            if not corrected and not args.accept_pseudo:
+                continue
+            shutil.move(os.path.join(review, "images", key+it["ext"]), os.path.join(pool, "images", key+it["ext"]))
+            shutil.move(lbl, pooled)
+        it["status"], it["label"] = "pool", "operator" if corrected else "pseudo"
+    save_manifest(args.root, man)
+    return [os.path.abspath(os.path.join(pool, "images", k+it["ext"]))
+            for k, it in man["items"].items() if it["status"] == "pool" and "round" not in it]
+
+
+def _split_dirs(data: dict, split: str) -> list:
+    """Absolute image dirs of *split* from check_det_dataset() (str or list)."""
+    dirs = data[split]
+    return [str(d) for d in (dirs if isinstance(dirs, (list, tuple)) else [dirs])]
+
+
+def _replay(man: dict, delta, args):
+    base = _split_dirs(check_det_dataset(args.data), "train")
+    pool = [os.path.abspath(os.path.join(args.root, "pool", "images", k+it["ext"]))
+            for k, it in man["items"].items() if it["status"] == "pool"]
+    fresh = set(delta)
+    candidates = [os.path.abspath(p) for p in _images(base)]+[p for p in pool if p not in fresh]
+    n = min(len(candidates), math.ceil(args.replay*len(delta)))
+    return random.Random(len(man["rounds"])).sample(candidates, n)
+
+
+def _map(weights: str, args) -> float:
+    m = YOLO(weights).val(data=args.data, split="val", imgsz=args.imgsz, batch=16, device=args.device,
+                          workers=args.workers, plots=False, verbose=False, validator=MemmapValidator)
+    return float(m.box.map)
+
+
+def train(args):
+    man = load_manifest(args.root)
+    ckpt = _checkpoint(man, args)
+    delta = _take_delta(man, args)
+    if len(delta) < args.min_delta:
+        print(f"[ROUND] only {len(delta)} new labelled images (< --min_delta {args.min_delta}), kept for the next round")
+        return
+    replay = _replay(man, delta, args)
+    n = len(man["rounds"])+1
+    name = f"round_{n:03d}"
+    rdir = os.path.abspath(os.path.join(args.root, name))
+    os.makedirs(rdir, exist_ok=True)
+    with open(os.path.join(rdir, "train.txt"), "w") as f:
+        f.write("\n".join(delta+replay)+"\n")
+    # Roboflow-style ../train/images paths only resolve through ultralytics' own lookup
+    with open(args.data) as f:
+        data = yaml.safe_load(f)
+    data.update(train=os.path.join(rdir, "train.txt"), val=_split_dirs(check_det_dataset(args.data), "val"))
+    data.pop("test", None)
+    data.pop("path", None)
+    data_yaml = os.path.join(rdir, "data.yaml")
+    with open(data_yaml, "w") as f:
+        yaml.safe_dump(data, f, allow_unicode=True)
+
+    print(f"[ROUND] {name}: {len(delta)} delta + {len(replay)} replay images, {args.epochs} epochs from {ckpt}")
+    t0 = time.time()
+    model = YOLO(ckpt)
+    model.train(data=data_yaml, epochs=args.epochs, imgsz=args.imgsz, batch=args.batch, device=args.device,
+                workers=args.workers, lr0=args.lr0, warmup_epochs=0, project=os.path.abspath(args.root), name=name,
+                exist_ok=True, plots=False)
+    best = str(model.trainer.best)
+    minutes = (time.time()-t0)/60
+
+    before, after = _map(ckpt, args), _map(best, args)
+    promoted = after >= before-args.max_drop
+    if promoted:
+        man["checkpoint"] = best
+    man["rounds"].append({"round": n, "base": ckpt, "weights": best, "delta": len(delta), "replay": len(replay),
+                          "epochs": args.epochs, "minutes": round(minutes, 1), "mAP50-95_before": round(before, 4),
+                          "mAP50-95_after": round(after, 4), "promoted": promoted,
+                          "finished": time.strftime("%Y-%m-%d %H:%M:%S")})
+    for p in delta:
+        man["items"][os.path.splitext(os.path.basename(p))[0]]["round"] = n
+    save_manifest(args.root, man)
+    print(f"[ROUND] {name} took {minutes:.1f} min, mAP50-95 {before:.4f} → {after:.4f}: "
+          f"{'promoted ' + best if promoted else 'kept ' + ckpt}")
+
+
+def status(args):
+    man = load_manifest(args.root)
+    by = {}
+    for it in man["items"].values():
+        by[it["status"]] = by.get(it["status"], 0)+1
+    print(f"[STATUS] checkpoint: {_checkpoint(man, args)}  items: {by or 'none'}")
+    for r in man["rounds"]:
+        print(f"  round {r['round']}: {r['delta']}+{r['replay']} imgs, {r['minutes']} min, "
+              f"mAP50-95 {r['mAP50-95_before']} → {r['mAP50-95_after']} {'✅' if r['promoted'] else '❌'}")
+
+# -----------------------------------------------------------
+# Entrypoint
+# -----------------------------------------------------------
+
+def main():
+    ap = argparse.ArgumentParser("Incremental fine-tuning from field detections")
+    ap.add_argument("--root", default=ROOT, help="review queue, pool, rounds and manifest.json")
+    ap.add_argument("--weights", help="start from this checkpoint instead of the manifest's current one")
+    ap.add_argument("--data", default=DATA_YAML)
+    ap.add_argument("--imgsz", type=int, default=640)
+    ap.add_argument("--device", default="0", help='"0" or "cpu"')
+    ap.add_argument("--workers", type=int, default=min(8, os.cpu_count() or 1))
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    hv = sub.add_parser("harvest", help="queue uncertain field images for review")
+    hv.add_argument("--sources", nargs="+", default=["my_results", "cropped_results"])
+    hv.add_argument("--low", type=float, default=0.10, help="ignore detections below this confidence")
+    hv.add_argument("--high", type=float, default=0.50, help="images whose best detection reaches this are skipped")
+
+    tr = sub.add_parser("train", help="fine-tune on reviewed items + replay sample")
+    tr.add_argument("--epochs", type=int, default=5)
+    tr.add_argument("--batch", type=int, default=16)
+    tr.add_argument("--lr0", type=float, default=0.001, help="low LR: fine-tuning, not training from scratch")
+    tr.add_argument("--replay", type=float, default=2.0, help="replay images per delta image")
+    tr.add_argument("--min_delta", type=int, default=10, help="skip the round below this many new images")
+    tr.add_argument("--accept_pseudo", action="store_true", help="also train on unreviewed pre-labels")
+    tr.add_argument("--max_drop", type=float, default=0.005, help="largest valid mAP50-95 loss still promoted")
+
+    sub.add_parser("status", help="queue sizes and past rounds")
+    args = ap.parse_args()
+    if not torch.cuda.is_available():
+        args.device = "cpu"
+    {"harvest": harvest, "train": train, "status": status}[args.cmd](args)
+
+
+if __name__ == "__main__":
+    main()
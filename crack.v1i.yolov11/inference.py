@@ -3,11 +3,39 @@
 #  1. POST {"object_key": key}  → presigned URL (upload_url)
 #  2. POST binary JPG           → upload_url
 #  3. POST metadata JSON        → /presigned  (image_url = upload_url)
+#  (--ingest: one /presigned call signs JPG + metadata, both POSTed straight to S3)
 # Features:
 #  • Choose between --source <folder>  or --camera <device> (mutually-exclusive).
-#  • Robust _request(): dumps status/headers/body on any non-2xx, retries on 429.
+#  • --backend torch|onnx|openvino [--int8] for CUDA-less boxes (export.py).
+#  • Robust _request() (uploader.py): dumps status/headers/body on any non-2xx,
+#    retries on 429; one pooled keep-alive session, several issues in flight.
 #  • All failures are logged but never abort the main loop.
-#  • Always saves the same metadata JSON locally.
+#  • Crops are stitched into one preallocated canvas, JPEG-encoded in memory and
+#    uploaded from RAM; the local JPG/JSON copy is optional (--no_save_local)
+#    and written by a background thread once the upload is done. With the outbox
+#    on, a failed upload's JPG is written and fsynced before the issue is
+#    journaled (kept only until replayed under --no_save_local).
+#  • Detections are grouped into issues by a ByteTrack-style tracker (tracker.py):
+#    exactly one issue per track, using its best crop (--grouping threshold = legacy).
+#  • Issues whose upload gives up are journaled in a SQLite outbox (outbox.py);
+#    a background drainer replays them once the link is back. A successful
+#    upload costs no SD-card write beyond the optional local copy.
+#  • Folder mode decodes images ahead in a thread pool and feeds model.predict
+#    lists of arrays (--batch / --workers); prints images/sec at the end.
+#  • Camera mode runs capture, inference and upload on separate threads joined
+#    by bounded queues (pipeline.py); --backpressure drop-oldest|block applies to
+#    frames only, finished issues always wait for the upload stage.
+#  • --camera takes several devices: one capture thread each, one shared model
+#    batching frames across cameras, per-camera tracking; camera_id in metadata.
+#  • --diff_threshold skips YOLO on static / near-duplicate frames (frame_gate.py).
+#  • --tile N runs overlapping N×N tiles at native resolution, batched, and merges
+#    them back with cross-tile NMS/NMM so hairline cracks survive (tiling.py).
+#  • Sequences failing the severity rules (confidence, class, size in cm, track
+#    persistence) stay on the box, tallied in a rolling counters file (severity.py).
+#  • Capture rate adapts to detections and vehicle speed (--speed_file) under a
+#    CPU budget instead of a fixed 1 Hz sleep (scheduler.py); --fps pins it.
+#  • Folder mode caches detections by image hash + weights hash + settings in
+#    SQLite (predcache.py), so re-runs over the same folder skip the model.
 
 import argparse
 import os
@@ -17,220 +45,573 @@ import random
 import datetime
 import time
 import numpy as np
-import requests
 from typing import Optional
-from requests import Response
 from urllib.parse import urlparse
-import traceback
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from ultralytics import YOLO
 
-API_POST_URL = "https://d3hi3054wpq3c0.cloudfront.net/presigned"
-API_KEY      = "icam-540"
-MAX_RETRIES  = 5
-BASE_BACKOFF = 2   # seconds
-TIMEOUT      = 10  # seconds
-DEBUG_LEN    = 300 # body chars to show
+from export import BACKENDS, DATA_YAML, DEFAULT_WEIGHTS, resolve_weights
+from frame_gate import FrameGate
+from predcache import PredictionCache, image_digest
+import pruned_blocks  # noqa: F401 – C2fSplit, unpickled from compress.py checkpoints
+from pipeline import POLICIES, BLOCK, DROP_OLDEST, STAGES, StageQueue, run_stage
+from scheduler import CPU_BUDGET, make_scheduler
+from severity import SeverityFilter, load_class_names
+from tiling import MERGE_MODES, TiledPredictor
+from tracker import ByteTracker
+from outbox import Drainer, Outbox
+from uploader import API_POST_URL, INGEST_BATCH, Uploader
 
 # -----------------------------------------------------------
-# Debug helpers
+# Utility
 # -----------------------------------------------------------
 
-def _dump(resp: Response, ctx: str):
-    print(f"[DEBUG] {ctx}: status={resp.status_code}")
-    print("[DEBUG] headers:", dict(resp.headers))
-    try:
-        body = resp.text
-        print(f"[DEBUG] body: {body[:DEBUG_LEN]}{'…' if len(body)>DEBUG_LEN else ''}")
-    except Exception as e:
-        print("[DEBUG] body decode error:", e)
+def _basename(p: str) -> str:
+    return os.path.basename(urlparse(p).path if p.startswith(('http','https','file://')) else p)
 
-# -----------------------------------------------------------
-# Resilient requester
-# -----------------------------------------------------------
 
-def _request(method: str, url: str, *, headers: dict, data=None, json_body=None) -> Optional[Response]:
-    backoff = BASE_BACKOFF
-    for attempt in range(1, MAX_RETRIES+1):
-        try:
-            resp = requests.request(method, url, headers=headers, data=data, json=json_body, timeout=TIMEOUT)
-            if resp.status_code < 300:
-                return resp
-            if resp.status_code == 429:
-                retry = int(resp.headers.get("Retry-After", 0)) or backoff
-                print(f"[WARN] 429 {url} -> sleep {retry}s (attempt {attempt}/{MAX_RETRIES})")
-                time.sleep(retry)
-                backoff *= 2
-                continue
-            _dump(resp, f"{method} {url}")
-        except requests.RequestException as e:
-            print(f"[ERROR] {method} {url}: {e} (attempt {attempt}/{MAX_RETRIES})")
-        time.sleep(backoff)
-        backoff *= 2
-    print(f"[ERROR] exceeded retries for {url}")
-    return None
+def _size_cm(box, args):
+    """(length, width) in cm of an xyxy box: long side, short side."""
+    x1,y1,x2,y2 = box
+    return (int(round(max(x2-x1, y2-y1)/args.pixels_per_cm)),
+            int(round(min(x2-x1, y2-y1)/args.pixels_per_cm)))
 
-# -----------------------------------------------------------
-# Upload helpers
-# -----------------------------------------------------------
 
-def get_presigned_url(object_key: str) -> Optional[str]:
-    headers = {"x-api-gateway-auth": API_KEY, "Content-Type": "application/json"}
-    resp = _request("POST", API_POST_URL, headers=headers, json_body={"object_key": object_key})
-    if not resp:
-        return None
-    try:
-        data = resp.json()
-    except ValueError:
-        _dump(resp, "presigned-url NON-JSON")
-        return None
-    url = data.get("upload_url") or data.get("url") or data.get("presigned_url")
-    if not url:
-        print("[ERROR] presigned URL missing; see response above")
-    return url
+def _crack_type(classes, names) -> str:
+    return names[max(set(classes), key=classes.count)]
 
+# -----------------------------------------------------------
+# Core routine for one image sequence
+# -----------------------------------------------------------
 
-def post_jpg(local_path: str, upload_url: str) -> bool:
-    headers = {"x-api-gateway-auth": API_KEY, "Content-Type": "image/jpg"}
-    with open(local_path, "rb") as f:
-        resp = _request("POST", upload_url, headers=headers, data=f)
-    if resp:
-        print(f"[UPLOAD] image POST success {resp.status_code}")
-        return True
-    print("[ERROR] image POST failed")
-    return False
+_SAVER = ThreadPoolExecutor(max_workers=1, thread_name_prefix="local-save")
 
 
-def post_meta(meta: dict):
-    headers = {"x-api-gateway-auth": API_KEY, "Content-Type": "application/json"}
-    _request("POST", API_POST_URL, headers=headers, json_body=meta)
+def _save_local(path: str, data: bytes):
+    try:
+        with open(path, "wb") as f:
+            f.write(data)
+        print(f"[LOCAL] saved {os.path.basename(path)}")
+    except Exception as e:
+        print(f"[ERROR] cannot save {path}:", e)
 
-# -----------------------------------------------------------
-# Utility
-# -----------------------------------------------------------
 
-def _basename(p: str) -> str:
-    return os.path.basename(urlparse(p).path if p.startswith(('http','https','file://')) else p)
+def stitch(crops) -> np.ndarray:
+    """Crops side by side, top-aligned and zero-padded, each copied exactly once
+    into a preallocated canvas."""
+    h = max(c.shape[0] for c in crops)
+    canvas = np.zeros((h, sum(c.shape[1] for c in crops), 3), dtype=crops[0].dtype)
+    x = 0
+    for c in crops:
+        canvas[:c.shape[0], x:x+c.shape[1]] = c
+        x += c.shape[1]
+    return canvas
 
-# -----------------------------------------------------------
-# Core routine for one image sequence
-# -----------------------------------------------------------
 
-def handle_sequence(crops, classes, boxes, names, args):
-    max_h = max(c.shape[0] for c in crops)
-    combined = np.hstack([c if c.shape[0]==max_h else np.vstack((c, np.zeros((max_h-c.shape[0], c.shape[1],3), dtype=c.dtype))) for c in crops])
-    now = datetime.datetime.now()
-    ts_id = now.strftime("%Y_%m_%d_%H_%M_%S")
+def handle_sequence(crops, classes, boxes, names, args, uploader: Uploader, now: Optional[datetime.datetime] = None,
+                    camera_id: Optional[str] = None, seq: int = 0):
+    with STAGES.time("stitch"):
+        combined = stitch(crops)
+    with STAGES.time("encode"):
+        ok, buf = cv2.imencode(".jpg", combined, [cv2.IMWRITE_JPEG_QUALITY, args.jpeg_quality])
+    if not ok:
+        print("[ERROR] JPEG encode failed"); return
+    jpg = buf.tobytes()
+    now = now or datetime.datetime.now()
     ts_h  = now.strftime("%Y-%m-%d %H:%M:%S")
-    issue = f"issue_{ts_id}"
+    issue = _issue_id(now, seq)
     os.makedirs(args.output, exist_ok=True)
     local_img = os.path.join(args.output, f"{issue}.jpg")
-    cv2.imwrite(local_img, combined)
 
     key = os.path.splitext(_basename(local_img))[0]
-    url = get_presigned_url(key)
-    if not url or not post_jpg(local_img, url):
-        return
-
-    x1,y1,x2,y2 = boxes[0]
+    length, width = _size_cm(boxes[0], args)
     meta = {
         "id": issue,
         "timestamp": ts_h,
-        "length": int(round(max(x2-x1, y2-y1)/args.pixels_per_cm)),
-        "width": int(round(min(x2-x1, y2-y1)/args.pixels_per_cm)),
+        "length": length,
+        "width": width,
         "position": args.position,
         "material": args.material,
-        "crack_type": names[max(set(classes), key=classes.count)],
+        "crack_type": _crack_type(classes, names),
         "crack_location": random.choice([chr(c) for c in range(65,91)]),
-        "image_url": url,
+        "camera_id": camera_id,
+        "image_url": None,
     }
-    # save local JSON
-    try:
-        with open(os.path.join(args.output, f"{issue}.json"), "w", encoding="utf-8") as jf:
-            json.dump(meta, jf, indent=2, ensure_ascii=False)
-        print(f"[LOCAL] saved {issue}.json")
-    except Exception as e:
-        print("[ERROR] cannot save JSON:", e)
-    post_meta(meta)
-    print(f"[DONE] {issue} full cycle✅")
+    with STAGES.time("upload"):
+        ok = uploader.deliver(key, local_img, meta, jpg=jpg)
+    # save local JPG/JSON (a failed upload's JPG was already spilled to the outbox)
+    if args.save_local and (ok or uploader.outbox is None):
+        _SAVER.submit(_save_local, local_img, jpg)
+    if args.save_local:
+        _SAVER.submit(_save_local, os.path.join(args.output, f"{issue}.json"),
+                      json.dumps(meta, indent=2, ensure_ascii=False).encode("utf-8"))
+    if ok:
+        print(f"[DONE] {issue} full cycle✅")
+    elif uploader.outbox is not None:
+        print(f"[OUTBOX] {issue} queued for replay")
+
+# -----------------------------------------------------------
+# Sequence grouping
+# -----------------------------------------------------------
+
+# crops/classes/boxes feed handle_sequence; conf (best) and hits feed the severity filter
+Sequence = namedtuple("Sequence", "crops classes boxes conf hits")
+
+_issue_lock = threading.Lock()
+_last_issue = [datetime.datetime.min, 0]
+
+def _issue_stamp():
+    """(detection time, sequence number within that second). Issue ids have
+    second resolution, so when several tracks finish in the same second the
+    later ones get a _01, _02 … suffix; the timestamp itself stays real."""
+    with _issue_lock:
+        now = datetime.datetime.now().replace(microsecond=0)
+        seq = _last_issue[1]+1 if now == _last_issue[0] else 0
+        _last_issue[:] = [now, seq]
+        return now, seq
+
+
+def _issue_id(now: datetime.datetime, seq: int = 0) -> str:
+    return f"issue_{now.strftime('%Y_%m_%d_%H_%M_%S')}" + (f"_{seq:02d}" if seq else "")
+
+
+def _prefetch_targets(uploader: Uploader, stamps):
+    """Ingest mode: sign every queued issue up front, INGEST_BATCH per call,
+    instead of one ingest call per issue inside deliver()."""
+    if uploader.ingest and stamps:
+        uploader.prefetch([_issue_id(now, n) for now, n in stamps])
+
+
+class ThresholdGrouper:
+    """Legacy heuristic: buffer frames while any box x1 <= left_threshold, then
+    emit one sequence made of the first box of every buffered frame. Only that
+    crop is kept per frame, and the buffer is flushed early once it holds
+    --max_buffer frames or --buffer_mb of crops."""
+    def __init__(self, args):
+        self.args=args
+        self.max_frames=args.max_buffer
+        self.max_bytes=int(args.buffer_mb*2**20)
+        self.buffer=[]
+        self.nbytes=0
+        self.early_flushes=0
+
+    def update(self, frame, boxes, confs, cls):
+        keep=[i for i,c in enumerate(confs) if c>=self.args.conf]
+        boxes, confs, cls = [boxes[i] for i in keep], [confs[i] for i in keep], [cls[i] for i in keep]
+        if not boxes:
+            return []
+        x1,y1,x2,y2=boxes[0]
+        crop=frame[y1:y2,x1:x2].copy()  # drop the reference to the full frame
+        self.buffer.append((crop, cls, max(confs)))
+        self.nbytes+=crop.nbytes
+        full=(self.max_frames and len(self.buffer)>=self.max_frames) or (self.max_bytes and self.nbytes>=self.max_bytes)
+        if any(x1<=self.args.left_threshold for x1,*_ in boxes) and not full:
+            return []
+        if full:
+            self.early_flushes+=1
+            print(f"[BUFFER] budget reached ({len(self.buffer)} frames, {self.nbytes/2**20:.1f} MB) → early flush")
+        seq=Sequence([c for c,_,_ in self.buffer], [c for _,cl,_ in self.buffer for c in cl], boxes,
+                     max(cf for *_,cf in self.buffer), len(self.buffer))
+        self.buffer.clear()
+        self.nbytes=0
+        return [seq]
+
+    def flush(self):
+        return []
+
+
+class TrackGrouper:
+    """One sequence per ByteTracker track, emitted when the track is lost or
+    leaves the frame, built from the track's best-quality crop."""
+    def __init__(self, args):
+        self.tracker=ByteTracker(high=args.conf, low=args.track_low, match_iou=args.track_iou,
+                                 max_age=args.track_max_age, min_hits=args.track_min_hits,
+                                 max_bytes=int(args.buffer_mb*2**20))
+
+    @staticmethod
+    def _sequence(t):
+        print(f"[TRACK] #{t.id} finished: {t.hits} hits, classes={sorted(set(t.classes))}")
+        return Sequence([t.best_crop], t.classes, [t.best_box], t.conf, t.hits)
+
+    def update(self, frame, boxes, confs, cls):
+        return [self._sequence(t) for t in self.tracker.update(frame, boxes, confs, cls)]
+
+    def flush(self):
+        return [self._sequence(t) for t in self.tracker.flush()]
+
+
+def make_grouper(args):
+    return TrackGrouper(args) if args.grouping == "track" else ThresholdGrouper(args)
+
+
+def make_filter(args, names=None) -> SeverityFilter:
+    """*names* are the model's class names; --data is only read to check
+    --drop_classes when the model carries none."""
+    if args.drop_classes:
+        known=list(names.values()) if names else load_class_names(args.data)
+        unknown=set(args.drop_classes)-set(known)
+        if unknown:
+            raise ValueError(f"--drop_classes {sorted(unknown)} not in {'model' if names else args.data} names {known}")
+    return SeverityFilter(args.min_severity_conf, args.drop_classes or (), args.min_length_cm, args.min_width_cm,
+                          args.min_track_hits, args.counters or os.path.join(args.output, "filtered_counters.json"),
+                          args.counters_hours)
+
+
+def _admit(flt: SeverityFilter, seq: Sequence, names, args) -> bool:
+    return flt.admit(seq.conf, _crack_type(seq.classes, names), *_size_cm(seq.boxes[0], args), seq.hits)
+
+
+def _predict_conf(args) -> float:
+    # the tracker needs the low-confidence boxes for its second association pass
+    return min(args.conf, args.track_low) if args.grouping == "track" else args.conf
 
 # -----------------------------------------------------------
 # Folder mode
 # -----------------------------------------------------------
 
-def process_folder(folder: str, model: YOLO, args):
+def _detections(res):
+    boxes=[list(map(int,b.tolist())) for b in res.boxes.xyxy]
+    confs=[float(c) for c in res.boxes.conf.tolist()]
+    cls=[int(c) for c in res.boxes.cls.tolist()]
+    return boxes, confs, cls
+
+
+def make_detector(model: YOLO, args):
+    """frames → ([(boxes, confs, cls) per frame], names), whole-frame or tiled."""
+    if args.tile:
+        tiled=TiledPredictor(model, args.tile, args.tile_overlap, args.tile_batch, args.imgsz,
+                             args.tile_full, args.tile_merge, args.tile_merge_thresh)
+        return lambda frames: tiled.predict(frames, _predict_conf(args))
+    def whole(frames):
+        results=model.predict(source=frames, conf=_predict_conf(args), imgsz=args.imgsz, save=False)
+        return [_detections(r) for r in results], results[0].names
+    return whole
+
+
+def _imread(path: str):
+    """(image, content digest); image is None if the file cannot be decoded."""
+    with STAGES.time("decode"):
+        try:
+            data=np.fromfile(path, dtype=np.uint8)
+        except OSError:
+            return None, None
+        if data.size == 0:
+            return None, None
+        return cv2.imdecode(data, cv2.IMREAD_COLOR), image_digest(data.tobytes())
+
+
+def _iter_batches(paths, batch: int, workers: int):
+    """Yield (paths, [(image, digest)]) chunks of size *batch*; the next chunk is decoded
+    by the thread pool while the caller runs inference on the current one."""
+    chunks=[paths[i:i+batch] for i in range(0, len(paths), batch)]
+    if not chunks:
+        return
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        pending=[pool.submit(_imread, p) for p in chunks[0]]
+        for i, chunk in enumerate(chunks):
+            imgs=[f.result() for f in pending]
+            pending=[pool.submit(_imread, p) for p in chunks[i+1]] if i+1 < len(chunks) else []
+            yield chunk, imgs
+
+
+def make_cache(model: YOLO, args) -> Optional[PredictionCache]:
+    """Prediction cache for folder runs; every setting that changes the detections is in the key."""
+    if args.pred_cache == "off":
+        return None
+    keys=("imgsz", "tile", "tile_overlap", "tile_full", "tile_merge", "tile_merge_thresh") if args.tile else ("imgsz",)
+    return PredictionCache(args.pred_cache or os.path.join(args.output, "predict_cache.sqlite3"),
+                           model.ckpt_path or model.model_name, conf=_predict_conf(args),
+                           **{k: getattr(args, k) for k in keys})
+
+
+def _submit_issues(ready, names, args, uploader: Uploader):
+    """Hand (sequence, time, seq no.) issues to the upload pool, signing them
+    in one ingest call first."""
+    _prefetch_targets(uploader, [(now, n) for _, now, n in ready])
+    for seq, now, n in ready:
+        uploader.submit(handle_sequence, seq.crops, seq.classes, seq.boxes, names, args, uploader, now=now, seq=n)
+
+
+def process_folder(folder: str, model: YOLO, args, uploader: Uploader, speed=None):
     img_paths = sorted([os.path.join(folder,f) for f in os.listdir(folder) if f.lower().endswith((".jpg",".jpeg",".png"))])
-    buffer=[]
-    for path in img_paths:
-        tick = time.time()
-        img = cv2.imread(path)
-        res = model.predict(source=path, conf=args.conf, save=False)[0]
-        boxes=[list(map(int,b.tolist())) for b in res.boxes.xyxy]
-        cls=[int(c) for c in res.boxes.cls.tolist()]
-        names=res.names
-        if not boxes:
+    grouper=make_grouper(args)
+    detect=make_detector(model, args)
+    sched=make_scheduler(args, speed, offline=True)
+    flt=make_filter(args, model.names)
+    cache=make_cache(model, args)
+    names=model.names
+    n_imgs, t0 = 0, time.time()
+    for paths, decoded in _iter_batches(img_paths, args.batch, args.workers):
+        batch=[(p, im, h) for p, (im, h) in zip(paths, decoded) if im is not None]
+        for p, (im, _) in zip(paths, decoded):
+            if im is None:
+                print(f"[WARN] cannot decode {p}")
+        if not batch:
             continue
-        buffer.append((img, boxes, cls))
-        if any(x1<=args.left_threshold for x1,*_ in boxes):
-            continue
-        crops, classes = [], []
-        for im,bx,cl in buffer:
-            x1,y1,x2,y2 = bx[0]
-            crops.append(im[y1:y2, x1:x2])
-            classes.extend(cl)
-        handle_sequence(crops, classes, boxes, names, args)
-        buffer.clear()
-        time.sleep(max(0,1-(time.time()-tick)))
-    print("[FOLDER] processing complete")
+        tick = time.time()
+        dets=[cache.get(h) if cache else None for _, _, h in batch]
+        todo=[i for i, d in enumerate(dets) if d is None]
+        if todo:
+            with STAGES.time("predict"):
+                fresh, names = detect([batch[i][1] for i in todo])
+            for i, d in zip(todo, fresh):
+                dets[i]=d
+            if cache:
+                cache.put_many([(batch[i][2], d) for i, d in zip(todo, fresh)])
+        busy = time.time()-tick
+        n_imgs += len(batch)
+        ready=[]
+        for (path, img, _), (boxes, confs, cls) in zip(batch, dets):
+            sched.observe(len(boxes), busy/len(batch))
+            ready += [(seq, *_issue_stamp()) for seq in grouper.update(img, boxes, confs, cls)
+                      if _admit(flt, seq, names, args)]
+        _submit_issues(ready, names, args, uploader)
+        sched.throttle(busy)
+    _submit_issues([(seq, *_issue_stamp()) for seq in grouper.flush() if _admit(flt, seq, names, args)],
+                   names, args, uploader)
+    flt.close()
+    if cache:
+        cache.close()
+    dt = time.time()-t0
+    print(f"[FOLDER] processing complete: {n_imgs} images in {dt:.1f}s "
+          f"({n_imgs/dt if dt else 0:.2f} img/s, batch={args.batch}, workers={args.workers}), {flt}"
+          + (f", {cache}" if cache else ""))
 
 # -----------------------------------------------------------
 # Live camera mode
 # -----------------------------------------------------------
 
-def process_camera(dev: str, model: YOLO, args):
-    cap=cv2.VideoCapture(dev, cv2.CAP_V4L2)
-    if not cap.isOpened():
-        print(f"[ERROR] cannot open camera {dev}")
-        return
-    buffer=[]
-    try:
-        while True:
+class _Camera:
+    """Per-device state: capture handle plus its own gate, grouper and rate,
+    so tracks from one tunnel wall never mix with the other."""
+    def __init__(self, cam_id: str, cap, args, speed, n_cams: int):
+        self.id=cam_id
+        self.cap=cap
+        self.gate=FrameGate(args.diff_threshold, max_skip=args.max_skip)
+        self.grouper=make_grouper(args)
+        self.sched=make_scheduler(args, speed)
+        self.sched.cpu_budget/=n_cams  # the budget is for the whole box, shared by all cameras
+
+    def __str__(self):
+        return f"{self.id}: {self.sched} {self.gate}"
+
+
+def _open_cameras(devs, ids, args, speed):
+    caps=[]
+    for i, dev in enumerate(devs):
+        cap=dev if hasattr(dev, "read") else cv2.VideoCapture(dev, cv2.CAP_V4L2)
+        if not cap.isOpened():
+            print(f"[ERROR] cannot open camera {dev}")
+            continue
+        cam_id=ids[i] if ids and i < len(ids) else (f"cam{i}" if hasattr(dev, "read") else str(dev))
+        caps.append((cam_id, cap))
+    return [_Camera(cam_id, cap, args, speed, len(caps)) for cam_id, cap in caps]
+
+
+def process_camera(devs, model: YOLO, args, uploader: Uploader, speed=None):
+    """One capture thread per device → one inference thread → upload, joined by
+    bounded queues. The inference thread batches the queued frames of all
+    cameras through the single shared model. Only frames are subject to
+    --backpressure; finished issues are never dropped, so a slow uplink fills
+    the upload queue and then stalls inference, and the frame queue sheds the
+    excess frames instead. *devs* are V4L2 devices or already-open
+    capture objects (benchmark.py); *speed* is an optional km/h hook for the
+    rate scheduler. Returns frame counts: captured, gated (skipped by
+    --diff_threshold), dropped (by the frame queue) and inferred (through predict)."""
+    devs=devs if isinstance(devs, (list, tuple)) else [devs]
+    cams=_open_cameras(devs, args.camera_ids, args, speed)
+    if not cams:
+        return {}
+    frames=StageQueue("frames", args.frame_queue*len(cams), args.backpressure)
+    seqs=StageQueue("uploads", args.upload_queue, BLOCK)
+    stop, infer_done, upload_done = threading.Event(), threading.Event(), threading.Event()
+    detect=make_detector(model, args)
+    flt=make_filter(args, model.names)
+    names={}
+    captured={cam.id: 0 for cam in cams}
+    inferred=0
+
+    def capture(cam):
+        while not stop.is_set() and cam.cap.isOpened():
             tick=time.time()
-            ret,frame=cap.read()
+            ret,frame=cam.cap.read()
             if not ret:
                 time.sleep(0.1); continue
-            try:
-                res=model.predict(source=frame, conf=args.conf, save=False)[0]
-            except Exception as e:
-                print("[ERROR] YOLO predict:", e); traceback.print_exc(); continue
-            boxes=[list(map(int,b.tolist())) for b in res.boxes.xyxy]
-            cls=[int(c) for c in res.boxes.cls.tolist()]
-            names=res.names
-            if not boxes:
-                time.sleep(max(0,1-(time.time()-tick))); continue
-            buffer.append((frame.copy(), boxes, cls))
-            if any(x1<=args.left_threshold for x1,*_ in boxes):
-                time.sleep(max(0,1-(time.time()-tick))); continue
-            crops, classes=[],[]
-            for fr,bx,cl in buffer:
-                x1,y1,x2,y2=bx[0]
-                crops.append(fr[y1:y2,x1:x2])
-                classes.extend(cl)
-            handle_sequence(crops, classes, boxes, names, args)
-            buffer.clear()
-            time.sleep(max(0,1-(time.time()-tick)))
+            captured[cam.id]+=1
+            if cam.gate.should_infer(frame):
+                frames.put((cam, frame), stop)
+            cam.sched.wait(tick)
+
+    def infer(batch):
+        nonlocal names, inferred
+        t0=time.time()
+        with STAGES.time("predict"):
+            dets, names = detect([frame for _, frame in batch])
+        inferred+=len(batch)
+        busy=(time.time()-t0)/len(batch)
+        for (cam, frame), (boxes, confs, cls) in zip(batch, dets):
+            cam.sched.observe(len(boxes), busy)
+            for seq in cam.grouper.update(frame, boxes, confs, cls):
+                if _admit(flt, seq, names, args):
+                    seqs.put((seq.crops, seq.classes, seq.boxes, names, *_issue_stamp(), cam.id), upload_done)
+
+    def flush_tracks():
+        for cam in cams:
+            for seq in cam.grouper.flush():
+                if _admit(flt, seq, names, args):
+                    seqs.put((seq.crops, seq.classes, seq.boxes, names, *_issue_stamp(), cam.id), upload_done)
+
+    def upload(items):
+        # everything already queued is signed in one ingest call
+        _prefetch_targets(uploader, [(now, n) for *_, now, n, _ in items])
+        for crops, classes, boxes, names, now, n, cam_id in items:
+            # blocks while --upload_workers issues are in flight → backs up `seqs`
+            uploader.submit(handle_sequence, crops, classes, boxes, names, args, uploader, now=now, camera_id=cam_id, seq=n)
+
+    captures=[threading.Thread(target=capture, args=(cam,), name=f"capture-{cam.id}", daemon=True) for cam in cams]
+    workers=[
+        threading.Thread(target=run_stage, daemon=True,
+                         args=("inference", frames, infer, stop, infer_done, flush_tracks, max(args.batch, len(cams)))),
+        threading.Thread(target=run_stage, daemon=True,
+                         args=("upload", seqs, upload, infer_done, upload_done, None, INGEST_BATCH)),
+    ]
+    for t in workers+captures:
+        t.start()
+    print(f"[CAM] serving {', '.join(cam.id for cam in cams)} with one shared model")
+    last_stats=time.time()
+    try:
+        while any(t.is_alive() for t in captures):
+            time.sleep(0.2)
+            if args.stats_every and time.time()-last_stats >= args.stats_every:
+                print(f"[PIPE] {' | '.join(map(str, cams))} | {flt} | {frames} | {seqs}")
+                last_stats=time.time()
     except KeyboardInterrupt:
         print("[CAM] user interrupted")
     finally:
-        cap.release()
+        stop.set()
+        for t in captures:
+            t.join()
+        for cam in cams:
+            cam.cap.release()
+        print(f"[CAM] draining: {frames} | {seqs}")
+        for w in workers:
+            w.join()
+        flt.close()
+        print(f"[PIPE] final {' | '.join(map(str, cams))} | {flt} | {frames} | {seqs}")
         print("[CAM] complete")
+    return {"captured": sum(captured.values()), "gated": sum(cam.gate.skipped for cam in cams),
+            "dropped": frames.stats()["dropped"], "inferred": inferred}
 
 # -----------------------------------------------------------
 # Entrypoint
 # -----------------------------------------------------------
 
-def main():
+def build_parser() -> argparse.ArgumentParser:
     ap=argparse.ArgumentParser("Realtime crack detection → presigned S3")
     mode=ap.add_mutually_exclusive_group(required=True)
     mode.add_argument("--source", help="Folder with images for batch processing")
-    mode.add_argument("--camera", help="Video device", default=None)
-    ap.add
\ No newline at end of file
+    mode.add_argument("--camera", nargs="+", help="Video device(s); several are served by one shared model", default=None)
+    ap.add_argument("--camera_ids", nargs="+", default=None, help="Camera IDs for the metadata, in --camera order (default: device path)")
+    ap.add_argument("--weights", default=DEFAULT_WEIGHTS, help="YOLO .pt weights (exports are derived from these)")
+    ap.add_argument("--backend", choices=BACKENDS, default="torch", help="CPU inference backend (see export.py)")
+    ap.add_argument("--int8", action="store_true", help="onnx/openvino: use the INT8 post-training-quantized export")
+    ap.add_argument("--imgsz", type=int, default=640, help="Model input size for inference (whole frames and tiles) and for exported backends")
+    ap.add_argument("--tile", type=int, default=0, help="Tiled inference: tile size in pixels (0 = whole frame)")
+    ap.add_argument("--tile_overlap", type=float, default=0.2, help="Tiled inference: overlap between tiles (fraction of --tile)")
+    ap.add_argument("--tile_batch", type=int, default=8, help="Tiled inference: tiles per model.predict call")
+    ap.add_argument("--tile_full", action="store_true", help="Tiled inference: also run the whole frame to catch large cracks")
+    ap.add_argument("--tile_merge", choices=MERGE_MODES, default="nmm", help="Cross-tile merge: nmm (union on IoS) or nms (IoU)")
+    ap.add_argument("--tile_merge_thresh", type=float, default=0.5, help="Cross-tile IoS/IoU merge threshold")
+    ap.add_argument("--conf", type=float, default=0.25, help="Detection confidence threshold")
+    ap.add_argument("--output", default="results", help="Local folder for issue JPG/JSON")
+    ap.add_argument("--grouping", choices=("track","threshold"), default="track",
+                    help="track: one issue per ByteTrack track; threshold: legacy left_threshold buffer")
+    ap.add_argument("--left_threshold", type=int, default=50, help="threshold grouping: keep buffering while a box x1 is <= this")
+    ap.add_argument("--max_buffer", type=int, default=30, help="threshold grouping: flush a sequence early after this many frames (0 = unlimited)")
+    ap.add_argument("--buffer_mb", type=float, default=64, help="Byte budget for buffered crops / live track crops (0 = unlimited)")
+    ap.add_argument("--track_low", type=float, default=0.1, help="Tracker second-pass confidence (--conf starts tracks)")
+    ap.add_argument("--track_iou", type=float, default=0.3, help="Tracker IoU needed to continue a track")
+    ap.add_argument("--track_max_age", type=int, default=3, help="Frames a track may go unmatched before it is emitted")
+    ap.add_argument("--track_min_hits", type=int, default=1, help="Drop tracks seen in fewer frames than this")
+    ap.add_argument("--data", default=DATA_YAML, help="Dataset YAML for checking --drop_classes when the model has no class names")
+    ap.add_argument("--min_severity_conf", type=float, default=0.0, help="Severity filter: drop sequences whose best confidence is below this")
+    ap.add_argument("--drop_classes", nargs="+", default=None, help="Severity filter: crack classes never uploaded (e.g. objects)")
+    ap.add_argument("--min_length_cm", type=float, default=0.0, help="Severity filter: minimum estimated crack length")
+    ap.add_argument("--min_width_cm", type=float, default=0.0, help="Severity filter: minimum estimated crack width")
+    ap.add_argument("--min_track_hits", type=int, default=1, help="Severity filter: minimum frames a crack was seen in (counted, unlike --track_min_hits)")
+    ap.add_argument("--counters", default=None, help="Rolling counters of filtered sequences (default <output>/filtered_counters.json)")
+    ap.add_argument("--counters_hours", type=int, default=24, help="Hours of hourly buckets kept in --counters")
+    ap.add_argument("--pixels_per_cm", type=float, default=10.0, help="Pixel → cm scale for length/width")
+    ap.add_argument("--jpeg_quality", type=int, default=95, help="Quality of the stitched issue JPG")
+    ap.add_argument("--no_save_local", dest="save_local", action="store_false",
+                    help="Do not keep JPG/JSON copies in --output (with the outbox on, a failed upload's JPG stays only until it is replayed)")
+    ap.add_argument("--position", default="mountain")
+    ap.add_argument("--material", default="concrete")
+    ap.add_argument("--batch", type=int, default=1, help="Images per model.predict call (camera mode: at least one per camera)")
+    ap.add_argument("--workers", type=int, default=4, help="Folder mode: image decoder threads")
+    ap.add_argument("--diff_threshold", type=float, default=0.0,
+                    help="Camera mode: skip YOLO when the 64x64 gray mean abs diff to the last inferred frame is below this (0 = off)")
+    ap.add_argument("--max_skip", type=int, default=30, help="Camera mode: force inference after this many skipped frames (0 = never)")
+    ap.add_argument("--frame_queue", type=int, default=2, help="Camera mode: capture → inference queue size")
+    ap.add_argument("--upload_queue", type=int, default=32, help="Camera mode: inference → upload queue size")
+    ap.add_argument("--backpressure", choices=POLICIES, default=DROP_OLDEST, help="Camera mode: policy when the frame queue is full (the upload queue always blocks)")
+    ap.add_argument("--api_url", default=API_POST_URL, help="/presigned endpoint (env API_POST_URL)")
+    ap.add_argument("--ingest", action="store_true",
+                    help="Use the Lambda ingest mode: one call signs image + metadata, both POSTed straight to S3")
+    ap.add_argument("--upload_workers", type=int, default=4, help="Issues uploaded concurrently over the pooled session")
+    ap.add_argument("--outbox", default=None, help="Outbox DB path (default <output>/outbox.sqlite3, 'off' to disable)")
+    ap.add_argument("--pred_cache", default=None,
+                    help="Folder-mode prediction cache (default <output>/predict_cache.sqlite3, 'off' to disable)")
+    ap.add_argument("--drain_every", type=float, default=30.0, help="Seconds between outbox replay probes")
+    ap.add_argument("--drain_burst", type=int, default=20, help="Max issues replayed per burst")
+    ap.add_argument("--stats_every", type=float, default=30.0, help="Seconds between [PIPE] queue-depth logs (0 = off)")
+    ap.add_argument("--fps", type=float, default=None, help="Fixed capture rate, bypassing the adaptive scheduler (0 = unpaced)")
+    ap.add_argument("--min_fps", type=float, default=0.5, help="Adaptive rate on empty stretches (> 0)")
+    ap.add_argument("--max_fps", type=float, default=5.0, help="Adaptive rate while cracks are being detected")
+    ap.add_argument("--active_hold", type=float, default=3.0, help="Seconds at max rate after the last detection (then halves each period)")
+    ap.add_argument("--cpu_budget", type=float, default=None,
+                    help=f"Max share of wall time spent in inference (0 = no cap; default {CPU_BUDGET} in camera mode, "
+                         "no cap in folder mode)")
+    ap.add_argument("--speed_file", default=None, help="Text file with current vehicle speed in km/h (speed hook)")
+    ap.add_argument("--metres_per_frame", type=float, default=1.0, help="Speed hook: wall advance allowed between frames")
+    return ap
+
+
+def main():
+    ap=build_parser()
+    args=ap.parse_args()
+    if args.min_fps <= 0:
+        ap.error("--min_fps must be > 0")
+
+    model=YOLO(resolve_weights(args.weights, args.backend, args.int8, args.imgsz), task="detect")
+    outbox=drainer=None
+    if args.outbox != "off":
+        os.makedirs(args.output, exist_ok=True)
+        outbox=Outbox(args.outbox or os.path.join(args.output, "outbox.sqlite3"))
+        print(f"[OUTBOX] {outbox.path}: {outbox.pending()} pending from previous runs")
+        # replay uses its own single-attempt client: a dead link fails fast and the drainer backs off
+        drainer=Drainer(outbox, Uploader(args.api_url, workers=args.upload_workers, max_retries=1,
+                                           outbox=outbox, ingest=args.ingest, keep_local=args.save_local),
+                        interval=args.drain_every, burst=args.drain_burst)
+        drainer.start()
+    uploader=Uploader(args.api_url, workers=args.upload_workers, outbox=outbox, ingest=args.ingest,
+                      keep_local=args.save_local)
+    try:
+        if args.source:
+            process_folder(args.source, model, args, uploader)
+        else:
+            process_camera(args.camera, model, args, uploader)
+    finally:
+        uploader.close(wait=True)
+        _SAVER.shutdown(wait=True)
+        if drainer:
+            drainer.stop()
+            drainer.uploader.close(wait=True)
+            print(f"[OUTBOX] {outbox.pending()} pending at exit")
+            outbox.close()
+
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,136 @@
+# outbox.py – durable on-device upload outbox (SQLite, WAL, synchronous=FULL)
+# An issue whose live upload gives up is journaled here (its JPG written and
+# fsynced first) and removed only after a replay's metadata POST succeeds, so
+# nothing is lost when the tunnel drops the link for minutes or the box
+# reboots. Uploads that succeed on the first attempt never touch the DB.
+# Two stages are tracked:
+#  • image : presigned URL + JPG POST still outstanding
+#  • meta  : JPG is up (image_url known), metadata POST outstanding
+# Drainer replays due rows in bursts once a probe upload shows the link is back.
+# A row is leased while a replay works on it: due() claims the rows it returns
+# by pushing next_try LEASE ahead, and the uploader renews the lease before
+# every network step, so a slow replay is never picked up a second time.
+
+import json
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+# seconds a claimed row is left alone; renewed before every upload step, so it only
+# has to cover one step: MAX_RETRIES × (TIMEOUT + MAX_RETRY_AFTER) = 5 × (10+60) s
+LEASE       = 600
+MAX_BACKOFF = 600  # seconds between retries of one row
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    issue_id   TEXT PRIMARY KEY,
+    jpg_path   TEXT NOT NULL,
+    meta       TEXT NOT NULL,
+    stage      TEXT NOT NULL DEFAULT 'image',
+    image_url  TEXT,
+    attempts   INTEGER NOT NULL DEFAULT 0,
+    created    REAL NOT NULL,
+    next_try   REAL NOT NULL,
+    last_error TEXT
+)
+"""
+
+
+class Outbox:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=FULL")
+        self._db.execute(_SCHEMA)
+
+    def _exec(self, sql: str, params=()):
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def add(self, issue_id: str, jpg_path: str, meta: dict):
+        """Journal an issue; a no-op if it is already pending."""
+        now = time.time()
+        self._exec("INSERT OR IGNORE INTO outbox (issue_id, jpg_path, meta, created, next_try) VALUES (?,?,?,?,?)",
+                   (issue_id, jpg_path, json.dumps(meta, ensure_ascii=False), now, now+LEASE))
+
+    def image_done(self, issue_id: str, image_url: str):
+        self._exec("UPDATE outbox SET stage='meta', image_url=?, next_try=? WHERE issue_id=?",
+                   (image_url, time.time()+LEASE, issue_id))
+
+    def renew(self, issue_id: str):
+        """Extend the lease of a row that is still being worked on."""
+        self._exec("UPDATE outbox SET next_try=? WHERE issue_id=?", (time.time()+LEASE, issue_id))
+
+    def done(self, issue_id: str):
+        self._exec("DELETE FROM outbox WHERE issue_id=?", (issue_id,))
+
+    def failed(self, issue_id: str, error: str):
+        rows = self._exec("SELECT attempts FROM outbox WHERE issue_id=?", (issue_id,))
+        if not rows:
+            return
+        attempts = rows[0][0]+1
+        self._exec("UPDATE outbox SET attempts=?, next_try=?, last_error=? WHERE issue_id=?",
+                   (attempts, time.time()+min(MAX_BACKOFF, 15*2**attempts), error, issue_id))
+
+    def due(self, limit: int) -> list:
+        """Claim up to *limit* rows whose lease or backoff has run out."""
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._db.execute("SELECT issue_id, jpg_path, meta, image_url FROM outbox WHERE next_try<=? "
+                                        "ORDER BY created LIMIT ?", (now, limit)).fetchall()
+                self._db.executemany("UPDATE outbox SET next_try=? WHERE issue_id=?",
+                                     [(now+LEASE, r[0]) for r in rows])
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return [{"issue_id": i, "jpg_path": p, "meta": json.loads(m), "image_url": u} for i, p, m, u in rows]
+
+    def pending(self) -> int:
+        return self._exec("SELECT COUNT(*) FROM outbox")[0][0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class Drainer(threading.Thread):
+    """Background replay of the outbox. The oldest due row doubles as a link
+    probe: if it fails the drainer backs off, if it succeeds the rest of the
+    burst is pushed through the uploader's pool."""
+
+    def __init__(self, outbox: Outbox, uploader, interval: float = 30, burst: int = 20, max_wait: float = 600):
+        super().__init__(name="outbox-drainer", daemon=True)
+        self.outbox, self.uploader = outbox, uploader
+        self.interval, self.burst, self.max_wait = interval, burst, max_wait
+        self._halt = threading.Event()
+
+    def run(self):
+        wait = 1.0
+        while not self._halt.wait(wait):
+            # claim only the probe first, so a failed probe leaves the rest due
+            probe = self.outbox.due(1)
+            if not probe:
+                wait = self.interval
+                continue
+            if not self.uploader.deliver(**probe[0]):
+                wait = min(max(wait, self.interval)*2, self.max_wait)
+                print(f"[OUTBOX] link still down, {self.outbox.pending()} pending, next probe in {wait:.0f}s")
+                continue
+            rows = self.outbox.due(self.burst-1)
+            if rows and self.uploader.ingest:
+                # one ingest call signs the whole burst
+                self.uploader.prefetch([r["issue_id"] for r in rows])
+            futs = [self.uploader.submit(self.uploader.deliver, **r) for r in rows]
+            ok = 1 + sum(1 for f in futs if f.result())
+            print(f"[OUTBOX] replayed {ok}/{len(rows)+1}, {self.outbox.pending()} pending")
+            wait = 0 if len(rows)+1 == self.burst else self.interval
+
+    def stop(self, timeout: Optional[float] = None):
+        self._halt.set()
+        self.join(timeout)
@@ -0,0 +1,152 @@
+# pipeline.py – bounded hand-off queues between the edge pipeline stages
+# (capture → inference → upload). Each queue has a backpressure policy:
+#  • drop-oldest : a full queue evicts its oldest item, the producer never waits.
+#  • block       : the producer waits until the consumer frees a slot.
+# Depth / high-water / dropped counters are kept per queue for the [PIPE] log.
+# STAGES collects per-stage latency samples (decode, predict, stitch, encode,
+# upload) for benchmark.py.
+
+import queue
+import threading
+import time
+import traceback
+from collections import deque
+from contextlib import contextmanager
+from typing import Optional
+
+import numpy as np
+
+DROP_OLDEST = "drop-oldest"
+BLOCK       = "block"
+POLICIES    = (DROP_OLDEST, BLOCK)
+
+
+class StageQueue:
+    def __init__(self, name: str, maxsize: int, policy: str = DROP_OLDEST):
+        if policy not in POLICIES:
+            raise ValueError(f"unknown backpressure policy {policy!r} (choose from {POLICIES})")
+        self.name = name
+        self.policy = policy
+        self._q = queue.Queue(maxsize=max(1, maxsize))
+        self._lock = threading.Lock()
+        self.put_count = 0
+        self.dropped = 0
+        self.high_water = 0
+
+    def put(self, item, stop: Optional[threading.Event] = None) -> bool:
+        """Enqueue *item*; returns False only if *stop* fired while blocked."""
+        if self.policy == BLOCK:
+            while True:
+                try:
+                    self._q.put(item, timeout=0.5)
+                    break
+                except queue.Full:
+                    if stop is not None and stop.is_set():
+                        return False
+        else:
+            while True:
+                try:
+                    self._q.put_nowait(item)
+                    break
+                except queue.Full:
+                    try:
+                        self._q.get_nowait()
+                        with self._lock:
+                            self.dropped += 1
+                    except queue.Empty:
+                        pass
+        with self._lock:
+            self.put_count += 1
+            self.high_water = max(self.high_water, self._q.qsize())
+        return True
+
+    def get(self, timeout: float = 0.5):
+        """Next item, or None if nothing arrived within *timeout*."""
+        try:
+            return self._q.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def get_batch(self, max_items: int, timeout: float = 0.5) -> list:
+        """Wait up to *timeout* for one item, then take whatever else is already
+        queued, up to *max_items* in total (empty list on timeout)."""
+        first = self.get(timeout)
+        if first is None:
+            return []
+        items = [first]
+        while len(items) < max_items:
+            try:
+                items.append(self._q.get_nowait())
+            except queue.Empty:
+                break
+        return items
+
+    def depth(self) -> int:
+        return self._q.qsize()
+
+    def empty(self) -> bool:
+        return self._q.empty()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"depth": self.depth(), "high_water": self.high_water,
+                    "put": self.put_count, "dropped": self.dropped}
+
+    def __str__(self):
+        s = self.stats()
+        return f"{self.name}: depth={s['depth']}/{self._q.maxsize} hw={s['high_water']} put={s['put']} dropped={s['dropped']}"
+
+
+def run_stage(name: str, inbox: StageQueue, fn, upstream_done: threading.Event, done: threading.Event,
+              finish=None, batch: int = 0):
+    """Consume *inbox* with *fn* until the upstream stage is done and the queue is
+    drained, call *finish* (flush stage state downstream), then set *done*.
+    With *batch* > 0, *fn* gets lists of up to that many items instead.
+    Exceptions from *fn* are logged, never fatal."""
+    try:
+        while not (upstream_done.is_set() and inbox.empty()):
+            item = inbox.get_batch(batch) if batch else inbox.get()
+            if item is None or (batch and not item):
+                continue
+            try:
+                fn(item)
+            except Exception as e:
+                print(f"[ERROR] {name} stage:", e); traceback.print_exc()
+        if finish is not None:
+            finish()
+    finally:
+        done.set()
+
+
+class StageStats:
+    """Thread-safe latency samples (ms) per stage name, bounded per stage."""
+    def __init__(self, maxlen: int = 100_000):
+        self._maxlen = maxlen
+        self._lock = threading.Lock()
+        self._samples = {}
+
+    def record(self, stage: str, ms: float):
+        with self._lock:
+            self._samples.setdefault(stage, deque(maxlen=self._maxlen)).append(ms)
+
+    @contextmanager
+    def time(self, stage: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, (time.perf_counter()-t0)*1000)
+
+    def summary(self) -> dict:
+        with self._lock:
+            snap = {k: np.asarray(v) for k, v in self._samples.items()}
+        return {k: {"n": len(v), "mean": float(v.mean()), "p50": float(np.percentile(v, 50)),
+                    "p95": float(np.percentile(v, 95)), "p99": float(np.percentile(v, 99))}
+                for k, v in snap.items() if len(v)}
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+
+
+STAGES = StageStats()
@@ -0,0 +1,100 @@
+# predcache.py – persistent prediction cache for re-runs over the same folders
+# Folder runs (inference.py --source, incremental.py harvest) keep re-inferring
+# the same images. Detections are stored in SQLite keyed by
+#  • image : SHA-1 of the encoded file bytes (renames / copies still hit)
+#  • model : SHA-1 of the weights file (or every file of an exported model dir)
+#  • settings : conf, imgsz, tiling … anything that changes the output
+# Other weights never see stale boxes (their digest is in the key), and rows of
+# earlier weights stay valid for a switch back. The file is bounded instead by
+# age and size: on open, rows older than MAX_AGE_DAYS and then the oldest rows
+# beyond MAX_ROWS are evicted (and logged).
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+MAX_ROWS     = 500_000  # ~100 B per row → tens of MB on the SD card
+MAX_AGE_DAYS = 30
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS preds (
+    image    TEXT NOT NULL,
+    weights  TEXT NOT NULL,
+    settings TEXT NOT NULL,
+    dets     TEXT NOT NULL,
+    created  REAL NOT NULL,
+    PRIMARY KEY (image, weights, settings)
+);
+CREATE INDEX IF NOT EXISTS preds_created ON preds (created);
+"""
+
+
+def file_digest(path: str) -> str:
+    h = hashlib.sha1()
+    files = [path] if os.path.isfile(path) else sorted(
+        os.path.join(d, f) for d, _, fs in os.walk(path) for f in fs)
+    for p in files:
+        h.update(os.path.relpath(p, path).encode() if p != path else b"")
+        with open(p, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+    return h.hexdigest()
+
+
+def image_digest(data: bytes) -> str:
+    return hashlib.sha1(data).hexdigest()
+
+
+class PredictionCache:
+    def __init__(self, path: str, weights: str, max_rows: int = MAX_ROWS, max_age_days: float = MAX_AGE_DAYS,
+                 **settings):
+        self.path = path
+        self.weights = file_digest(weights)
+        self.settings = json.dumps(settings, sort_keys=True)
+        self.hits = self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        self._evict(max_rows, max_age_days)
+
+    def _evict(self, max_rows: int, max_age_days: float):
+        old = self._db.execute("DELETE FROM preds WHERE created<?", (time.time()-max_age_days*86400,)).rowcount
+        excess = self._db.execute("SELECT COUNT(*) FROM preds").fetchone()[0]-max_rows
+        over = self._db.execute("DELETE FROM preds WHERE rowid IN (SELECT rowid FROM preds ORDER BY created LIMIT ?)",
+                                (excess,)).rowcount if excess > 0 else 0
+        if old or over:
+            print(f"[CACHE] evicted {old} predictions older than {max_age_days:g} days"
+                  f" and {over} beyond {max_rows} rows")
+
+    def get(self, image: str) -> Optional[list]:
+        with self._lock:
+            row = self._db.execute("SELECT dets FROM preds WHERE image=? AND weights=? AND settings=?",
+                                   (image, self.weights, self.settings)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put_many(self, items):
+        """items: (image digest, JSON-able detections) pairs."""
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.executemany("INSERT OR REPLACE INTO preds VALUES (?,?,?,?,?)",
+                                 [(im, self.weights, self.settings, json.dumps(d), now) for im, d in items])
+            self._db.execute("COMMIT")
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def __str__(self):
+        total = self.hits+self.misses
+        return f"cache: {self.hits}/{total} hits ({self.hits/total if total else 0:.0%})"
@@ -0,0 +1,55 @@
+# pruned_blocks.py – modules that appear inside compressed checkpoints
+# compress.py rewrites C2f / C3k2 blocks as C2fSplit before structured pruning,
+# so the pruned best.pt pickles references to this class. It lives in its own
+# importable module (not compress.py, which runs as __main__) so that
+# inference.py, export.py and anything else can torch.load the checkpoint.
+
+import copy
+
+import torch
+from torch import nn
+from ultralytics.nn.modules import block
+
+
+def _conv_slice(conv, sl: slice):
+    """Copy of an ultralytics Conv keeping output channels *sl* (conv + BN)."""
+    new = copy.deepcopy(conv)
+    w = conv.conv.weight.data[sl]
+    c = conv.conv
+    new.conv = nn.Conv2d(w.shape[1]*c.groups, w.shape[0], c.kernel_size, c.stride, c.padding, c.dilation, c.groups, bias=False)
+    new.conv.weight.data.copy_(w)
+    bn = nn.BatchNorm2d(w.shape[0], eps=conv.bn.eps, momentum=conv.bn.momentum)
+    for k in ("weight", "bias"):
+        getattr(bn, k).data.copy_(getattr(conv.bn, k).data[sl])
+    for k in ("running_mean", "running_var"):
+        getattr(bn, k).copy_(getattr(conv.bn, k)[sl])
+    new.bn = bn.train(conv.bn.training)
+    return new
+
+
+class C2fSplit(nn.Module):
+    """C2f / C3k2 with cv1 split into two convs instead of .chunk(2), so each half
+    can lose a different number of channels. Numerically identical before pruning."""
+
+    def __init__(self, c2f):
+        super().__init__()
+        c = c2f.c
+        self.cv0, self.cv1 = _conv_slice(c2f.cv1, slice(0, c)), _conv_slice(c2f.cv1, slice(c, 2*c))
+        self.cv2, self.m = c2f.cv2, c2f.m
+        for k in ("f", "i", "type", "np"):  # ultralytics graph bookkeeping
+            if hasattr(c2f, k):
+                setattr(self, k, getattr(c2f, k))
+
+    def forward(self, x):
+        y = [self.cv0(x), self.cv1(x)]
+        y.extend(m(y[-1]) for m in self.m)
+        return self.cv2(torch.cat(y, 1))
+
+
+def split_c2f(module: nn.Module) -> nn.Module:
+    for name, child in module.named_children():
+        if isinstance(child, block.C2f):
+            setattr(module, name, C2fSplit(child))
+        else:
+            split_c2f(child)
+    return module
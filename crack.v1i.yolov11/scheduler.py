@@ -0,0 +1,97 @@
+# scheduler.py – adaptive capture rate for the edge loops
+# Replaces the fixed 1 Hz sleep. The target rate is the highest of:
+#  • activity : max_fps while detections were seen in the last active_hold
+#               seconds, then halving every active_hold seconds down to min_fps
+#  • speed    : speed / metres_per_frame, so consecutive frames overlap on the
+#               tunnel wall at any vehicle speed (speed from a hook, km/h)
+# and is then capped by
+#  • CPU budget : rate <= cpu_budget / (mean inference seconds per frame), so
+#                 YOLO never takes more than that share of the device
+#  • max_fps
+# A fixed --fps bypasses all of this (0 = unpaced, used by benchmark.py).
+# Folder runs only throttle to the CPU budget when --cpu_budget is given.
+
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+CPU_BUDGET = 0.7  # camera-mode default share of wall time for inference
+
+
+def speed_from_file(path: str) -> Callable[[], Optional[float]]:
+    """Speed hook reading km/h from a text file kept current by the vehicle
+    bridge (CAN / GPS); None when the file is missing or stale (> 5 s)."""
+    def read():
+        try:
+            if time.time()-os.path.getmtime(path) > 5:
+                return None
+            with open(path) as f:
+                return float(f.read().strip() or "nan")
+        except (OSError, ValueError):
+            return None
+    return read
+
+
+class RateScheduler:
+    def __init__(self, min_fps: float = 0.5, max_fps: float = 5.0, cpu_budget: float = CPU_BUDGET,
+                 active_hold: float = 3.0, speed: Optional[Callable[[], Optional[float]]] = None,
+                 metres_per_frame: float = 1.0, fixed: Optional[float] = None):
+        if min_fps <= 0:
+            raise ValueError(f"min_fps must be > 0, got {min_fps}")
+        self.min_fps, self.max_fps = min_fps, max(min_fps, max_fps)
+        self.cpu_budget, self.active_hold = cpu_budget, active_hold
+        self.speed, self.metres_per_frame = speed, metres_per_frame
+        self.fixed = fixed
+        self._lock = threading.Lock()
+        self._busy = 0.0  # EMA of inference seconds per frame
+        self._last_active = float("-inf")
+        self.rate = fixed if fixed is not None else min_fps
+
+    def observe(self, detections: int, busy: float):
+        """Report one inferred frame: number of detections and seconds spent in YOLO."""
+        with self._lock:
+            self._busy = busy if not self._busy else 0.8*self._busy+0.2*busy
+            if detections:
+                self._last_active = time.time()
+
+    def _target(self) -> float:
+        idle = time.time()-self._last_active
+        periods = idle/self.active_hold if self.active_hold else float("inf")
+        activity = self.max_fps/2**int(periods) if periods < 32 else 0.0
+        kmh = self.speed() if self.speed else None
+        by_speed = (kmh/3.6)/self.metres_per_frame if kmh and kmh > 0 else 0.0
+        rate = min(max(self.min_fps, activity, by_speed), self.max_fps)
+        if self.cpu_budget and self._busy:
+            rate = min(rate, self.cpu_budget/self._busy)
+        return rate
+
+    def wait(self, tick: float):
+        """Sleep out the rest of the current frame interval, started at *tick*."""
+        if self.fixed == 0:
+            return
+        with self._lock:
+            self.rate = self.fixed or self._target()
+        time.sleep(max(0, 1/self.rate-(time.time()-tick)))
+
+    def throttle(self, busy: float):
+        """Offline mode: after *busy* seconds of inference, idle long enough to
+        keep the duty cycle within cpu_budget."""
+        if self.fixed == 0 or not self.cpu_budget or self.cpu_budget >= 1:
+            return
+        time.sleep(busy*(1/self.cpu_budget-1))
+
+    def __str__(self):
+        return f"rate={self.rate:.2f}fps busy={self._busy*1000:.0f}ms"
+
+
+def make_scheduler(args, speed: Optional[Callable[[], Optional[float]]] = None,
+                   offline: bool = False) -> RateScheduler:
+    """*offline* (folder runs) leaves the CPU budget off unless --cpu_budget was given."""
+    if speed is None and args.speed_file:
+        speed = speed_from_file(args.speed_file)
+    cpu_budget = args.cpu_budget
+    if cpu_budget is None:
+        cpu_budget = 0.0 if offline else CPU_BUDGET
+    return RateScheduler(args.min_fps, args.max_fps, cpu_budget, args.active_hold, speed,
+                         args.metres_per_frame, fixed=args.fps)
@@ -0,0 +1,113 @@
+# severity.py – edge-side pre-filter deciding which sequences are worth uploading
+# Every uploaded issue costs uplink bytes and one Bedrock analysis in the cloud.
+# A sequence is dropped on the box when any rule fails:
+#  • conf   : best detection confidence below --min_severity_conf
+#  • class  : majority crack class in --drop_classes (names from data.yaml)
+#  • size   : estimated length / width in cm below --min_length_cm / --min_width_cm
+#  • hits   : track seen in fewer than --min_track_hits frames
+# Dropped sequences are not lost silently: they are tallied per reason and per
+# class in hourly buckets of a rolling counters JSON (last --counters_hours),
+# rewritten atomically at most every few seconds and on close.
+
+import json
+import os
+import threading
+import time
+from collections import Counter
+from typing import List, Optional
+
+import yaml
+
+REASONS = ("conf", "class", "size", "hits")
+
+
+def load_class_names(data_yaml: str) -> List[str]:
+    with open(data_yaml) as f:
+        names = yaml.safe_load(f)["names"]
+    return list(names.values()) if isinstance(names, dict) else list(names)
+
+
+class SeverityFilter:
+    def __init__(self, min_conf: float = 0.0, drop_classes=(), min_length_cm: float = 0.0,
+                 min_width_cm: float = 0.0, min_hits: int = 1, counters_path: Optional[str] = None,
+                 window_hours: int = 24, write_every: float = 10.0):
+        self.min_conf, self.drop_classes = min_conf, set(drop_classes)
+        self.min_length_cm, self.min_width_cm, self.min_hits = min_length_cm, min_width_cm, min_hits
+        self.counters_path, self.window_hours, self.write_every = counters_path, window_hours, write_every
+        self._lock = threading.Lock()
+        self._buckets = self._load()
+        self._last_write = 0.0
+        self.kept = self.dropped = 0
+
+    def reason(self, conf: float, crack_type: str, length_cm: float, width_cm: float, hits: int) -> Optional[str]:
+        """First failing rule, or None if the sequence should be uploaded."""
+        if conf < self.min_conf:
+            return "conf"
+        if crack_type in self.drop_classes:
+            return "class"
+        if length_cm < self.min_length_cm or width_cm < self.min_width_cm:
+            return "size"
+        if hits < self.min_hits:
+            return "hits"
+        return None
+
+    def admit(self, conf: float, crack_type: str, length_cm: float, width_cm: float, hits: int) -> bool:
+        why = self.reason(conf, crack_type, length_cm, width_cm, hits)
+        with self._lock:
+            bucket = self._buckets.setdefault(time.strftime("%Y-%m-%dT%H:00"), {"kept": 0, "dropped": {}, "by_class": {}})
+            if why is None:
+                self.kept += 1
+                bucket["kept"] += 1
+            else:
+                self.dropped += 1
+                bucket["dropped"][why] = bucket["dropped"].get(why, 0)+1
+                bucket["by_class"][crack_type] = bucket["by_class"].get(crack_type, 0)+1
+        if why is not None:
+            print(f"[FILTER] dropped {crack_type} conf={conf:.2f} {length_cm}x{width_cm}cm hits={hits}: {why}")
+            self._write()
+        return why is None
+
+    # -------- rolling counters file --------
+
+    def _load(self) -> dict:
+        if not self.counters_path or not os.path.exists(self.counters_path):
+            return {}
+        try:
+            with open(self.counters_path) as f:
+                return json.load(f).get("hours", {})
+        except (OSError, ValueError) as e:
+            print(f"[FILTER] ignoring unreadable {self.counters_path}: {e}")
+            return {}
+
+    def totals(self) -> dict:
+        with self._lock:
+            dropped, by_class = Counter(), Counter()
+            for b in self._buckets.values():
+                dropped.update(b["dropped"]); by_class.update(b["by_class"])
+            return {"kept": sum(b["kept"] for b in self._buckets.values()),
+                    "dropped": dict(dropped), "dropped_by_class": dict(by_class)}
+
+    def _write(self, force: bool = False):
+        if not self.counters_path or (not force and time.time()-self._last_write < self.write_every):
+            return
+        cutoff = time.strftime("%Y-%m-%dT%H:00", time.localtime(time.time()-self.window_hours*3600))
+        with self._lock:
+            self._buckets = {h: b for h, b in self._buckets.items() if h >= cutoff}
+            hours = json.loads(json.dumps(self._buckets))
+        doc = {"updated": time.strftime("%Y-%m-%d %H:%M:%S"), "window_hours": self.window_hours,
+               "totals": self.totals(), "hours": hours}
+        tmp = self.counters_path+".tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump(doc, f, indent=2, ensure_ascii=False)
+            os.replace(tmp, self.counters_path)
+            self._last_write = time.time()
+        except OSError as e:
+            print(f"[FILTER] cannot write {self.counters_path}: {e}")
+
+    def close(self):
+        self._write(force=True)
+
+    def __str__(self):
+        total = self.kept+self.dropped
+        return f"filter: dropped={self.dropped}/{total} ({self.dropped/total if total else 0:.0%})"
@@ -0,0 +1,151 @@
+# stub_server.py – local stand-in for the CloudFront /presigned endpoint
+# Speaks the same contract as the presigned_url Lambda, as used by uploader.py:
+#  • POST /presigned {"object_key": k}  → {"presigned_url": http://<stub>/upload/<k>.jpg}
+#  • POST /upload/<k>.jpg  (binary JPG) → 200
+#  • POST /presigned <metadata JSON>    → 200
+#  • POST /presigned {"ingest": [ids]}  → presigned POST targets (image + metadata)
+#  • POST /s3  (multipart form, key field) → 204, like an S3 presigned POST
+# and can degrade the link like a poor cellular uplink:
+#  --rtt_ms        extra latency added to every request
+#  --handshake_ms  delay on every *new* TCP connection (stands in for the TLS handshake)
+#  --uplink_kbps   request-body throttle
+#  --error_rate    fraction of requests answered with 503
+# Run standalone:  python stub_server.py --port 8080 --rtt_ms 300 --uplink_kbps 512
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so pooled clients can reuse the connection
+
+    def setup(self):
+        super().setup()
+        self.server.count("connections")
+        if self.server.handshake_ms:
+            time.sleep(self.server.handshake_ms/1000)
+
+    def log_message(self, *_):
+        pass
+
+    def _read_body(self) -> bytes:
+        n = int(self.headers.get("Content-Length", 0) or 0)
+        body = self.rfile.read(n) if n else b""
+        if self.server.uplink_kbps:
+            time.sleep(len(body)*8/(self.server.uplink_kbps*1000))
+        return body
+
+    def _send(self, code: int, obj: dict):
+        data = json.dumps(obj).encode() if code != 204 else b""
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        body = self._read_body()
+        if self.server.rtt_ms:
+            time.sleep(self.server.rtt_ms/1000)
+        if random.random() < self.server.error_rate:
+            self.server.count("errors")
+            return self._send(503, {"error": "simulated uplink failure"})
+        if self.path.startswith("/s3"):
+            m = re.search(rb'name="key"\r\n\r\n([^\r]*)\r\n', body)
+            if not m:
+                return self._send(400, {"error": "missing key field"})
+            self.server.count("s3_metadata" if m.group(1).endswith(b".json") else "images", len(body))
+            return self._send(204, {})
+        if self.path.startswith("/upload/"):
+            self.server.count("images", len(body))
+            return self._send(200, {"message": "File uploaded successfully"})
+        if self.path.rstrip("/").endswith("/presigned"):
+            try:
+                data = json.loads(body or b"{}")
+            except ValueError:
+                return self._send(400, {"error": "invalid JSON"})
+            if "ingest" in data and len(data) == 1:
+                self.server.count("ingest")
+                s3 = f"{self.server.base_url}/s3"
+                return self._send(200, {"targets": [
+                    {"id": k,
+                     "image": {"url": s3, "fields": {"key": f"issue/{k}/{k}.jpg", "Content-Type": "image/jpg"}},
+                     "metadata": {"url": s3, "fields": {"key": f"issue/{k}/{k}.json", "Content-Type": "application/json"}},
+                     "s3_url": f"{s3}/issue/{k}/{k}.jpg"} for k in data["ingest"]]})
+            if "object_key" in data and len(data) == 1:
+                key = data["object_key"]
+                self.server.count("presigned")
+                return self._send(200, {"presigned_url": f"{self.server.base_url}/upload/{key}.jpg",
+                                        "operation": "put", "key": f"issue/{key}/{key}.jpg"})
+            if "id" in data:
+                self.server.count("metadata", len(body))
+                return self._send(200, {"message": "File uploaded successfully"})
+            return self._send(400, {"error": "Missing required parameter: object_key"})
+        return self._send(404, {"error": f"no route {self.path}"})
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, *, rtt_ms: float = 0, handshake_ms: float = 0,
+                 uplink_kbps: float = 0, error_rate: float = 0.0):
+        super().__init__((host, port), _Handler)
+        self.rtt_ms, self.handshake_ms = rtt_ms, handshake_ms
+        self.uplink_kbps, self.error_rate = uplink_kbps, error_rate
+        self.counters = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def url(self) -> str:
+        return f"{self.base_url}/presigned"
+
+    def count(self, name: str, nbytes: int = 0):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + 1
+            if nbytes:
+                self.counters[f"{name}_bytes"] = self.counters.get(f"{name}_bytes", 0) + nbytes
+
+    def start(self) -> "StubServer":
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    ap = argparse.ArgumentParser("Local /presigned stub with a simulated uplink")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8080)
+    ap.add_argument("--rtt_ms", type=float, default=0)
+    ap.add_argument("--handshake_ms", type=float, default=0)
+    ap.add_argument("--uplink_kbps", type=float, default=0)
+    ap.add_argument("--error_rate", type=float, default=0.0)
+    args = ap.parse_args()
+    srv = StubServer(args.host, args.port, rtt_ms=args.rtt_ms, handshake_ms=args.handshake_ms,
+                     uplink_kbps=args.uplink_kbps, error_rate=args.error_rate)
+    print(f"[STUB] listening on {srv.url}  (run inference.py with --api_url {srv.url})")
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        srv.server_close()
+        print("[STUB] counters:", srv.counters)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+import numpy as np
+
+from frame_gate import FrameGate
+
+
+def _frame(value: int) -> np.ndarray:
+    return np.full((120, 160, 3), value, dtype=np.uint8)
+
+
+def test_static_frames_are_skipped():
+    gate = FrameGate(threshold=2.0)
+    decisions = [gate.should_infer(_frame(100)) for _ in range(5)]
+    assert decisions == [True, False, False, False, False]
+    assert (gate.inferred, gate.skipped) == (1, 4)
+    assert str(gate) == "gate: skipped=4/5 (80%)"
+
+
+def test_change_triggers_inference():
+    gate = FrameGate(threshold=2.0)
+    assert gate.should_infer(_frame(100))
+    assert not gate.should_infer(_frame(101))
+    assert gate.should_infer(_frame(150))
+
+
+def test_slow_drift_adds_up_against_last_inferred_frame():
+    gate = FrameGate(threshold=2.0)
+    decisions = [gate.should_infer(_frame(100+v)) for v in range(5)]
+    # compared with the frame at 100, not the previous one: 101, 102 … → fires at 102
+    assert decisions == [True, False, True, False, True]
+
+
+def test_max_skip_forces_inference():
+    gate = FrameGate(threshold=2.0, max_skip=2)
+    decisions = [gate.should_infer(_frame(100)) for _ in range(7)]
+    assert decisions == [True, False, False, True, False, False, True]
+    assert (gate.inferred, gate.skipped) == (3, 4)
+
+
+def test_threshold_zero_disables_gate():
+    gate = FrameGate(threshold=0)
+    assert all(gate.should_infer(_frame(100)) for _ in range(3))
+    assert (gate.inferred, gate.skipped) == (3, 0)
+    assert str(FrameGate(threshold=1)) == "gate: skipped=0/0 (0%)"
@@ -0,0 +1,76 @@
+import time
+
+import pytest
+
+import outbox
+from outbox import Outbox
+
+
+@pytest.fixture
+def box(tmp_path):
+    ob = Outbox(str(tmp_path / "outbox.db"))
+    yield ob
+    ob.close()
+
+
+def _expire(ob, issue_id):
+    ob._exec("UPDATE outbox SET next_try=? WHERE issue_id=?", (time.time()-1, issue_id))
+
+
+def test_added_row_waits_for_its_lease(box):
+    box.add("issue_1", "/tmp/issue_1.jpg", {"k": 1})
+    assert box.pending() == 1
+    assert box.due(10) == []
+
+
+def test_add_is_idempotent(box):
+    box.add("issue_1", "/tmp/a.jpg", {"k": 1})
+    box.add("issue_1", "/tmp/b.jpg", {"k": 2})
+    _expire(box, "issue_1")
+    rows = box.due(10)
+    assert [r["jpg_path"] for r in rows] == ["/tmp/a.jpg"]
+    assert rows[0]["meta"] == {"k": 1}
+
+
+def test_expired_lease_is_claimed_once(box):
+    box.add("issue_1", "/tmp/issue_1.jpg", {})
+    _expire(box, "issue_1")
+    assert [r["issue_id"] for r in box.due(10)] == ["issue_1"]
+    # claimed: a second drainer pass must not hand it out again
+    assert box.due(10) == []
+
+
+def test_due_respects_limit_and_order(box):
+    for i in range(3):
+        box.add(f"issue_{i}", f"/tmp/{i}.jpg", {})
+        _expire(box, f"issue_{i}")
+    assert [r["issue_id"] for r in box.due(2)] == ["issue_0", "issue_1"]
+    assert [r["issue_id"] for r in box.due(2)] == ["issue_2"]
+
+
+def test_stage_progress_renews_lease(box):
+    box.add("issue_1", "/tmp/issue_1.jpg", {})
+    _expire(box, "issue_1")
+    box.image_done("issue_1", "https://bucket/issue_1.jpg")
+    assert box.due(10) == []
+    _expire(box, "issue_1")
+    box.renew("issue_1")
+    assert box.due(10) == []
+    _expire(box, "issue_1")
+    assert box.due(10)[0]["image_url"] == "https://bucket/issue_1.jpg"
+
+
+def test_failed_backs_off(box):
+    box.add("issue_1", "/tmp/issue_1.jpg", {})
+    before = time.time()
+    box.failed("issue_1", "boom")
+    attempts, next_try, error = box._exec("SELECT attempts, next_try, last_error FROM outbox")[0]
+    assert (attempts, error) == (1, "boom")
+    assert before + 30 <= next_try <= time.time() + outbox.MAX_BACKOFF
+    box.failed("missing", "ignored")
+
+
+def test_done_removes_row(box):
+    box.add("issue_1", "/tmp/issue_1.jpg", {})
+    box.done("issue_1")
+    assert box.pending() == 0
@@ -0,0 +1,72 @@
+import argparse
+import time
+
+import pytest
+
+import scheduler
+from scheduler import CPU_BUDGET, RateScheduler, make_scheduler
+
+
+def _args(**kw):
+    base = dict(min_fps=0.5, max_fps=5.0, cpu_budget=None, active_hold=3.0, speed_file=None,
+                metres_per_frame=1.0, fps=None)
+    base.update(kw)
+    return argparse.Namespace(**base)
+
+
+@pytest.mark.parametrize("min_fps", [0, -1])
+def test_rejects_non_positive_min_fps(min_fps):
+    with pytest.raises(ValueError):
+        RateScheduler(min_fps=min_fps)
+
+
+def test_idle_rate_is_min_fps():
+    s = RateScheduler(min_fps=0.5, max_fps=5.0)
+    assert s._target() == 0.5
+
+
+def test_activity_holds_max_then_halves(monkeypatch):
+    s = RateScheduler(min_fps=0.5, max_fps=4.0, cpu_budget=0, active_hold=3.0)
+    now = 1000.0
+    monkeypatch.setattr(scheduler.time, "time", lambda: now)
+    s.observe(detections=2, busy=0.01)
+    assert s._target() == 4.0
+    now += 3.5
+    assert s._target() == 2.0
+    now += 60
+    assert s._target() == 0.5
+
+
+def test_speed_hook_raises_rate():
+    s = RateScheduler(min_fps=0.5, max_fps=10.0, cpu_budget=0, speed=lambda: 36.0, metres_per_frame=2.0)
+    assert s._target() == pytest.approx(5.0)  # 10 m/s over 2 m per frame
+    s.speed = lambda: None
+    assert s._target() == 0.5
+
+
+def test_cpu_budget_caps_rate():
+    s = RateScheduler(min_fps=0.5, max_fps=5.0, cpu_budget=0.5)
+    s.observe(detections=1, busy=0.5)
+    assert s._target() == pytest.approx(1.0)
+
+
+def test_fixed_zero_is_unpaced():
+    s = RateScheduler(fixed=0)
+    t0 = time.perf_counter()
+    s.wait(time.time())
+    s.throttle(10.0)
+    assert time.perf_counter() - t0 < 0.1
+
+
+def test_throttle_keeps_duty_cycle(monkeypatch):
+    slept = []
+    monkeypatch.setattr(scheduler.time, "sleep", slept.append)
+    RateScheduler(cpu_budget=0.5).throttle(0.2)
+    RateScheduler(cpu_budget=0).throttle(0.2)
+    assert slept == [pytest.approx(0.2)]
+
+
+def test_cpu_budget_default_depends_on_mode():
+    assert make_scheduler(_args()).cpu_budget == CPU_BUDGET
+    assert make_scheduler(_args(), offline=True).cpu_budget == 0
+    assert make_scheduler(_args(cpu_budget=0.3), offline=True).cpu_budget == 0.3
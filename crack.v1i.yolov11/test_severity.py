@@ -0,0 +1,66 @@
+import json
+
+import pytest
+
+from severity import SeverityFilter, load_class_names
+
+
+@pytest.mark.parametrize("kwargs, why", [
+    (dict(conf=0.2), "conf"),
+    (dict(crack_type="stain"), "class"),
+    (dict(length=3.0), "size"),
+    (dict(width=0.05), "size"),
+    (dict(hits=1), "hits"),
+    ({}, None),
+])
+def test_first_failing_rule(kwargs, why):
+    flt = SeverityFilter(min_conf=0.5, drop_classes=["stain"], min_length_cm=5, min_width_cm=0.1, min_hits=2)
+    args = dict(conf=0.8, crack_type="crack", length=10.0, width=0.3, hits=3)
+    args.update(kwargs)
+    assert flt.reason(args["conf"], args["crack_type"], args["length"], args["width"], args["hits"]) == why
+
+
+def test_rule_order_conf_before_class():
+    flt = SeverityFilter(min_conf=0.5, drop_classes=["stain"])
+    assert flt.reason(0.1, "stain", 10, 1, 3) == "conf"
+
+
+def test_admit_counts_and_writes_counters(tmp_path):
+    path = tmp_path / "counters.json"
+    flt = SeverityFilter(min_conf=0.5, drop_classes=["stain"], counters_path=str(path), write_every=3600)
+    assert flt.admit(0.9, "crack", 10, 1, 3)
+    assert not flt.admit(0.1, "crack", 10, 1, 3)
+    assert not flt.admit(0.9, "stain", 10, 1, 3)
+    assert not flt.admit(0.9, "stain", 10, 1, 3)
+    assert (flt.kept, flt.dropped) == (1, 3)
+    assert str(flt) == "filter: dropped=3/4 (75%)"
+    flt.close()
+    doc = json.loads(path.read_text())
+    assert doc["totals"] == {"kept": 1, "dropped": {"conf": 1, "class": 2},
+                             "dropped_by_class": {"crack": 1, "stain": 2}}
+
+
+def test_counters_survive_restart_and_roll_off(tmp_path):
+    path = tmp_path / "counters.json"
+    path.write_text(json.dumps({"hours": {
+        "2000-01-01T00:00": {"kept": 5, "dropped": {"size": 2}, "by_class": {"crack": 2}}}}))
+    flt = SeverityFilter(min_hits=2, counters_path=str(path), window_hours=24)
+    assert flt.totals()["kept"] == 5
+    flt.admit(0.9, "crack", 10, 1, 1)
+    flt.close()
+    doc = json.loads(path.read_text())
+    assert "2000-01-01T00:00" not in doc["hours"]
+    assert doc["totals"]["dropped"] == {"hits": 1}
+
+
+def test_unreadable_counters_are_ignored(tmp_path):
+    path = tmp_path / "counters.json"
+    path.write_text("{not json")
+    assert SeverityFilter(counters_path=str(path)).totals()["kept"] == 0
+
+
+def test_load_class_names(tmp_path):
+    (tmp_path / "a.yaml").write_text("names: ['crack', 'stain']\n")
+    (tmp_path / "b.yaml").write_text("names:\n  0: crack\n  1: stain\n")
+    assert load_class_names(str(tmp_path / "a.yaml")) == ["crack", "stain"]
+    assert load_class_names(str(tmp_path / "b.yaml")) == ["crack", "stain"]
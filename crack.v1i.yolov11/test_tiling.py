@@ -0,0 +1,70 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+import torch
+
+from tiling import TiledPredictor, merge_detections, tile_grid
+
+
+def test_tile_grid_covers_frame():
+    windows = tile_grid(1080, 1920, 640, 0.2)
+    assert windows[0] == (0, 0, 640, 640)
+    assert max(x1 for _, _, x1, _ in windows) == 1920
+    assert max(y1 for _, _, _, y1 in windows) == 1080
+    assert all(x1-x0 == 640 and y1-y0 == 640 for x0, y0, x1, y1 in windows)
+    assert tile_grid(480, 600, 640, 0.2) == [(0, 0, 600, 480)]
+
+
+def test_nms_keeps_best_box_per_class():
+    boxes = [[0, 0, 100, 20], [2, 0, 102, 20], [0, 0, 100, 20]]
+    b, c, k = merge_detections(boxes, [0.6, 0.9, 0.5], [0, 0, 1], 0.5, "nms")
+    assert sorted(k) == [0, 1]
+    assert c[k.index(0)] == pytest.approx(0.9) and c[k.index(1)] == pytest.approx(0.5)
+    assert b[k.index(0)] == [2, 0, 102, 20]
+
+
+def test_nmm_merges_crack_cut_by_tile_border():
+    # two halves of one crack, the smaller one fully inside the overlap band
+    boxes = [[400, 100, 640, 120], [512, 100, 900, 121]]
+    b, c, k = merge_detections(boxes, [0.7, 0.8], [0, 0], 0.5, "nmm")
+    assert b == [[400, 100, 900, 121]] and c == [pytest.approx(0.8)] and k == [0]
+    b, _, _ = merge_detections(boxes, [0.7, 0.8], [0, 0], 0.5, "nms")
+    assert len(b) == 2  # IoU is too low for NMS to touch them
+
+
+def test_merge_of_nothing():
+    assert merge_detections([], [], []) == ([], [], [])
+
+
+class FakeModel:
+    """Reports one box at tile-local (10, 10, 50, 30) on every image it sees."""
+    def __init__(self):
+        self.calls = []
+
+    def predict(self, source, conf, imgsz, save, verbose):
+        self.calls.append((len(source), imgsz))
+        boxes = SimpleNamespace(xyxy=torch.tensor([[10., 10., 50., 30.]]), conf=torch.tensor([0.9]),
+                                cls=torch.tensor([2.]))
+        return [SimpleNamespace(boxes=boxes, names={2: "crack"}) for _ in source]
+
+
+def test_tiled_predictor_shifts_boxes_to_frame_coordinates():
+    model = FakeModel()
+    tp = TiledPredictor(model, tile=640, overlap=0.0, batch=2, imgsz=640, merge="nms")
+    frame = np.zeros((640, 1280, 3), np.uint8)
+    (dets,), names = tp.predict([frame], conf=0.25)
+    boxes, confs, cls = dets
+    assert sorted(boxes) == [[10, 10, 50, 30], [650, 10, 690, 30]]
+    assert cls == [2, 2] and names == {2: "crack"}
+    assert tp.tiles_run == 2 and model.calls == [(2, 640)]
+
+
+def test_small_frame_bypasses_slicing_and_full_frame_adds_one_pass():
+    model = FakeModel()
+    tp = TiledPredictor(model, tile=640, batch=8)
+    tp.predict([np.zeros((480, 640, 3), np.uint8)], conf=0.25)
+    assert tp.tiles_run == 1
+    tp = TiledPredictor(FakeModel(), tile=640, overlap=0.0, full_frame=True)
+    tp.predict([np.zeros((640, 1280, 3), np.uint8)], conf=0.25)
+    assert tp.tiles_run == 3
@@ -0,0 +1,73 @@
+import numpy as np
+
+from tracker import ByteTracker, iou_matrix
+
+
+def _frame() -> np.ndarray:
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 255, (480, 640, 3), dtype=np.uint8)
+
+
+def test_iou_matrix():
+    a = np.array([[0, 0, 10, 10]], dtype=np.float32)
+    b = np.array([[0, 0, 10, 10], [5, 0, 15, 10], [20, 20, 30, 30]], dtype=np.float32)
+    assert np.allclose(iou_matrix(a, b), [[1.0, 1/3, 0.0]])
+    assert iou_matrix(a, np.zeros((0, 4), np.float32)).shape == (1, 0)
+
+
+def test_moving_crack_keeps_one_id():
+    frame, tracker = _frame(), ByteTracker(max_age=2)
+    for x in range(100, 300, 20):
+        assert tracker.update(frame, [[x, 200, x+80, 240]], [0.8], [1]) == []
+    assert len(tracker.tracks) == 1
+    (track,) = tracker.flush()
+    assert track.hits == 10 and track.classes == [1]*10
+    assert track.conf == np.float32(0.8)
+
+
+def test_low_confidence_box_keeps_track_alive():
+    frame, tracker = _frame(), ByteTracker(high=0.5, low=0.1, max_age=0)
+    tracker.update(frame, [[100, 100, 200, 150]], [0.9], [0])
+    track_id = tracker.tracks[0].id
+    # below `high`: would not start a track, but continues the existing one
+    assert tracker.update(frame, [[102, 100, 202, 150]], [0.2], [0]) == []
+    assert [t.id for t in tracker.tracks] == [track_id]
+    assert tracker.tracks[0].hits == 2
+
+
+def test_track_survives_short_gap_then_finishes_once():
+    frame, tracker = _frame(), ByteTracker(max_age=2)
+    tracker.update(frame, [[100, 100, 200, 150]], [0.9], [0])
+    track_id = tracker.tracks[0].id
+    assert tracker.update(frame, [], [], []) == []
+    assert tracker.update(frame, [[100, 100, 200, 150]], [0.9], [0]) == []
+    assert [t.id for t in tracker.tracks] == [track_id]
+    for _ in range(2):
+        assert tracker.update(frame, [], [], []) == []
+    finished = tracker.update(frame, [], [], [])
+    assert [t.id for t in finished] == [track_id]
+    assert tracker.tracks == [] and tracker.flush() == []
+
+
+def test_separate_cracks_get_separate_ids():
+    frame, tracker = _frame(), ByteTracker()
+    tracker.update(frame, [[10, 10, 60, 40], [300, 300, 380, 340]], [0.9, 0.7], [0, 2])
+    ids = {t.id for t in tracker.tracks}
+    tracker.update(frame, [[300, 300, 380, 340], [12, 10, 62, 40]], [0.7, 0.9], [2, 0])
+    assert {t.id for t in tracker.tracks} == ids and len(ids) == 2
+
+
+def test_min_hits_drops_single_frame_tracks():
+    frame, tracker = _frame(), ByteTracker(min_hits=2)
+    tracker.update(frame, [[10, 10, 60, 40]], [0.9], [0])
+    assert tracker.flush() == []
+
+
+def test_crop_budget_finishes_oldest_first():
+    frame = _frame()
+    tracker = ByteTracker(max_bytes=50*30*3+1)
+    tracker.update(frame, [[10, 10, 60, 40]], [0.9], [0])
+    oldest = tracker.tracks[0].id
+    finished = tracker.update(frame, [[10, 10, 60, 40], [300, 300, 350, 330]], [0.9, 0.9], [0, 0])
+    assert [t.id for t in finished] == [oldest]
+    assert len(tracker.tracks) == 1
@@ -0,0 +1,104 @@
+# tiling.py – sliced inference for high-resolution tunnel frames
+# Hairline cracks a few pixels wide vanish when a 1920×1080 frame is letterboxed
+# down to YOLO's 640 input. With --tile N each frame is cut into overlapping
+# N×N windows that are run at native resolution:
+#  1. tile_grid() lays windows with --tile_overlap (fraction of N), the last
+#     row / column snapped to the frame border so every pixel is covered
+#  2. the tiles of every frame in the batch go through model.predict in chunks
+#     of --tile_batch; --tile_full adds the whole frame (letterboxed as before)
+#     so large cracks spanning several tiles are still seen in one piece
+#  3. boxes are shifted back to frame coordinates and merged across tiles:
+#     • nms : class-aware NMS on IoU
+#     • nmm : greedy non-maximum *merge* on intersection-over-smaller, so the
+#             halves of a crack cut by a tile border become one union box
+# Frames no larger than one tile bypass slicing entirely.
+
+from typing import List, Tuple
+
+import numpy as np
+
+MERGE_MODES = ("nmm", "nms")
+
+
+def tile_grid(h: int, w: int, tile: int, overlap: float) -> List[Tuple[int, int, int, int]]:
+    """xyxy windows of size tile×tile (clipped for frames smaller than a tile)."""
+    step = max(1, int(tile*(1-overlap)))
+
+    def starts(n):
+        if n <= tile:
+            return [0]
+        s = list(range(0, n-tile, step))
+        return s+[n-tile]
+    return [(x, y, min(x+tile, w), min(y+tile, h)) for y in starts(h) for x in starts(w)]
+
+
+def _overlap(box: np.ndarray, others: np.ndarray, mode: str) -> np.ndarray:
+    tl = np.maximum(box[:2], others[:, :2])
+    br = np.minimum(box[2:], others[:, 2:])
+    inter = np.clip(br-tl, 0, None).prod(-1)
+    a = (box[2:]-box[:2]).prod()
+    b = (others[:, 2:]-others[:, :2]).prod(-1)
+    denom = np.minimum(a, b) if mode == "nmm" else a+b-inter
+    return inter/np.maximum(denom, 1e-6)
+
+
+def merge_detections(boxes, confs, classes, thresh: float = 0.5, mode: str = "nmm"):
+    """Cross-tile NMS / NMM, per class. Returns (boxes, confs, classes) as lists."""
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    confs = np.asarray(confs, dtype=np.float32)
+    classes = np.asarray(classes, dtype=np.int64)
+    out_b, out_c, out_k = [], [], []
+    for k in np.unique(classes):
+        idx = np.flatnonzero(classes == k)
+        idx = idx[np.argsort(-confs[idx])]
+        while len(idx):
+            i, rest = idx[0], idx[1:]
+            hit = _overlap(boxes[i], boxes[rest], mode) >= thresh if len(rest) else np.zeros(0, bool)
+            box = boxes[i].copy()
+            if mode == "nmm" and hit.any():
+                group = boxes[rest[hit]]
+                box[:2] = np.minimum(box[:2], group[:, :2].min(0))
+                box[2:] = np.maximum(box[2:], group[:, 2:].max(0))
+            out_b.append([int(v) for v in box]); out_c.append(float(confs[i])); out_k.append(int(k))
+            idx = rest[~hit]
+    return out_b, out_c, out_k
+
+
+class TiledPredictor:
+    """model.predict drop-in for lists of frames: returns one (boxes, confs, cls)
+    per frame in frame coordinates, plus the model's class names."""
+
+    def __init__(self, model, tile: int, overlap: float = 0.2, batch: int = 8, imgsz: int = 640,
+                 full_frame: bool = False, merge: str = "nmm", merge_thresh: float = 0.5):
+        self.model, self.tile, self.overlap, self.batch = model, tile, overlap, max(1, batch)
+        self.imgsz, self.full_frame = imgsz, full_frame
+        self.merge, self.merge_thresh = merge, merge_thresh
+        self.tiles_run = 0
+
+    def _run(self, images, conf: float):
+        results = []
+        for i in range(0, len(images), self.batch):
+            results += self.model.predict(source=images[i:i+self.batch], conf=conf, imgsz=self.imgsz,
+                                          save=False, verbose=False)
+        self.tiles_run += len(images)
+        return results
+
+    def predict(self, frames, conf: float):
+        jobs = []  # (frame index, x offset, y offset, image)
+        for fi, frame in enumerate(frames):
+            h, w = frame.shape[:2]
+            windows = tile_grid(h, w, self.tile, self.overlap)
+            if len(windows) == 1 or self.full_frame:
+                jobs.append((fi, 0, 0, frame))
+            if len(windows) > 1:
+                jobs += [(fi, x0, y0, frame[y0:y1, x0:x1]) for x0, y0, x1, y1 in windows]
+        results = self._run([im for *_, im in jobs], conf)
+        raw = [([], [], []) for _ in frames]
+        names = {}
+        for (fi, dx, dy, _), res in zip(jobs, results):
+            names = res.names
+            b, c, k = raw[fi]
+            b += (res.boxes.xyxy.cpu().numpy()+np.array([dx, dy, dx, dy], dtype=np.float32)).tolist()
+            c += res.boxes.conf.tolist()
+            k += [int(v) for v in res.boxes.cls.tolist()]
+        return [merge_detections(b, c, k, self.merge_thresh, self.merge) for b, c, k in raw], names
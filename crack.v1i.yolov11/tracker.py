@@ -0,0 +1,144 @@
+# tracker.py – lightweight ByteTrack-style multi-frame crack tracker
+# Per frame:
+#  1. every live track predicts its box one frame ahead (constant velocity)
+#  2. high-confidence detections are matched to tracks by IoU (greedy)
+#  3. tracks still unmatched get a second chance against low-confidence boxes
+#  4. unmatched high-confidence boxes start new tracks
+#  5. a track that is unmatched for more than max_age frames, or whose predicted
+#     box has left the frame, is finished and returned exactly once
+# Each track keeps only its best-quality crop (confidence × sharpness, boxes cut
+# by the frame border penalised), never the full frames. With max_bytes set, the
+# oldest live tracks are finished early once their crops exceed that budget.
+
+import itertools
+from typing import List, Optional
+
+import cv2
+import numpy as np
+
+
+def iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU of xyxy boxes a (N,4) and b (M,4)."""
+    if not len(a) or not len(b):
+        return np.zeros((len(a), len(b)), dtype=np.float32)
+    tl = np.maximum(a[:, None, :2], b[None, :, :2])
+    br = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.clip(br-tl, 0, None).prod(-1)
+    area_a = (a[:, 2:]-a[:, :2]).prod(-1)
+    area_b = (b[:, 2:]-b[:, :2]).prod(-1)
+    return inter/np.maximum(area_a[:, None]+area_b[None, :]-inter, 1e-6)
+
+
+def _greedy_match(iou: np.ndarray, thresh: float):
+    """Greedy highest-IoU-first assignment → (pairs, unmatched_rows, unmatched_cols)."""
+    pairs, rows, cols = [], set(range(iou.shape[0])), set(range(iou.shape[1]))
+    if iou.size:
+        for r, c in zip(*np.unravel_index(np.argsort(-iou, axis=None), iou.shape)):
+            if iou[r, c] < thresh:
+                break
+            if r in rows and c in cols:
+                pairs.append((r, c)); rows.discard(r); cols.discard(c)
+    return pairs, sorted(rows), sorted(cols)
+
+
+def crop_quality(crop: np.ndarray, conf: float, touches_edge: bool) -> float:
+    if crop.size == 0:
+        return 0.0
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+    sharp = cv2.Laplacian(gray, cv2.CV_64F).var()
+    return conf*np.log1p(sharp)*(0.5 if touches_edge else 1.0)
+
+
+class Track:
+    _ids = itertools.count(1)
+
+    def __init__(self, box, conf: float, cls: int, frame: np.ndarray):
+        self.id = next(Track._ids)
+        self.box = np.asarray(box, dtype=np.float32)
+        self.vel = np.zeros(4, dtype=np.float32)
+        self.classes: List[int] = []
+        self.hits = 0
+        self.conf = 0.0  # best detection confidence seen
+        self.age = 0  # frames since last match
+        self.best_crop: Optional[np.ndarray] = None
+        self.best_box = None
+        self.best_score = -1.0
+        self._observe(box, conf, cls, frame)
+
+    def predict(self) -> np.ndarray:
+        return self.box+self.vel*(self.age+1)
+
+    def _observe(self, box, conf: float, cls: int, frame: np.ndarray):
+        h, w = frame.shape[:2]
+        x1, y1, x2, y2 = (int(v) for v in box)
+        x1, y1, x2, y2 = max(0, x1), max(0, y1), min(w, x2), min(h, y2)
+        self.hits += 1
+        self.conf = max(self.conf, float(conf))
+        self.classes.append(int(cls))
+        crop = frame[y1:y2, x1:x2]
+        q = crop_quality(crop, conf, x1 <= 0 or y1 <= 0 or x2 >= w or y2 >= h)
+        if q > self.best_score:
+            self.best_score, self.best_box, self.best_crop = q, [x1, y1, x2, y2], crop.copy()
+
+    def update(self, box, conf: float, cls: int, frame: np.ndarray):
+        box = np.asarray(box, dtype=np.float32)
+        self.vel = 0.5*self.vel+0.5*(box-self.box)/(self.age+1)
+        self.box, self.age = box, 0
+        self._observe(box, conf, cls, frame)
+
+
+class ByteTracker:
+    def __init__(self, high: float = 0.25, low: float = 0.1, match_iou: float = 0.3,
+                 max_age: int = 3, min_hits: int = 1, max_bytes: int = 0):
+        self.high, self.low, self.match_iou = high, low, match_iou
+        self.max_age, self.min_hits, self.max_bytes = max_age, min_hits, max_bytes
+        self.tracks: List[Track] = []
+
+    @staticmethod
+    def _left_view(box: np.ndarray, w: int, h: int) -> bool:
+        x1, y1, x2, y2 = box
+        vis = max(0.0, min(x2, w)-max(x1, 0))*max(0.0, min(y2, h)-max(y1, 0))
+        return vis < 0.5*max((x2-x1)*(y2-y1), 1e-6)
+
+    def update(self, frame: np.ndarray, boxes, confs, classes) -> List[Track]:
+        """Feed one frame's detections (may be empty); returns tracks finished on this frame."""
+        h, w = frame.shape[:2]
+        dets = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        confs = np.asarray(confs, dtype=np.float32)
+        hi = np.flatnonzero(confs >= self.high)
+        lo = np.flatnonzero((confs >= self.low) & (confs < self.high))
+        preds = np.array([t.predict() for t in self.tracks], dtype=np.float32).reshape(-1, 4)
+
+        pairs, free_t, free_hi = _greedy_match(iou_matrix(preds, dets[hi]), self.match_iou)
+        for ti, di in pairs:
+            d = hi[di]; self.tracks[ti].update(dets[d], confs[d], classes[d], frame)
+        pairs2, free_t2, _ = _greedy_match(iou_matrix(preds[free_t], dets[lo]), self.match_iou)
+        for ti, di in pairs2:
+            d = lo[di]; self.tracks[free_t[ti]].update(dets[d], confs[d], classes[d], frame)
+
+        finished, alive = [], []
+        lost = {free_t[i] for i in free_t2}
+        for i, t in enumerate(self.tracks):
+            if i in lost:
+                t.age += 1
+                if t.age > self.max_age or self._left_view(t.predict(), w, h):
+                    finished.append(t)
+                    continue
+            alive.append(t)
+        for di in free_hi:
+            d = hi[di]; alive.append(Track(dets[d], confs[d], classes[d], frame))
+        if self.max_bytes:
+            alive.sort(key=lambda t: t.id)
+            nbytes = sum(t.best_crop.nbytes for t in alive)
+            while alive and nbytes > self.max_bytes:
+                t = alive.pop(0)
+                nbytes -= t.best_crop.nbytes
+                finished.append(t)
+                print(f"[TRACK] crop budget exceeded → finishing #{t.id} early")
+        self.tracks = alive
+        return [t for t in finished if t.hits >= self.min_hits]
+
+    def flush(self) -> List[Track]:
+        """End of stream: finish every live track."""
+        done, self.tracks = self.tracks, []
+        return [t for t in done if t.hits >= self.min_hits]
@@ -1,11 +1,33 @@
 # train.py
+# 訓練：python train.py [--cache memmap] [--device cpu --workers 8]
+# 評估：python train.py --eval runs/crack_detector/weights/best.pt [--split test]
+# --cache memmap 由 dataset_cache.py 預先解碼 / 縮放影像到記憶體映射檔，之後每個 epoch 直接讀取
+import argparse
 import os
 from ultralytics import YOLO
 
+from dataset_cache import MemmapTrainer, MemmapValidator
+
 # （可選）繞過 Windows 下的 OpenMP 重複載入問題
 os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
 
+def parse_args():
+    ap = argparse.ArgumentParser("Train / evaluate the crack detector")
+    ap.add_argument("--weights", default="yolo11s.pt", help="預訓練權重，或改成 yolo11n.pt, yolo11m.pt 等")
+    ap.add_argument("--data", default="data.yaml")
+    ap.add_argument("--epochs", type=int, default=100)
+    ap.add_argument("--imgsz", type=int, default=640)
+    ap.add_argument("--batch", type=int, default=16)
+    ap.add_argument("--device", default="0", help='GPU 編號，若要用 CPU 填 "cpu"')
+    # Windows 下建議設 0；其他平台用多個 DataLoader worker
+    ap.add_argument("--workers", type=int, default=0 if os.name == "nt" else min(8, os.cpu_count() or 1))
+    ap.add_argument("--cache", choices=("memmap", "none"), default="memmap", help="影像快取（dataset_cache.py）")
+    ap.add_argument("--eval", metavar="WEIGHTS", help="只評估這個權重，不訓練")
+    ap.add_argument("--split", default="val", choices=("val", "test"), help="--eval 使用的資料集")
+    return ap.parse_args()
+
 def main():
+    args = parse_args()
     # 檢查 CUDA 是否可用
     import torch
     print("CUDA available:", torch.cuda.is_available())
@@ -13,18 +35,28 @@ def main():
         print("Using GPU:", torch.cuda.get_device_name(0))
     else:
         print("CUDA not available, using CPU.")
+        args.device = "cpu"
+    memmap = args.cache == "memmap"
+
+    if args.eval:
+        model = YOLO(args.eval)
+        m = model.val(data=args.data, split=args.split, imgsz=args.imgsz, batch=args.batch, device=args.device,
+                      workers=args.workers, validator=MemmapValidator if memmap else None)
+        print(f"mAP50={m.box.map50:.4f} mAP50-95={m.box.map:.4f}")
+        return
 
     # 載入預訓練權重
-    model = YOLO("yolo11s.pt")  # 或改成 yolo11n.pt, yolo11m.pt 等
+    model = YOLO(args.weights)
 
     # 開始訓練
     model.train(
-        data="data.yaml",      # dataset 配置
-        epochs=100,            # 訓練輪數
-        imgsz=640,             # 輸入尺寸
-        batch=16,              # batch size
-        device=0,              # GPU 編號，若要用 CPU 填 "cpu"
-        workers=0,             # Windows 下建議設 0
+        trainer=MemmapTrainer if memmap else None,
+        data=args.data,        # dataset 配置
+        epochs=args.epochs,    # 訓練輪數
+        imgsz=args.imgsz,      # 輸入尺寸
+        batch=args.batch,      # batch size
+        device=args.device,    # GPU 編號，若要用 CPU 填 "cpu"
+        workers=args.workers,  # DataLoader worker 數
         project="runs",        # 輸出資料夾
         name="crack_detector", # 輸出子資料夾名稱
         exist_ok=True          # 若 runs/crack_detector 已存在則覆寫
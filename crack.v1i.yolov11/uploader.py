@@ -0,0 +1,302 @@
+# uploader.py – presigned-URL upload client for the edge box
+# Flow per issue (unchanged):
+#  1. POST {"object_key": key}  → presigned URL (upload_url)
+#  2. POST binary JPG           → upload_url
+#  3. POST metadata JSON        → /presigned  (image_url = upload_url)
+# Features:
+#  • One keep-alive requests.Session shared by every upload, so CloudFront TLS
+#    handshakes are paid once per pooled connection instead of per request.
+#  • Thread pool with a bounded number of issues in flight (submit() blocks
+#    when all slots are busy, which pushes back on the upload queue).
+#  • _request() keeps the original retry / 429 Retry-After / backoff rules.
+#  • JPGs are POSTed straight from memory (bytes), no temp file round trip.
+#  • deliver() runs the whole cycle; with an optional outbox.Outbox, an issue
+#    whose live attempt gives up after MAX_RETRIES is journaled for replay. The
+#    live path touches no disk: only on that failure is the JPG written and
+#    fsynced, then the row added, so a row never points at a missing file.
+#    keep_local=False removes the spilled JPG once a replay uploads it.
+#  • ingest=True (--ingest) uses the Lambda's ingest mode instead:
+#      POST {"ingest": [id, ...]} → image + metadata presigned POST targets
+#      for up to INGEST_BATCH issues in one call; JPG and metadata JSON are
+#      then form-POSTed straight to S3, the Lambda never proxies the JSON.
+#    prefetch() fetches targets for a whole batch: the issues waiting in the
+#    upload stage (inference.py) and outbox replay bursts.
+
+import json
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional
+
+import requests
+from requests import Response
+from requests.adapters import HTTPAdapter
+
+API_POST_URL = os.environ.get("API_POST_URL", "https://d3hi3054wpq3c0.cloudfront.net/presigned")
+API_KEY      = "icam-540"
+MAX_RETRIES  = 5
+BASE_BACKOFF = 2   # seconds
+TIMEOUT      = 10  # seconds
+DEBUG_LEN    = 300 # body chars to show
+INGEST_BATCH = 25  # issues per ingest request (Lambda MAX_INGEST_BATCH)
+INGEST_TTL   = 600 # seconds a fetched target is reused (Lambda signs for 900)
+MAX_RETRY_AFTER = 60  # cap on a 429 Retry-After sleep (keeps one step inside outbox.LEASE)
+
+# -----------------------------------------------------------
+# Debug helpers
+# -----------------------------------------------------------
+
+def _dump(resp: Response, ctx: str):
+    print(f"[DEBUG] {ctx}: status={resp.status_code}")
+    print("[DEBUG] headers:", dict(resp.headers))
+    try:
+        body = resp.text
+        print(f"[DEBUG] body: {body[:DEBUG_LEN]}{'…' if len(body)>DEBUG_LEN else ''}")
+    except Exception as e:
+        print("[DEBUG] body decode error:", e)
+
+
+def make_session(pool_size: int) -> requests.Session:
+    """Session whose adapter keeps up to *pool_size* idle connections per host.
+    Retries stay in Uploader._request, so the adapter itself never retries."""
+    s = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(1, pool_size), max_retries=0)
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    return s
+
+
+def _spill(path: str, data: bytes):
+    """Atomically write *data* to *path* unless it is already there."""
+    if os.path.exists(path):
+        return
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+# -----------------------------------------------------------
+# Uploader
+# -----------------------------------------------------------
+
+class Uploader:
+    def __init__(self, api_url: str = API_POST_URL, workers: int = 4, pooled: bool = True,
+                 max_retries: int = MAX_RETRIES, outbox=None, ingest: bool = False, keep_local: bool = True):
+        self.api_url = api_url
+        self.keep_local = keep_local
+        self.ingest = ingest
+        self._targets = {}  # issue_id -> (fetched_at, ingest target)
+        self._targets_lock = threading.Lock()
+        self.workers = max(1, workers)
+        self.max_retries = max_retries
+        self.outbox = outbox
+        # pooled=False reproduces the old one-connection-per-request behaviour (benchmark baseline)
+        self.session = make_session(self.workers * 2) if pooled else None
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="upload")
+        self._slots = threading.BoundedSemaphore(self.workers)
+
+    def _renew(self, issue_id: str):
+        if self.outbox is not None:
+            self.outbox.renew(issue_id)
+
+    def _fail(self, issue_id: str, jpg_path: str, meta: dict, image_url: Optional[str],
+              live: Optional[bytes], error: str) -> bool:
+        """Record a failed attempt. *live* are the in-memory JPG bytes of a first
+        attempt, which is journaled only now (JPG spilled first unless it is up)."""
+        if self.outbox is not None:
+            if live is not None:
+                if not image_url:
+                    _spill(jpg_path, live)
+                self.outbox.add(issue_id, jpg_path, meta)
+                if image_url:
+                    self.outbox.image_done(issue_id, image_url)
+            self.outbox.failed(issue_id, error)
+        return False
+
+    def _done(self, issue_id: str, jpg_path: str):
+        self.outbox.done(issue_id)
+        if not self.keep_local:
+            try:
+                os.remove(jpg_path)
+            except OSError:
+                pass
+
+    # ---- resilient requester ----
+
+    def _request(self, method: str, url: str, *, headers: dict, data=None, json_body=None, files=None) -> Optional[Response]:
+        send = self.session.request if self.session is not None else requests.request
+        backoff = BASE_BACKOFF
+        for attempt in range(1, self.max_retries+1):
+            try:
+                resp = send(method, url, headers=headers, data=data, json=json_body, files=files, timeout=TIMEOUT)
+                if resp.status_code < 300:
+                    return resp
+                if resp.status_code == 429:
+                    retry = min(int(resp.headers.get("Retry-After", 0)) or backoff, MAX_RETRY_AFTER)
+                    print(f"[WARN] 429 {url} -> sleep {retry}s (attempt {attempt}/{self.max_retries})")
+                    time.sleep(retry)
+                    backoff *= 2
+                    continue
+                _dump(resp, f"{method} {url}")
+            except requests.RequestException as e:
+                print(f"[ERROR] {method} {url}: {e} (attempt {attempt}/{self.max_retries})")
+            if attempt < self.max_retries:
+                time.sleep(backoff)
+                backoff *= 2
+        print(f"[ERROR] exceeded retries for {url}")
+        return None
+
+    # ---- upload helpers ----
+
+    def get_presigned_url(self, object_key: str) -> Optional[str]:
+        headers = {"x-api-gateway-auth": API_KEY, "Content-Type": "application/json"}
+        resp = self._request("POST", self.api_url, headers=headers, json_body={"object_key": object_key})
+        if not resp:
+            return None
+        try:
+            data = resp.json()
+        except ValueError:
+            _dump(resp, "presigned-url NON-JSON")
+            return None
+        url = data.get("upload_url") or data.get("url") or data.get("presigned_url")
+        if not url:
+            print("[ERROR] presigned URL missing; see response above")
+        return url
+
+    def post_jpg(self, jpg: bytes, upload_url: str) -> bool:
+        headers = {"x-api-gateway-auth": API_KEY, "Content-Type": "image/jpg"}
+        resp = self._request("POST", upload_url, headers=headers, data=jpg)
+        if resp:
+            print(f"[UPLOAD] image POST success {resp.status_code}")
+            return True
+        print("[ERROR] image POST failed")
+        return False
+
+    def post_meta(self, meta: dict) -> bool:
+        headers = {"x-api-gateway-auth": API_KEY, "Content-Type": "application/json"}
+        return self._request("POST", self.api_url, headers=headers, json_body=meta) is not None
+
+    # ---- ingest mode ----
+
+    def prefetch(self, issue_ids) -> int:
+        """Fetch image + metadata targets for *issue_ids* in INGEST_BATCH-sized
+        calls; returns how many targets are now cached."""
+        now = time.time()
+        with self._targets_lock:
+            self._targets = {k: v for k, v in self._targets.items() if now-v[0] < INGEST_TTL}
+            missing = [i for i in dict.fromkeys(issue_ids) if i not in self._targets]
+        headers = {"x-api-gateway-auth": API_KEY, "Content-Type": "application/json"}
+        for i in range(0, len(missing), INGEST_BATCH):
+            resp = self._request("POST", self.api_url, headers=headers, json_body={"ingest": missing[i:i+INGEST_BATCH]})
+            try:
+                targets = resp.json()["targets"] if resp else []
+            except (ValueError, KeyError):
+                _dump(resp, "ingest NON-JSON")
+                targets = []
+            with self._targets_lock:
+                self._targets.update({t["id"]: (now, t) for t in targets})
+        with self._targets_lock:
+            return sum(1 for i in issue_ids if i in self._targets)
+
+    def _target(self, issue_id: str) -> Optional[dict]:
+        self.prefetch([issue_id])
+        with self._targets_lock:
+            entry = self._targets.get(issue_id)
+        if entry is None:
+            print(f"[ERROR] no ingest target for {issue_id}; see response above")
+        return entry[1] if entry else None
+
+    def post_form(self, post: dict, data: bytes, content_type: str, ctx: str) -> bool:
+        """multipart/form-data POST of *data* to an S3 presigned POST target."""
+        resp = self._request("POST", post["url"], headers={}, data=post["fields"],
+                             files={"file": ("blob", data, content_type)})
+        if resp:
+            print(f"[UPLOAD] {ctx} POST success {resp.status_code}")
+            return True
+        print(f"[ERROR] {ctx} POST failed")
+        return False
+
+    def _deliver_ingest(self, issue_id: str, meta: dict, image_url: Optional[str], jpg: Optional[bytes],
+                        jpg_path: str, live: Optional[bytes]) -> bool:
+        target = self._target(issue_id)
+        if target is None:
+            return self._fail(issue_id, jpg_path, meta, image_url, live, "ingest targets unavailable")
+        self._renew(issue_id)
+        if not image_url:
+            if not self.post_form(target["image"], jpg, "image/jpg", "image"):
+                return self._fail(issue_id, jpg_path, meta, image_url, live, "image upload failed")
+            image_url = target["s3_url"]
+            if self.outbox is not None and live is None:
+                self.outbox.image_done(issue_id, image_url)
+        meta["image_url"] = image_url
+        body = json.dumps(meta, ensure_ascii=False).encode("utf-8")
+        if not self.post_form(target["metadata"], body, "application/json", "metadata"):
+            return self._fail(issue_id, jpg_path, meta, image_url, live, "metadata POST failed")
+        with self._targets_lock:
+            self._targets.pop(issue_id, None)
+        if self.outbox is not None and live is None:
+            self._done(issue_id, jpg_path)
+        return True
+
+    def deliver(self, issue_id: str, jpg_path: str, meta: dict, image_url: Optional[str] = None,
+                jpg: Optional[bytes] = None) -> bool:
+        """Presign + JPG + metadata for one issue. Fills meta["image_url"].
+        *jpg* are the encoded bytes of a live first attempt, which writes nothing:
+        only if it fails are they spilled to *jpg_path* (fsynced) and the issue
+        journaled in the outbox, at the stage it reached. Without *jpg* this is
+        a replay of an outbox row: *jpg_path* is read, each finished stage is
+        recorded and the lease is renewed before every network step.
+        In ingest mode both objects go to S3 through presigned POST targets."""
+        live = jpg
+        if not image_url:
+            if jpg is None:
+                try:
+                    with open(jpg_path, "rb") as f:
+                        jpg = f.read()
+                except OSError as e:
+                    print(f"[ERROR] {issue_id}: image gone ({e}), dropping")
+                    if self.outbox is not None:
+                        self.outbox.done(issue_id)
+                    return False
+        if self.ingest:
+            return self._deliver_ingest(issue_id, meta, image_url, jpg, jpg_path, live)
+        if not image_url:
+            url = self.get_presigned_url(issue_id)
+            if url:
+                self._renew(issue_id)
+            if not url or not self.post_jpg(jpg, url):
+                return self._fail(issue_id, jpg_path, meta, None, live, "image upload failed")
+            image_url = url
+            if self.outbox is not None and live is None:
+                self.outbox.image_done(issue_id, image_url)
+        meta["image_url"] = image_url
+        if not self.post_meta(meta):
+            return self._fail(issue_id, jpg_path, meta, image_url, live, "metadata POST failed")
+        if self.outbox is not None and live is None:
+            self._done(issue_id, jpg_path)
+        return True
+
+    # ---- concurrency ----
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        """Run fn(*args, **kwargs) on the upload pool. Blocks while `workers`
+        jobs are already in flight; exceptions are logged, never raised."""
+        self._slots.acquire()
+        def job():
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                print("[ERROR] upload job:", e); traceback.print_exc()
+            finally:
+                self._slots.release()
+        return self._pool.submit(job)
+
+    def close(self, wait: bool = True):
+        self._pool.shutdown(wait=wait)
+        if self.session is not None:
+            self.session.close()
@@ -0,0 +1,150 @@
+# variants.py – model-variant × input-size benchmark for choosing the edge model
+# For every --models entry (yolo11n/s/m …) the suite
+#  1. uses runs/variants/<name>/weights/best.pt if it exists, trains it with
+#     --epochs on data.yaml otherwise (--no_train: evaluate the checkpoint as given)
+#  2. for every --imgsz, in a fresh subprocess so memory numbers don't leak
+#     between runs, measures on CPU with --threads torch threads:
+#       • single-frame latency (mean / p95 ms)
+#       • batched latency per frame at --batch
+#       • peak RSS after loading + inference (MB)
+#       • mAP50 / mAP50-95 on valid/ (memmap store, dataset_cache.py)
+# Results go to runs/crack_detector/variants.csv (next to results.csv) and are
+# printed as a markdown table.
+# Usage:
+#   python variants.py --models yolo11n.pt yolo11s.pt yolo11m.pt --imgsz 320 480 640 --epochs 50
+#   python variants.py --models runs/crack_detector/weights/best.pt --no_train
+
+import argparse
+import csv
+import glob
+import multiprocessing as mp
+import os
+import queue
+import time
+
+import cv2
+import numpy as np
+
+DATA_YAML = "data.yaml"
+OUT_CSV   = "runs/crack_detector/variants.csv"
+COLS      = ["model", "imgsz", "params_M", "latency_ms", "latency_p95_ms", "batch", "batched_ms_per_frame",
+             "fps", "peak_rss_mb", "mAP50", "mAP50-95", "weights"]
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024  # KiB on Linux
+
+
+def _variant_name(model: str) -> str:
+    return os.path.splitext(os.path.basename(model))[0]
+
+
+def train_variant(model: str, args) -> str:
+    """Checkpoint to benchmark for *model*; trains it when no run exists yet."""
+    if args.no_train:
+        return model
+    name = _variant_name(model)
+    best = os.path.join("runs", "variants", name, "weights", "best.pt")
+    if os.path.exists(best):
+        print(f"[VARIANTS] {name}: reusing {best}")
+        return best
+    from ultralytics import YOLO
+    from dataset_cache import MemmapTrainer
+    print(f"[VARIANTS] {name}: training {args.epochs} epochs")
+    YOLO(model).train(trainer=MemmapTrainer, data=args.data, epochs=args.epochs, imgsz=max(args.imgsz),
+                      batch=16, device=args.device, workers=args.workers, project="runs/variants", name=name,
+                      exist_ok=True, plots=False)
+    return best
+
+
+def _measure(name: str, weights: str, imgsz: int, args, out):
+    """Runs in a child process; puts one result row on *out*."""
+    import torch
+    from ultralytics import YOLO
+    from dataset_cache import MemmapValidator
+
+    torch.set_num_threads(args.threads)
+    images = [cv2.imread(p) for p in sorted(glob.glob(os.path.join(args.images, "*.jpg")))[:args.n_images]]
+    model = YOLO(weights, task="detect")
+    params = sum(p.numel() for p in model.model.parameters())/1e6
+    predict = lambda src: model.predict(source=src, imgsz=imgsz, device="cpu", verbose=False)
+    for im in images[:5]:
+        predict(im)
+    single = []
+    for im in images:
+        t0 = time.perf_counter()
+        predict(im)
+        single.append((time.perf_counter()-t0)*1000)
+    batched, n = 0.0, 0
+    for i in range(0, len(images)-args.batch+1, args.batch):
+        t0 = time.perf_counter()
+        predict(images[i:i+args.batch])
+        batched += (time.perf_counter()-t0)*1000
+        n += args.batch
+    rss = _peak_rss_mb()
+    m = model.val(data=args.data, split="val", imgsz=imgsz, batch=16, device="cpu", workers=args.workers,
+                  plots=False, verbose=False, validator=MemmapValidator)
+    mean = float(np.mean(single))
+    out.put({"model": name, "imgsz": imgsz, "params_M": round(params, 2), "latency_ms": round(mean, 1),
+             "latency_p95_ms": round(float(np.percentile(single, 95)), 1), "batch": args.batch,
+             "batched_ms_per_frame": round(batched/n, 1) if n else None, "fps": round(1000/mean, 2),
+             "peak_rss_mb": round(rss) if rss else None, "mAP50": round(float(m.box.map50), 4),
+             "mAP50-95": round(float(m.box.map), 4), "weights": weights})
+
+
+def measure(name: str, weights: str, imgsz: int, args) -> dict:
+    ctx = mp.get_context("spawn")
+    out = ctx.Queue()
+    p = ctx.Process(target=_measure, args=(name, weights, imgsz, args, out))
+    p.start()
+    while True:
+        try:
+            row = out.get(timeout=5)
+            break
+        except queue.Empty:
+            if not p.is_alive():
+                raise RuntimeError(f"benchmark of {weights} @ {imgsz} died (exit code {p.exitcode})")
+    p.join()
+    return row
+
+
+def main():
+    ap = argparse.ArgumentParser("Model-variant latency / accuracy benchmark")
+    ap.add_argument("--models", nargs="+", default=["yolo11n.pt", "yolo11s.pt", "yolo11m.pt"])
+    ap.add_argument("--imgsz", type=int, nargs="+", default=[320, 480, 640])
+    ap.add_argument("--data", default=DATA_YAML)
+    ap.add_argument("--epochs", type=int, default=100)
+    ap.add_argument("--no_train", action="store_true", help="benchmark --models checkpoints as given")
+    ap.add_argument("--device", default="0", help='training device, e.g. "0" or "cpu" (benchmarks always run on CPU)')
+    ap.add_argument("--workers", type=int, default=min(8, os.cpu_count() or 1))
+    ap.add_argument("--threads", type=int, default=os.cpu_count() or 1, help="torch CPU threads, match the edge box")
+    ap.add_argument("--images", default="valid/images", help="frames for the latency runs")
+    ap.add_argument("--n_images", type=int, default=50)
+    ap.add_argument("--batch", type=int, default=4, help="batched-latency batch size")
+    ap.add_argument("--out", default=OUT_CSV)
+    args = ap.parse_args()
+
+    rows = []
+    for model in args.models:
+        weights = train_variant(model, args)
+        for imgsz in args.imgsz:
+            print(f"[VARIANTS] measuring {weights} @ {imgsz}")
+            rows.append(measure(_variant_name(model), weights, imgsz, args))
+    print("| " + " | ".join(COLS[:-1]) + " |")
+    print("|" + "---|"*(len(COLS)-1))
+    for r in rows:
+        print("| " + " | ".join(str(r[c]) for c in COLS[:-1]) + " |")
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w", newline="") as f:
+        w = csv.DictWriter(f, fieldnames=COLS)
+        w.writeheader()
+        w.writerows(rows)
+    print(f"[VARIANTS] table saved to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
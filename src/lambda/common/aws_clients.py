@@ -0,0 +1,110 @@
+"""
+aws_clients.py – 每個 Lambda 容器只建立一次的共用 client 登錄表
+
+所有 handler（src/lambda/*）都透過這裡取得 boto3 client / resource、DynamoDB
+Table 與 OpenSearch client，而不是在每次呼叫時重新建立：
+  • 第一次呼叫時建立，之後同一個 warm container 內直接重用（含連線池）；
+    resource / Table 依執行緒各一份，因為 boto3 resource 不是 thread-safe
+  • botocore Config 統一設定連線池大小、逾時與 adaptive 重試
+  • OpenSearch 使用 AWSV4SignerAuth 搭配 session credentials，每個請求簽名時
+    取當下的憑證，不會像 AWS4Auth 一樣把 session token 凍結在建立時
+  • 任何 boto3 呼叫回傳憑證過期（ExpiredToken 等）時自動 reset()，下次取用時
+    以新的憑證重建 session 與所有 client
+  • get(name, factory) 讓 handler 快取自己的重物件（embeddings、vector store …）
+
+build_and_push_images.sh 會在 docker build 前把本檔複製到各 Lambda 資料夾，
+Dockerfile 再 COPY 到 ${LAMBDA_TASK_ROOT}。
+"""
+import logging
+import os
+import threading
+
+import boto3
+from botocore.config import Config
+
+logger = logging.getLogger()
+
+MAX_POOL_CONNECTIONS = int(os.environ.get('AWS_MAX_POOL_CONNECTIONS', '32'))
+CONNECT_TIMEOUT = float(os.environ.get('AWS_CONNECT_TIMEOUT', '5'))
+READ_TIMEOUT = float(os.environ.get('AWS_READ_TIMEOUT', '60'))
+EXPIRED_CODES = {'ExpiredToken', 'ExpiredTokenException', 'RequestExpired', 'InvalidClientTokenId',
+                 'UnrecognizedClientException'}
+
+_lock = threading.RLock()
+_registry = {}
+
+
+def get(name, factory):
+    """Return the cached object *name*, building it with factory() on first use."""
+    obj = _registry.get(name)
+    if obj is None:
+        with _lock:
+            obj = _registry.get(name)
+            if obj is None:
+                obj = _registry[name] = factory()
+                logger.info(f"aws_clients: 建立 {name}")
+    return obj
+
+
+def reset(*names):
+    """Drop cached objects (all of them when no names are given)."""
+    with _lock:
+        for name in names or list(_registry):
+            _registry.pop(name, None)
+
+
+def _on_after_call(parsed=None, **kwargs):
+    code = (parsed or {}).get('Error', {}).get('Code')
+    if code in EXPIRED_CODES:
+        logger.warning(f"aws_clients: 憑證失效 ({code})，清除快取的 clients")
+        reset()
+
+
+def config(**overrides):
+    kwargs = dict(max_pool_connections=MAX_POOL_CONNECTIONS, connect_timeout=CONNECT_TIMEOUT,
+                  read_timeout=READ_TIMEOUT, retries={'max_attempts': 3, 'mode': 'adaptive'},
+                  tcp_keepalive=True)
+    kwargs.update(overrides)
+    return Config(**kwargs)
+
+
+def _new_session():
+    s = boto3.session.Session()
+    s.events.register('after-call.*.*', _on_after_call)
+    return s
+
+
+def session():
+    return get('session', _new_session)
+
+
+def client(service, region_name=None, **config_overrides):
+    key = f"client:{service}:{region_name}:{sorted(config_overrides.items())}"
+    return get(key, lambda: session().client(service, region_name=region_name, config=config(**config_overrides)))
+
+
+def resource(service, region_name=None):
+    return get(f"resource:{service}:{region_name}:{threading.get_ident()}",
+               lambda: session().resource(service, region_name=region_name, config=config()))
+
+
+def table(name, region_name=None):
+    return get(f"table:{name}:{region_name}:{threading.get_ident()}",
+               lambda: resource('dynamodb', region_name).Table(name))
+
+
+def opensearch(host, region='us-west-2', service='aoss', pool_maxsize=None, timeout=30):
+    """OpenSearch client signing every request with the current session credentials."""
+    def build():
+        from opensearchpy import AWSV4SignerAuth, OpenSearch, RequestsHttpConnection
+        auth = AWSV4SignerAuth(session().get_credentials(), region, service)
+        return OpenSearch(
+            hosts=[{'host': host, 'port': 443}],
+            http_auth=auth,
+            use_ssl=True,
+            verify_certs=True,
+            connection_class=RequestsHttpConnection,
+            pool_maxsize=pool_maxsize or MAX_POOL_CONNECTIONS,
+            timeout=timeout,
+        )
+    return get(f"opensearch:{host}:{region}:{service}", build)
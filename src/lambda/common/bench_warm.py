@@ -0,0 +1,98 @@
+"""
+bench_warm.py – warm-invocation latency: clients rebuilt per call vs aws_clients
+
+模擬 warm container 連續呼叫 N 次，每次做 handler 典型的工作：
+  • before : boto3.resource('dynamodb').Table、boto3.client('s3' / 'bedrock-runtime')、
+             boto3.Session().get_credentials() + AWS4Auth + OpenSearch client 每次重建
+             （llm_issue_handler / render_frontend / util / complete 舊寫法）
+  • after  : 同樣的物件由 aws_clients 取得（第一次之後都是快取）
+每次呼叫都對本機 stub 做一次 DynamoDB GetItem，所以連線重用也算在內
+（本機是純 HTTP，沒有 TLS 握手，真實環境的差距只會更大）。
+不需要 AWS 帳號：憑證是假的，endpoint 指向 127.0.0.1。
+
+用法：python bench_warm.py [--n 200]
+"""
+import argparse
+import os
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'bench')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'bench')
+os.environ.setdefault('AWS_SESSION_TOKEN', 'bench')
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-west-2')
+
+import boto3  # noqa: E402
+
+import aws_clients  # noqa: E402
+
+HOST = 'search.example.aoss.amazonaws.com'
+
+
+class _Stub(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True  # keep-alive 回應不要卡在 delayed ACK
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        body = b'{"Item": {"id": {"S": "issue_1"}}}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-amz-json-1.0')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def before():
+    from opensearchpy import OpenSearch, RequestsHttpConnection
+    from requests_aws4auth import AWS4Auth
+    table = boto3.resource('dynamodb').Table('issues')
+    boto3.client('s3')
+    boto3.client('bedrock-runtime', region_name='us-west-2')
+    c = boto3.Session().get_credentials()
+    auth = AWS4Auth(c.access_key, c.secret_key, 'us-west-2', 'aoss', session_token=c.token)
+    OpenSearch(hosts=[{'host': HOST, 'port': 443}], http_auth=auth, use_ssl=True, verify_certs=True,
+               connection_class=RequestsHttpConnection, pool_maxsize=20, timeout=30)
+    return table.get_item(Key={'id': 'issue_1'})
+
+
+def after():
+    table = aws_clients.table('issues')
+    aws_clients.client('s3')
+    aws_clients.client('bedrock-runtime', 'us-west-2')
+    aws_clients.opensearch(HOST, 'us-west-2', 'aoss', pool_maxsize=20)
+    return table.get_item(Key={'id': 'issue_1'})
+
+
+def run(fn, n):
+    fn()  # 第一次（cold）不計
+    times = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter()-t0)*1000)
+    times.sort()
+    return statistics.mean(times), times[int(0.95*(len(times)-1))]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--n', type=int, default=200)
+    args = ap.parse_args()
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Stub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ['AWS_ENDPOINT_URL_DYNAMODB'] = f"http://127.0.0.1:{server.server_port}"
+    print(f"{'':8}{'mean ms':>10}{'p95 ms':>10}")
+    for name, fn in (('before', before), ('after', after)):
+        mean, p95 = run(fn, args.n)
+        print(f"{name:8}{mean:10.2f}{p95:10.2f}")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
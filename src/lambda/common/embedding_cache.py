@@ -0,0 +1,151 @@
+"""
+embedding_cache.py – RAG 查詢字串的 embedding 快取（容器內 LRU + DynamoDB）
+
+同一次巡檢產生的 issue，formatted_metadata 幾乎相同（位置、材質、裂縫位置一樣，
+只有 Issue ID、時間與長寬不同），原本每筆都要呼叫一次 Bedrock embeddings。
+CachedEmbeddings 包住 langchain 的 embeddings（embed_query / embed_documents 介面）：
+  • key = sha256(model_id + 正規化文字)；正規化：NFKC、移除每筆都不同的
+    Issue ID / Timestamp 欄位、空白收斂。未命中時 embed 的就是正規化後的文字，
+    所以快取的向量和 key 完全對應（長寬等數值保留，不同尺寸仍是不同 key）
+  • 第一層：容器內 LRU（EMBEDDING_CACHE_SIZE，預設 1024 筆）
+  • 第二層：DynamoDB（EMBEDDING_CACHE_TABLE，未設定則只用 LRU），向量存成
+    float32 binary，TTL 屬性 expires_at（EMBEDDING_CACHE_TTL_DAYS，預設 30 天）
+  • 命中時不呼叫 embeddings；DynamoDB 讀寫失敗只記錄，不影響查詢
+  • 每次查詢以 CloudWatch Embedded Metric Format 印一行 metrics
+    （EmbeddingCacheMemoryHit / EmbeddingCacheDynamoHit / EmbeddingCacheMiss /
+    EmbeddingLatencyMs），stats() 回傳本容器的累計值
+embed_documents（pdf_ingest 寫入用）直接轉給底層 embeddings，不快取。
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+
+import aws_clients
+
+logger = logging.getLogger()
+
+CACHE_SIZE = int(os.environ.get('EMBEDDING_CACHE_SIZE', '1024'))
+CACHE_TABLE = os.environ.get('EMBEDDING_CACHE_TABLE', '')
+TTL_DAYS = float(os.environ.get('EMBEDDING_CACHE_TTL_DAYS', '30'))
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'CrackAnalysis')
+
+_VOLATILE = re.compile(r'\b(?:Issue ID|Timestamp):[^,]*(?:,\s*|$)')
+
+_stats_lock = threading.Lock()
+_stats = {'memory_hit': 0, 'dynamo_hit': 0, 'miss': 0}
+
+
+def normalize(text):
+    """Drop per-issue fields and collapse whitespace so near-identical queries share a key."""
+    text = unicodedata.normalize('NFKC', text)
+    text = _VOLATILE.sub('', text)
+    return ' '.join(text.split()).rstrip(', ')
+
+
+def stats():
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _emit(outcome, latency_ms):
+    with _stats_lock:
+        _stats[outcome] += 1
+    # EMF 必須是單獨一行 JSON，不能帶 logging 的前綴，所以用 print
+    print(json.dumps({
+        '_aws': {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': METRICS_NAMESPACE,
+                'Dimensions': [['FunctionName']],
+                'Metrics': [
+                    {'Name': 'EmbeddingCacheMemoryHit', 'Unit': 'Count'},
+                    {'Name': 'EmbeddingCacheDynamoHit', 'Unit': 'Count'},
+                    {'Name': 'EmbeddingCacheMiss', 'Unit': 'Count'},
+                    {'Name': 'EmbeddingLatencyMs', 'Unit': 'Milliseconds'},
+                ],
+            }],
+        },
+        'FunctionName': os.environ.get('AWS_LAMBDA_FUNCTION_NAME', 'local'),
+        'EmbeddingCacheMemoryHit': int(outcome == 'memory_hit'),
+        'EmbeddingCacheDynamoHit': int(outcome == 'dynamo_hit'),
+        'EmbeddingCacheMiss': int(outcome == 'miss'),
+        'EmbeddingLatencyMs': round(latency_ms, 1),
+    }), flush=True)
+
+
+class CachedEmbeddings:
+    def __init__(self, embeddings, model_id=None, table_name=CACHE_TABLE, size=CACHE_SIZE):
+        self.embeddings = embeddings
+        self.model_id = model_id or getattr(embeddings, 'model_id', '') or type(embeddings).__name__
+        self.table_name = table_name
+        self.size = size
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, text):
+        return hashlib.sha256(f"{self.model_id}\n{text}".encode('utf-8')).hexdigest()
+
+    def _remember(self, key, vector):
+        with self._lock:
+            self._lru[key] = vector
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.size:
+                self._lru.popitem(last=False)
+
+    def _dynamo_get(self, key):
+        try:
+            item = aws_clients.table(self.table_name).get_item(Key={'key': key}).get('Item')
+        except Exception as e:
+            logger.warning(f"embedding cache: DynamoDB 讀取失敗: {e}")
+            return None
+        if not item:
+            return None
+        vector = array('f')
+        vector.frombytes(item['vector'].value)
+        return vector.tolist()
+
+    def _dynamo_put(self, key, vector):
+        try:
+            aws_clients.table(self.table_name).put_item(Item={
+                'key': key,
+                'model': self.model_id,
+                'vector': array('f', vector).tobytes(),
+                'expires_at': int(time.time() + TTL_DAYS * 86400),
+            })
+        except Exception as e:
+            logger.warning(f"embedding cache: DynamoDB 寫入失敗: {e}")
+
+    def embed_query(self, text):
+        t0 = time.perf_counter()
+        text = normalize(text)
+        key = self._key(text)
+        with self._lock:
+            vector = self._lru.get(key)
+            if vector is not None:
+                self._lru.move_to_end(key)
+        outcome = 'memory_hit'
+        if vector is None and self.table_name:
+            vector = self._dynamo_get(key)
+            if vector is not None:
+                outcome = 'dynamo_hit'
+                self._remember(key, vector)
+        if vector is None:
+            outcome = 'miss'
+            vector = self.embeddings.embed_query(text)
+            self._remember(key, vector)
+            if self.table_name:
+                self._dynamo_put(key, vector)
+        latency_ms = (time.perf_counter() - t0) * 1000
+        _emit(outcome, latency_ms)
+        logger.info(f"embedding cache: {outcome} ({latency_ms:.0f} ms) {stats()}")
+        return vector
+
+    def embed_documents(self, texts):
+        return self.embeddings.embed_documents(texts)
@@ -0,0 +1,105 @@
+"""
+s3_batch.py – 處理 S3 事件中的每一筆 record（有上限的並行），逐筆回報失敗
+
+S3 通知可以一次帶多筆 record；經 SQS 轉送時每則訊息的 body 又是一個 S3 事件。
+process_batch() 對每一筆 (bucket, key) 呼叫 handler 的 process_record：
+  • 最多 MAX_RECORD_CONCURRENCY 筆同時處理（執行緒池跨 warm invocation 重用）
+  • 單筆失敗只記錄該筆，不影響其他 record
+  • 回傳 partial-batch 格式：batchItemFailures = [{"itemIdentifier": ...}]，
+    SQS 觸發時 itemIdentifier 是 messageId（只重送失敗的訊息），S3 直接觸發時
+    是 "bucket/key"
+"""
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote_plus
+
+logger = logging.getLogger()
+
+MAX_RECORD_CONCURRENCY = int(os.environ.get('MAX_RECORD_CONCURRENCY', '4'))
+
+_lock = threading.Lock()
+_executor = None
+
+
+def _pool():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_RECORD_CONCURRENCY, thread_name_prefix='record')
+        return _executor
+
+
+def _object(rec):
+    """(bucket, key) of one S3 event record, (None, None) if it has none."""
+    try:
+        return rec['s3']['bucket']['name'], unquote_plus(rec['s3']['object']['key'])
+    except (KeyError, TypeError):
+        return None, None
+
+
+def s3_records(event):
+    """
+    Yield (item_id, bucket, key) for every S3 object in *event*.
+    bucket/key are None when a record or SQS message body is not an S3 event,
+    so it is reported as a failure of that item instead of the whole batch.
+    """
+    for i, rec in enumerate(event.get('Records', [])):
+        if 'messageId' in rec:  # SQS 轉送的 S3 通知
+            try:
+                inner = json.loads(rec.get('body') or '{}').get('Records', [])
+            except (ValueError, AttributeError):
+                inner = None
+            if not inner:
+                yield rec['messageId'], None, None
+            for r in inner or []:
+                yield (rec['messageId'], *_object(r))
+        else:
+            bucket, key = _object(rec)
+            item_id = f"{bucket}/{key}" if bucket else rec.get('eventID') or f"record-{i}"
+            yield item_id, bucket, key
+
+
+def _run(process_record, bucket, key):
+    if bucket is None:
+        raise ValueError('record is not an S3 event')
+    return process_record(bucket, key)
+
+
+def process_batch(event, process_record):
+    """
+    Run process_record(bucket, key) for every record, at most
+    MAX_RECORD_CONCURRENCY at a time.
+    Returns:
+        (results, batchItemFailures)
+    """
+    items = list(s3_records(event))
+    logger.info(f"處理 {len(items)} 筆 record（並行上限 {MAX_RECORD_CONCURRENCY}）")
+    futures = [(item_id, key, _pool().submit(_run, process_record, bucket, key)) for item_id, bucket, key in items]
+    results, failed = [], []
+    for item_id, key, future in futures:
+        try:
+            results.append({'item': item_id, 'key': key, 'ok': True, 'result': future.result()})
+        except Exception as e:
+            logger.error(f"record {item_id} 處理失敗: {e}")
+            results.append({'item': item_id, 'key': key, 'ok': False, 'error': str(e)})
+            failed.append(item_id)
+    # 同一則 SQS 訊息可能含多筆 record，只回報一次
+    return results, [{'itemIdentifier': i} for i in dict.fromkeys(failed)]
+
+
+def response(results, failures):
+    """200 all succeeded, 207 partial, 500 all failed; batchItemFailures for SQS."""
+    if not failures:
+        status = 200
+    elif len(failures) == len({r['item'] for r in results}):
+        status = 500
+    else:
+        status = 207
+    return {
+        'statusCode': status,
+        'body': json.dumps({'results': results}, ensure_ascii=False, default=str),
+        'batchItemFailures': failures,
+    }
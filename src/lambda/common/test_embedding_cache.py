@@ -0,0 +1,102 @@
+import json
+from array import array
+from unittest.mock import MagicMock, patch
+
+import pytest
+from boto3.dynamodb.types import Binary
+
+import embedding_cache
+from embedding_cache import CachedEmbeddings, normalize
+
+
+class FakeEmbeddings:
+    model_id = "fake-model"
+
+    def __init__(self):
+        self.calls = []
+
+    def embed_query(self, text):
+        self.calls.append(text)
+        return [float(len(text)), 0.5]
+
+    def embed_documents(self, texts):
+        return [[1.0] for _ in texts]
+
+
+@pytest.fixture(autouse=True)
+def quiet(monkeypatch):
+    monkeypatch.setattr(embedding_cache, "_emit", lambda outcome, latency_ms: None)
+
+
+def test_normalize_drops_volatile_fields():
+    a = "Issue ID: issue_1, Timestamp: 2025-01-01 10:00:00, Position: A1,  Length: 12"
+    b = "Issue ID: issue_2, Timestamp: 2025-01-02 11:30:00, Position: A1, Length: 12"
+    assert normalize(a) == normalize(b) == "Position: A1, Length: 12"
+    assert normalize(a) != normalize(b.replace("12", "13"))
+
+
+def test_memory_hit_skips_embeddings():
+    fake = FakeEmbeddings()
+    cache = CachedEmbeddings(fake, table_name="")
+    first = cache.embed_query("Issue ID: a, Position: A1")
+    second = cache.embed_query("Issue ID: b, Position: A1")
+    assert first == second
+    assert fake.calls == ["Position: A1"]
+
+
+def test_lru_evicts_oldest():
+    fake = FakeEmbeddings()
+    cache = CachedEmbeddings(fake, table_name="", size=2)
+    for text in ("a", "bb", "ccc", "a"):
+        cache.embed_query(text)
+    assert fake.calls == ["a", "bb", "ccc", "a"]
+
+
+def test_key_depends_on_model():
+    fake = FakeEmbeddings()
+    assert CachedEmbeddings(fake, model_id="m1")._key("x") != CachedEmbeddings(fake, model_id="m2")._key("x")
+
+
+@patch("aws_clients.table")
+def test_dynamo_hit_and_write_through(mock_table):
+    table = MagicMock()
+    mock_table.return_value = table
+    stored = array("f", [0.25, 0.75]).tobytes()
+    table.get_item.return_value = {"Item": {"vector": Binary(stored)}}
+
+    fake = FakeEmbeddings()
+    cache = CachedEmbeddings(fake, table_name="cache")
+    assert cache.embed_query("Position: A1") == [0.25, 0.75]
+    assert fake.calls == []
+
+    table.get_item.return_value = {}
+    cache.embed_query("Position: B2")
+    assert fake.calls == ["Position: B2"]
+    item = table.put_item.call_args.kwargs["Item"]
+    assert item["model"] == "fake-model"
+    assert array("f", item["vector"]).tolist() == [12.0, 0.5]
+
+
+@patch("aws_clients.table", side_effect=RuntimeError("throttled"))
+def test_dynamo_failure_falls_back_to_embeddings(mock_table):
+    fake = FakeEmbeddings()
+    cache = CachedEmbeddings(fake, table_name="cache")
+    assert cache.embed_query("Position: A1") == [12.0, 0.5]
+    assert fake.calls == ["Position: A1"]
+
+
+def test_embed_documents_not_cached():
+    fake = FakeEmbeddings()
+    cache = CachedEmbeddings(fake, table_name="")
+    assert cache.embed_documents(["a", "b"]) == [[1.0], [1.0]]
+    assert cache.embed_documents(["a", "b"]) == [[1.0], [1.0]]
+    assert len(cache._lru) == 0
+
+
+def test_emit_counts_and_prints_emf(monkeypatch, capsys):
+    monkeypatch.undo()
+    before = embedding_cache.stats()
+    CachedEmbeddings(FakeEmbeddings(), table_name="").embed_query("Position: Z9")
+    assert embedding_cache.stats()["miss"] == before["miss"] + 1
+    emf = json.loads(capsys.readouterr().out.splitlines()[0])
+    assert emf["EmbeddingCacheMiss"] == 1 and emf["EmbeddingCacheMemoryHit"] == 0
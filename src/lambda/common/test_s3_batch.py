@@ -0,0 +1,55 @@
+import json
+
+import s3_batch
+
+
+def _s3(bucket, key):
+    return {"s3": {"bucket": {"name": bucket}, "object": {"key": key}}}
+
+
+def _sqs(message_id, *records):
+    return {"messageId": message_id, "body": json.dumps({"Records": list(records)})}
+
+
+def test_s3_records_direct_and_sqs():
+    event = {"Records": [_s3("b", "reports/a+b.pdf"), _sqs("m1", _s3("b", "x.pdf"), _s3("b", "y.pdf"))]}
+    assert list(s3_batch.s3_records(event)) == [
+        ("b/reports/a b.pdf", "b", "reports/a b.pdf"),
+        ("m1", "b", "x.pdf"),
+        ("m1", "b", "y.pdf"),
+    ]
+
+
+def test_s3_records_without_s3_key_are_yielded_not_raised():
+    event = {"Records": [{"eventID": "e1"}, {"foo": 1}, {"messageId": "m1", "body": "not json"},
+                         _sqs("m2", {"foo": 1})]}
+    assert list(s3_batch.s3_records(event)) == [
+        ("e1", None, None), ("record-1", None, None), ("m1", None, None), ("m2", None, None)]
+
+
+def test_process_batch_reports_only_failed_items():
+    def process(bucket, key):
+        if key == "bad.pdf":
+            raise RuntimeError("boom")
+        return key
+
+    event = {"Records": [_s3("b", "good.pdf"), _s3("b", "bad.pdf"), {"eventID": "e1"}]}
+    results, failures = s3_batch.process_batch(event, process)
+    assert failures == [{"itemIdentifier": "b/bad.pdf"}, {"itemIdentifier": "e1"}]
+    assert [r["ok"] for r in results] == [True, False, False]
+    assert s3_batch.response(results, failures)["statusCode"] == 207
+
+
+def test_sqs_message_failure_reported_once():
+    def process(bucket, key):
+        raise RuntimeError("boom")
+
+    results, failures = s3_batch.process_batch({"Records": [_sqs("m1", _s3("b", "x"), _s3("b", "y"))]}, process)
+    assert failures == [{"itemIdentifier": "m1"}]
+    assert s3_batch.response(results, failures)["statusCode"] == 500
+
+
+def test_response_all_ok():
+    results, failures = s3_batch.process_batch({"Records": [_s3("b", "k")]}, lambda b, k: 1)
+    resp = s3_batch.response(results, failures)
+    assert resp["statusCode"] == 200 and resp["batchItemFailures"] == []
@@ -1,9 +1,10 @@
-import boto3
 import json
 import logging
 import os
 from datetime import datetime
 
+import aws_clients
+
 # 配置日誌
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
@@ -12,8 +13,7 @@ def delete_issue_from_dynamodb(issue_id):
     """
     使用 DynamoDB 的 delete_item 方法刪除指定 ID 的 issue
     """
-    dynamodb = boto3.resource('dynamodb')
-    table = dynamodb.Table(os.environ.get('ISSUES_TABLE', 'issues'))
+    table = aws_clients.table(os.environ.get('ISSUES_TABLE', 'issues'))
     
     logger.info(f"嘗試刪除 ID 為 {issue_id} 的 issue")
     
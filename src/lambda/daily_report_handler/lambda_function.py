@@ -1,12 +1,13 @@
 import json
 import os
 import requests
-import boto3
 import botocore
 
+import aws_clients
+
 def get_text_embedding(text):
     # use bedrock embedding model api
-    bedrock_client = boto3.client("bedrock")
+    bedrock_client = aws_clients.client("bedrock")
     response = bedrock_client.invoke_model(
         modelId=os.environ["BEDROCK_EMBEDDING_MODEL"],
         contentType="text/plain",
@@ -4,14 +4,12 @@ import logging
 import os
 from uuid import uuid4
 
-import boto3
+import aws_clients
 
 # 配置日誌
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-s3_client = boto3.client("s3")
-
 
 def upload_to_s3(pdf_data, report_id):
     """
@@ -23,6 +21,7 @@ def upload_to_s3(pdf_data, report_id):
 
     key = f"reports/{report_id}.pdf"
 
+    s3_client = aws_clients.client("s3")
     s3_client.put_object(
         Body=pdf_data,
         Bucket=bucket_name,
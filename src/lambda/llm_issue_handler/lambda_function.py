@@ -1,27 +1,50 @@
 import base64
+import io
 import json
 import logging
 import os
+import threading
 import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
 from decimal import Decimal
 from urllib.parse import urlparse
 
-import boto3
 import botocore
 import requests
+from PIL import Image, ImageOps
 from langchain.chains.retrieval_qa.base import RetrievalQA
 from langchain_community.chat_models import BedrockChat
 from langchain.prompts import PromptTemplate
 from langchain_aws import BedrockEmbeddings
 from langchain_community.vectorstores import OpenSearchVectorSearch
-from opensearchpy import AWSV4SignerAuth, OpenSearch
-from opensearchpy.connection.http_requests import RequestsHttpConnection
-from requests_aws4auth import AWS4Auth
+
+import aws_clients
+import embedding_cache
+import s3_batch
 
 # Configure logger
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# RAG 檢索與多模態分析的並行設定（秒）
+RETRIEVAL_TIMEOUT = float(os.environ.get('RETRIEVAL_TIMEOUT', '10'))
+MULTIMODAL_TIMEOUT = float(os.environ.get('MULTIMODAL_TIMEOUT', '45'))
+_analysis_pool = ThreadPoolExecutor(max_workers=int(os.environ.get('ANALYSIS_WORKERS', '8')),
+                                    thread_name_prefix='analysis')
+
+# 送進 Bedrock 前的圖片處理：handle_sequence 把裁切圖 hstack 成很寬的 JPG，
+# 模型內部本來就會縮到約 1568px / 1.15MP，先在這裡縮好並重新壓縮可減少請求大小與 token
+IMAGE_PREP = os.environ.get('IMAGE_PREP', 'on').lower() != 'off'
+IMAGE_MAX_SIDE = int(os.environ.get('IMAGE_MAX_SIDE', '1568'))
+IMAGE_MAX_PIXELS = int(os.environ.get('IMAGE_MAX_PIXELS', '1150000'))
+IMAGE_JPEG_QUALITY = int(os.environ.get('IMAGE_JPEG_QUALITY', '85'))
+IMAGE_CACHE_SIZE = int(os.environ.get('IMAGE_CACHE_SIZE', '64'))
+# image_url -> (ETag, base64)，warm container 內的 LRU
+_image_cache = OrderedDict()
+_image_cache_lock = threading.Lock()
+
 def download_file_from_s3(bucket, key):
     """
     Download file from S3 bucket
@@ -31,7 +54,7 @@ def download_file_from_s3(bucket, key):
     Returns:
         Content of the file
     """
-    s3_client = boto3.client('s3')
+    s3_client = aws_clients.client('s3')
     try:
         response = s3_client.get_object(Bucket=bucket, Key=key)
         content = response['Body'].read()
@@ -81,37 +104,91 @@ def parse_json_metadata(json_content):
         logger.error(f"Error parsing JSON metadata: {e}")
         raise
 
+def prepare_image(image_content):
+    """
+    Downscale to the model's effective resolution and re-encode as JPEG
+    Parameters:
+        image_content: Original image bytes
+    Returns:
+        Prepared JPEG bytes (the original bytes when re-encoding would not make them smaller)
+    """
+    t0 = time.perf_counter()
+    with Image.open(io.BytesIO(image_content)) as src:
+        fmt = src.format
+        img = ImageOps.exif_transpose(src)
+        w, h = img.size
+        scale = min(1.0, IMAGE_MAX_SIDE / max(w, h), (IMAGE_MAX_PIXELS / (w * h)) ** 0.5)
+        if scale < 1.0:
+            img = img.resize((max(1, round(w * scale)), max(1, round(h * scale))), Image.LANCZOS)
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        buf = io.BytesIO()
+        img.save(buf, 'JPEG', quality=IMAGE_JPEG_QUALITY, optimize=True)
+        size = img.size
+    prepared = buf.getvalue()
+    if scale == 1.0 and fmt == 'JPEG' and len(prepared) >= len(image_content):
+        prepared = image_content
+    logger.info(f"圖片處理: {w}x{h} {len(image_content)} bytes -> {size[0]}x{size[1]} {len(prepared)} bytes "
+                f"({(time.perf_counter() - t0) * 1000:.0f} ms)")
+    return prepared
+
+
+def _fetch_image(image_url, etag=None):
+    """
+    Download image bytes, conditional on *etag*
+    Returns:
+        (bytes or None when not modified, ETag)
+    """
+    if image_url.startswith('s3://'):
+        bucket, _, key = image_url[len('s3://'):].partition('/')
+        logger.info(f"Accessing S3 object: bucket={bucket}, key={key}")
+        s3_client = aws_clients.client('s3')
+        kwargs = {'IfNoneMatch': etag} if etag else {}
+        try:
+            response = s3_client.get_object(Bucket=bucket, Key=key, **kwargs)
+        except botocore.exceptions.ClientError as e:
+            if e.response.get('ResponseMetadata', {}).get('HTTPStatusCode') == 304:
+                return None, etag
+            raise
+        return response['Body'].read(), response.get('ETag')
+    logger.info(f"Downloading image from URL: {image_url}")
+    response = requests.get(image_url, timeout=10, headers={'If-None-Match': etag} if etag else None)
+    if response.status_code == 304:
+        return None, etag
+    response.raise_for_status()
+    return response.content, response.headers.get('ETag')
+
+
 def get_image_from_url(image_url):
     """
-    Gets image from URL or S3 and converts to base64 for multimodal models
+    Gets image from URL or S3, prepares it and converts to base64 for multimodal models
+    Prepared images are cached by ETag; a cached image costs one conditional request (304)
     Parameters:
         image_url: URL or S3 URI of the image
     Returns:
         Base64 encoded image
     """
     try:
-        if image_url.startswith('s3://'):
-            # Parse S3 URI
-            parts = image_url.replace('s3://', '').split('/')
-            bucket = parts[0]
-            key = '/'.join(parts[1:])
-            
-            logger.info(f"Accessing S3 object: bucket={bucket}, key={key}")
-            
-            # Download from S3
-            s3_client = boto3.client('s3')
-            response = s3_client.get_object(Bucket=bucket, Key=key)
-            image_content = response['Body'].read()
-        else:
-            # For HTTPS URLs
-            logger.info(f"Downloading image from URL: {image_url}")
-            response = requests.get(image_url, timeout=10)
-            response.raise_for_status()
-            image_content = response.content
+        with _image_cache_lock:
+            cached = _image_cache.get(image_url)
+        image_content, etag = _fetch_image(image_url, cached[0] if cached else None)
+        if image_content is None:
+            with _image_cache_lock:
+                _image_cache.move_to_end(image_url)
+            logger.info(f"圖片快取命中 (ETag {etag})，base64 {len(cached[1])} chars")
+            return cached[1]
+        
+        prepared = prepare_image(image_content) if IMAGE_PREP else image_content
         
         # Convert to base64
-        base64_image = base64.b64encode(image_content).decode('utf-8')
+        base64_image = base64.b64encode(prepared).decode('utf-8')
         logger.info(f"Successfully converted image to base64 ({len(base64_image)} chars)")
+        if etag and IMAGE_CACHE_SIZE > 0:
+            with _image_cache_lock:
+                _image_cache[image_url] = (etag, base64_image)
+                _image_cache.move_to_end(image_url)
+                while len(_image_cache) > IMAGE_CACHE_SIZE:
+                    _image_cache.popitem(last=False)
         return base64_image
     except Exception as e:
         logger.error(f"Error getting image from URL {image_url}: {e}")
@@ -126,59 +203,41 @@ def initialize_multimodal_rag_chain(image_url=None):
         Tuple containing retriever for similar cases and function to call Nova Pro model
     """
     try:
-        # Initialize Bedrock client
-        bedrock_client = boto3.client('bedrock-runtime', region_name='us-west-2')
+        # Bedrock client、embeddings、OpenSearch、vector store 都由 aws_clients 快取，
+        # 同一個 warm container 只建立一次
+        bedrock_client = aws_clients.client('bedrock-runtime', region_name='us-west-2')
         
         # Initialize Nova Pro model ID
         nova_model_id = os.environ.get('BEDROCK_MODEL_ID', 'anthropic.claude-3-5-sonnet-20241022-v2:0')
         
-        # Initialize Bedrock embeddings
-        embeddings = BedrockEmbeddings(
-            client=bedrock_client,
-            model_id=os.environ.get('BEDROCK_EMBEDDING_MODEL_ID', 'amazon.titan-embed-text-v2:0')
-        )
-        
         # OpenSearch connection settings
         host = "g9eu5n37g2c5goi6ymzh.us-west-2.aoss.amazonaws.com"
         region = "us-west-2"
         service = 'aoss'
 
-        credentials = boto3.Session().get_credentials()
-
-        auth = AWS4Auth(
-            credentials.access_key,
-            credentials.secret_key,
-            region,
-            service,
-            session_token=credentials.token  # 一定要加 session token（尤其你是 Lambda）
-        )
+        def build_retriever():
+            embeddings = BedrockEmbeddings(
+                client=bedrock_client,
+                model_id=os.environ.get('BEDROCK_EMBEDDING_MODEL_ID', 'amazon.titan-embed-text-v2:0')
+            )
+            # 每個請求以當下憑證簽名（AWSV4SignerAuth），session token 過期也不會失效
+            client = aws_clients.opensearch(host, region, service, pool_maxsize=20)
+            vectorstore = OpenSearchVectorSearch(
+                opensearch_url=f"https://{host}",
+                index_name = "vectors",
+                # 相同（正規化後）的查詢字串不再重複呼叫 Bedrock embeddings
+                embedding_function=embedding_cache.CachedEmbeddings(embeddings),
+                opensearch_client=client
+            )
+            # Get retriever for similar cases
+            return vectorstore.as_retriever(
+                search_kwargs={
+                    "k": 3,  # Return top 3 similar cases
+                    "return_metadata": True
+                }
+            )
 
-        client = OpenSearch(
-            hosts=[{'host': host, 'port': 443}],
-            http_auth=auth,  # 這樣就正確
-            use_ssl=True,
-            verify_certs=True,
-            connection_class=RequestsHttpConnection,  # 這邊不能錯
-            pool_maxsize=20,
-            timeout=30,
-            request_timeout=30
-        )
-                
-        # 建立向量存儲
-        vectorstore = OpenSearchVectorSearch(
-            opensearch_url=f"https://{host}",
-            index_name = "vectors",
-            embedding_function=embeddings,
-            opensearch_client=client
-        )
-        
-        # Get retriever for similar cases
-        retriever = vectorstore.as_retriever(
-            search_kwargs={
-                "k": 3,  # Return top 3 similar cases
-                "return_metadata": True
-            }
-        )
+        retriever = aws_clients.get('rag_retriever', build_retriever)
         
         # Define function to call Nova Pro model
         def call_multimodal_model(text_query, image_url):
@@ -254,19 +313,24 @@ def initialize_multimodal_rag_chain(image_url=None):
                 
                 # Invoke Nova Pro model
                 logger.info("Invoking Nova Pro model")
+                body = json.dumps(request_body)
                 try:
+                    t0 = time.perf_counter()
                     response = bedrock_client.invoke_model(
                         modelId=nova_model_id,
-                        body=json.dumps(request_body)
+                        body=body
                     )
-                    logger.info("Successfully received response from Nova Pro")
+                    response_raw = response.get('body').read()
+                    logger.info(f"Successfully received response from Nova Pro: payload {len(body)} bytes, "
+                                f"latency {(time.perf_counter() - t0) * 1000:.0f} ms, image prep {'on' if IMAGE_PREP else 'off'}")
                 except Exception as e:
                     logger.error(f"Error invoking Nova Pro model: {str(e)}")
                     raise
                 
                 # Parse response
                 try:
-                    response_body = json.loads(response.get('body').read())
+                    response_body = json.loads(response_raw)
+                    logger.info(f"Nova Pro usage: {response_body.get('usage')}")
                     model_response = response_body.get('content')[0].get('text')
                     logger.info(f"Successfully parsed Nova Pro response. Response preview: {model_response[:200]}...")
                     
@@ -287,7 +351,7 @@ def initialize_multimodal_rag_chain(image_url=None):
                     return model_response
                 except Exception as e:
                     logger.error(f"Error parsing Nova Pro response: {str(e)}")
-                    logger.error(f"Raw response body: {response.get('body').read()}")
+                    logger.error(f"Raw response body: {response_raw}")
                     raise
                 
             except Exception as e:
@@ -428,8 +492,7 @@ def store_in_dynamodb(issue_data, solution):
         solution: Solution generated by the model
     """
     try:
-        dynamodb = boto3.resource('dynamodb')
-        table = dynamodb.Table(os.environ.get('DYNAMODB_TABLE', 'issues'))
+        table = aws_clients.table(os.environ.get('DYNAMODB_TABLE', 'issues'))
         
         # Validate and format data according to constraints
         item = validate_and_format_data(issue_data, solution)
@@ -450,185 +513,213 @@ def store_in_dynamodb(issue_data, solution):
         return False
 
 
-def lambda_handler(event, context):
+def _timed(fn, *args):
+    t0 = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - t0) * 1000
+
+
+def run_parallel(branches):
     """
-    When new folder with image & JSON metadata is created in S3, this lambda will be triggered
-    to call Nova Pro model for analyzing concrete cracks and find similar cases using RAG.
+    Run independent branches concurrently, each with its own timeout
     Parameters:
-        event: Dict containing the Lambda function event data
-        context: Lambda runtime context
+        branches: {name: (fn, args, timeout_seconds, fallback)}
     Returns:
-        Dict containing status message
+        ({name: result or fallback}, {name: {'ms': elapsed, 'status': 'ok' | 'timeout' | 'error'}})
     """
-    try:
-        # Log the incoming event
-        logger.info(f"Received event: {json.dumps(event)}")
-        
-        # Get message from event triggered by S3
-        record = event['Records'][0]
-        bucket = record['s3']['bucket']['name']
-        key = record['s3']['object']['key']
-        
-        logger.info(f"Processing S3 object: bucket={bucket}, key={key}")
-        
-        # Process the metadata file
-        logger.info(f"Downloading and parsing metadata from S3")
-        
-        # Download and parse JSON metadata
-        json_content = download_file_from_s3(bucket, key)
-        parsed_data = parse_json_metadata(json_content)
-        formatted_metadata = parsed_data['formatted_text']
-        raw_data = parsed_data['raw_data']
-        
-        # 將完整S3 key添加到raw_data中
-        raw_data['s3_key'] = key
-        logger.info(f"Added S3 key to raw_data: {key}")
-        
-        logger.info(f"Metadata parsed: {formatted_metadata}")
-        
-        # Get image URL
-        image_url = raw_data.get('url', '')
-        if not image_url:
-            image_url = raw_data.get('image_url', '')
-            
-        logger.info(f"Original image URL from JSON: {image_url}")
+    start = time.perf_counter()
+    futures = {name: _analysis_pool.submit(_timed, fn, *args) for name, (fn, args, _, _) in branches.items()}
+    outputs, timings = {}, {}
+    for name, (_, _, timeout, fallback) in branches.items():
+        remaining = max(0.0, timeout - (time.perf_counter() - start))
+        try:
+            outputs[name], ms = futures[name].result(timeout=remaining)
+            timings[name] = {'ms': round(ms), 'status': 'ok'}
+        except FutureTimeout:
+            # 執行緒無法中斷，讓它在背景結束；結果直接丟棄
+            outputs[name] = fallback
+            timings[name] = {'ms': round((time.perf_counter() - start) * 1000), 'status': 'timeout'}
+            logger.error(f"{name} 超過 {timeout}s，改用預設值")
+        except Exception as e:
+            outputs[name] = fallback
+            timings[name] = {'ms': round((time.perf_counter() - start) * 1000), 'status': 'error'}
+            logger.error(f"{name} 失敗，改用預設值: {e}")
+    timings['total_ms'] = round((time.perf_counter() - start) * 1000)
+    logger.info(f"分支耗時: {json.dumps(timings)}")
+    return outputs, timings
+
+
+def process_record(bucket, key):
+    """
+    Analyze one metadata object: call Nova Pro on the crack image, find similar
+    cases using RAG and store the result in DynamoDB.
+    Parameters:
+        bucket: S3 bucket name
+        key: S3 object key of the metadata JSON
+    Returns:
+        Dict with issue_id and reference_ids; raises on failure
+    """
+    logger.info(f"Processing S3 object: bucket={bucket}, key={key}")
+    
+    # Process the metadata file
+    logger.info(f"Downloading and parsing metadata from S3")
+    
+    # Download and parse JSON metadata
+    json_content = download_file_from_s3(bucket, key)
+    parsed_data = parse_json_metadata(json_content)
+    formatted_metadata = parsed_data['formatted_text']
+    raw_data = parsed_data['raw_data']
+    
+    # 將完整S3 key添加到raw_data中
+    raw_data['s3_key'] = key
+    logger.info(f"Added S3 key to raw_data: {key}")
+    
+    logger.info(f"Metadata parsed: {formatted_metadata}")
+    
+    # Get image URL
+    image_url = raw_data.get('url', '')
+    if not image_url:
+        image_url = raw_data.get('image_url', '')
         
-        # 驗證 URL 是否有效
-        if not image_url:
-            logger.warning("JSON 中沒有提供 image_url 或 url 字段")
-        elif not (image_url.startswith('http://') or image_url.startswith('https://') or image_url.startswith('s3://')):
-            logger.warning(f"提供的 URL 格式無效: {image_url}")
+    logger.info(f"Original image URL from JSON: {image_url}")
+    
+    # 驗證 URL 是否有效
+    if not image_url:
+        logger.warning("JSON 中沒有提供 image_url 或 url 字段")
+    elif not (image_url.startswith('http://') or image_url.startswith('https://') or image_url.startswith('s3://')):
+        logger.warning(f"提供的 URL 格式無效: {image_url}")
+    
+    # 處理 HTTPS S3 URL，將其轉換為 S3 URI 格式
+    if image_url.startswith('https://') and 's3.amazonaws.com' in image_url:
+        # 針對特定的 bucket 進行處理
+        bucket_name = "genai-hackthon-20250426-image-bucket"
         
-        # 處理 HTTPS S3 URL，將其轉換為 S3 URI 格式
-        if image_url.startswith('https://') and 's3.amazonaws.com' in image_url:
-            # 針對特定的 bucket 進行處理
-            bucket_name = "genai-hackthon-20250426-image-bucket"
+        # 處理不同格式的 S3 URL
+        try:
+            # 移除 URL 前面的協議部分
+            url_without_protocol = image_url.replace('https://', '')
             
-            # 處理不同格式的 S3 URL
-            try:
-                # 移除 URL 前面的協議部分
-                url_without_protocol = image_url.replace('https://', '')
+            if f"{bucket_name}.s3.amazonaws.com/" in image_url:
+                # 格式: https://bucket-name.s3.amazonaws.com/key
+                object_key = url_without_protocol.split(f"{bucket_name}.s3.amazonaws.com/")[1]
+            elif f"s3.amazonaws.com/{bucket_name}/" in image_url:
+                # 格式: https://s3.amazonaws.com/bucket-name/key
+                object_key = url_without_protocol.split(f"s3.amazonaws.com/{bucket_name}/")[1]
+            else:
+                # 嘗試從 URL 中獲取路徑部分
+                parsed_url = urlparse(image_url)
+                path_parts = parsed_url.path.strip('/').split('/')
                 
-                if f"{bucket_name}.s3.amazonaws.com/" in image_url:
-                    # 格式: https://bucket-name.s3.amazonaws.com/key
-                    object_key = url_without_protocol.split(f"{bucket_name}.s3.amazonaws.com/")[1]
-                elif f"s3.amazonaws.com/{bucket_name}/" in image_url:
-                    # 格式: https://s3.amazonaws.com/bucket-name/key
-                    object_key = url_without_protocol.split(f"s3.amazonaws.com/{bucket_name}/")[1]
-                else:
-                    # 嘗試從 URL 中獲取路徑部分
-                    parsed_url = urlparse(image_url)
-                    path_parts = parsed_url.path.strip('/').split('/')
-                    
-                    # 檢查路徑中是否包含 bucket_name
-                    if bucket_name in path_parts:
-                        bucket_index = path_parts.index(bucket_name)
-                        if bucket_index < len(path_parts) - 1:
-                            # 獲取 bucket 之後的所有路徑作為 object_key
-                            object_key = '/'.join(path_parts[bucket_index + 1:])
-                        else:
-                            object_key = None
+                # 檢查路徑中是否包含 bucket_name
+                if bucket_name in path_parts:
+                    bucket_index = path_parts.index(bucket_name)
+                    if bucket_index < len(path_parts) - 1:
+                        # 獲取 bucket 之後的所有路徑作為 object_key
+                        object_key = '/'.join(path_parts[bucket_index + 1:])
                     else:
                         object_key = None
-                
-                # 如果成功提取了 key，就構建 S3 URI
-                if object_key:
-                    image_url = f"s3://{bucket_name}/{object_key}"
-                    logger.info(f"將 HTTP URL 轉換為 S3 URI 格式: {image_url}")
                 else:
-                    logger.warning(f"無法從 URL 解析出 object key: {image_url}")
-            except Exception as e:
-                logger.error(f"解析 S3 URL 時發生錯誤: {e}")
-                logger.warning(f"無法解析 URL: {image_url}, 保留原始 URL")
-        
-        if image_url:
-            logger.info(f"最終使用的圖片URL: {image_url}")
-        else:
-            logger.warning("未找到有效的圖片URL")
-        
-        # Initialize Nova Pro model and RAG retriever
-        logger.info("Initializing Nova Pro model and RAG retriever")
-        retriever, call_multimodal_model = initialize_multimodal_rag_chain()
-        
-        # Find similar cases using RAG
-        logger.info("Finding similar cases using RAG")
-        try:
-            similar_docs = retriever.invoke(formatted_metadata)
-            logger.info(f"Successfully retrieved {len(similar_docs)} similar documents")
-        except Exception as e:
-            logger.error(f"Error retrieving similar documents: {str(e)}")
-            similar_docs = []
-        
-        reference_ids = []
-        
-        for doc in similar_docs:
-            if hasattr(doc, "metadata"):
-                # 優先使用 report_id
-                if "report_id" in doc.metadata:
-                    reference_ids.append(doc.metadata["report_id"])
-                    logger.info(f"Found reference report_id: {doc.metadata['report_id']}")
-                # 如果沒有 report_id，則嘗試使用 id
-                elif "id" in doc.metadata:
-                    reference_ids.append(doc.metadata["id"])
-                    logger.info(f"Found reference id: {doc.metadata['id']}")
-        
-        if reference_ids:
-            logger.info(f"Found {len(reference_ids)} similar cases with reference IDs: {reference_ids}")
-        else:
-            logger.warning("No reference IDs found in similar documents")
-        
-        # Run analysis with Nova Pro
-        logger.info("Running analysis with Nova Pro")
-        solution = None
-        
-        if image_url:
-            logger.info(f"Analyzing image and metadata with Nova Pro: {image_url}")
-            solution = call_multimodal_model(formatted_metadata, image_url)
-            if solution:
-                logger.info(f"Nova Pro analysis completed: {solution[:100]}...")
+                    object_key = None
+            
+            # 如果成功提取了 key，就構建 S3 URI
+            if object_key:
+                image_url = f"s3://{bucket_name}/{object_key}"
+                logger.info(f"將 HTTP URL 轉換為 S3 URI 格式: {image_url}")
             else:
-                logger.warning("Failed to generate solution with Nova Pro, using default values")
-                solution = "無法分析圖片。建議處理方式：請專業工程師進行現場檢查。風險評估：Medium"
+                logger.warning(f"無法從 URL 解析出 object key: {image_url}")
+        except Exception as e:
+            logger.error(f"解析 S3 URL 時發生錯誤: {e}")
+            logger.warning(f"無法解析 URL: {image_url}, 保留原始 URL")
+    
+    if image_url:
+        logger.info(f"最終使用的圖片URL: {image_url}")
+    else:
+        logger.warning("未找到有效的圖片URL")
+    
+    # Initialize Nova Pro model and RAG retriever
+    logger.info("Initializing Nova Pro model and RAG retriever")
+    retriever, call_multimodal_model = initialize_multimodal_rag_chain()
+    
+    # RAG 檢索與 Nova Pro 分析互不依賴（prompt 不使用檢索結果），並行執行，
+    # 各自有逾時；失敗或逾時只影響該分支
+    logger.info("Finding similar cases using RAG and running Nova Pro analysis in parallel")
+    branches = {'retrieval': (retriever.invoke, (formatted_metadata,), RETRIEVAL_TIMEOUT, [])}
+    if image_url:
+        logger.info(f"Analyzing image and metadata with Nova Pro: {image_url}")
+        branches['multimodal'] = (call_multimodal_model, (formatted_metadata, image_url), MULTIMODAL_TIMEOUT, None)
+    outputs, timings = run_parallel(branches)
+    similar_docs = outputs['retrieval']
+    logger.info(f"Retrieved {len(similar_docs)} similar documents")
+    
+    reference_ids = []
+    
+    for doc in similar_docs:
+        if hasattr(doc, "metadata"):
+            # 優先使用 report_id
+            if "report_id" in doc.metadata:
+                reference_ids.append(doc.metadata["report_id"])
+                logger.info(f"Found reference report_id: {doc.metadata['report_id']}")
+            # 如果沒有 report_id，則嘗試使用 id
+            elif "id" in doc.metadata:
+                reference_ids.append(doc.metadata["id"])
+                logger.info(f"Found reference id: {doc.metadata['id']}")
+    
+    if reference_ids:
+        logger.info(f"Found {len(reference_ids)} similar cases with reference IDs: {reference_ids}")
+    else:
+        logger.warning("No reference IDs found in similar documents")
+    
+    # Nova Pro result
+    solution = None
+    
+    if image_url:
+        solution = outputs['multimodal']
+        if solution:
+            logger.info(f"Nova Pro analysis completed: {solution[:100]}...")
         else:
-            logger.warning("No image URL provided, cannot perform analysis")
-            solution = "無圖片提供。建議處理方式：請專業工程師進行現場檢查。風險評估：Medium"
-        
-        # Store in DynamoDB using the raw data and Nova Pro solution
-        logger.info("Storing data in DynamoDB")
-        
-        # Validate and format data
-        formatted_data = validate_and_format_data(raw_data, "", solution)
-        
-        # Add reference IDs to the formatted data
-        if reference_ids:
-            formatted_data['reference_ids'] = reference_ids
-        
-        # Convert numeric values to Decimal for DynamoDB compatibility
-        if 'length' in formatted_data:
-            formatted_data['length'] = Decimal(str(formatted_data['length']))
-        if 'width' in formatted_data:
-            formatted_data['width'] = Decimal(str(formatted_data['width']))
-        
-        # Store in DynamoDB
-        dynamodb = boto3.resource('dynamodb')
-        table = dynamodb.Table(os.environ.get('DYNAMODB_TABLE', 'issues'))
-        table.put_item(Item=formatted_data)
-        
-        logger.info(f"Data successfully stored in DynamoDB with issue_id: {formatted_data['id']}")
-        
-        return {
-            'statusCode': 200,
-            'body': json.dumps({
-                'message': 'Analysis completed and data stored successfully',
-                'issue_id': formatted_data['id'],
-                'reference_ids': reference_ids
-            })
-        }
-    except Exception as e:
-        logger.error(f"Error in lambda_handler: {str(e)}")
-        return {
-            'statusCode': 500,
-            'body': json.dumps({
-                'error': f"Error processing event: {str(e)}"
-            })
-        }
\ No newline at end of file
+            logger.warning("Failed to generate solution with Nova Pro, using default values")
+            solution = "無法分析圖片。建議處理方式：請專業工程師進行現場檢查。風險評估：Medium"
+    else:
+        logger.warning("No image URL provided, cannot perform analysis")
+        solution = "無圖片提供。建議處理方式：請專業工程師進行現場檢查。風險評估：Medium"
+    
+    # Store in DynamoDB using the raw data and Nova Pro solution
+    logger.info("Storing data in DynamoDB")
+    
+    # Validate and format data
+    formatted_data = validate_and_format_data(raw_data, "", solution)
+    
+    # Add reference IDs to the formatted data
+    if reference_ids:
+        formatted_data['reference_ids'] = reference_ids
+    
+    # Convert numeric values to Decimal for DynamoDB compatibility
+    if 'length' in formatted_data:
+        formatted_data['length'] = Decimal(str(formatted_data['length']))
+    if 'width' in formatted_data:
+        formatted_data['width'] = Decimal(str(formatted_data['width']))
+    
+    # Store in DynamoDB
+    table = aws_clients.table(os.environ.get('DYNAMODB_TABLE', 'issues'))
+    table.put_item(Item=formatted_data)
+    
+    logger.info(f"Data successfully stored in DynamoDB with issue_id: {formatted_data['id']}")
+    return {'issue_id': formatted_data['id'], 'reference_ids': reference_ids, 'timings': timings}
+
+
+def lambda_handler(event, context):
+    """
+    When new folder with image & JSON metadata is created in S3, this lambda will be triggered
+    to call Nova Pro model for analyzing concrete cracks and find similar cases using RAG.
+    Every record of the event is processed (s3_batch, bounded concurrency); one bad
+    object does not drop or block the others.
+    Parameters:
+        event: S3 event, or SQS event carrying S3 notifications
+        context: Lambda runtime context
+    Returns:
+        Dict with statusCode, per-record results and batchItemFailures
+    """
+    logger.info(f"Received event: {json.dumps(event)}")
+    results, failures = s3_batch.process_batch(event, process_record)
+    logger.info(f"完成 {len(results)} 筆 record，失敗 {len(failures)} 筆")
+    return s3_batch.response(results, failures)
@@ -3,43 +3,31 @@ import logging
 import os
 import tempfile
 
-import boto3
-from opensearchpy import (
-    AWSV4SignerAuth,
-    OpenSearch,
-    RequestsHttpConnection,
-    helpers,
-)
+from opensearchpy import helpers
+
+import aws_clients
+import s3_batch
 from pdf_utils import chunk, extract_text
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# ==== Initialize external clients ====
-s3 = boto3.client("s3")
-bedrock = boto3.client("bedrock-runtime", region_name=os.getenv("AWS_REGION"))
-
+# ==== External clients (built once per container by aws_clients) ====
 # OpenSearch connection settings
 host = "g9eu5n37g2c5goi6ymzh.us-west-2.aoss.amazonaws.com"
 region = "us-west-2"
 service = "aoss"
-credentials = boto3.Session().get_credentials()
-auth = AWSV4SignerAuth(credentials, region, service)
-
-client = OpenSearch(
-    hosts=[{"host": host, "port": 443}],
-    http_auth=auth,
-    use_ssl=True,
-    verify_certs=True,
-    connection_class=RequestsHttpConnection,
-    pool_maxsize=20,
-)
+
+
+def opensearch_client():
+    return aws_clients.opensearch(host, region, service, pool_maxsize=20)
 
 MODEL_ID = "amazon.titan-embed-text-v2:0"
 INDEX = "vectors"
 
 
 def titan_embed(texts: list[str]) -> list[list[float]]:
+    bedrock = aws_clients.client("bedrock-runtime", os.getenv("AWS_REGION"))
     vectors = []
     for text in texts:
         body = json.dumps({"inputText": text})
@@ -52,6 +40,7 @@ def titan_embed(texts: list[str]) -> list[list[float]]:
 
 
 def upsert(report_id: str, chunks: list[str], vectors: list[list[float]]):
+    client = opensearch_client()
     try:
         # First try bulk insertion
         actions = (
@@ -84,39 +73,45 @@ def upsert(report_id: str, chunks: list[str], vectors: list[list[float]]):
         raise
 
 
-# ==== Lambda handler ====
-def lambda_handler(event, context):
-    logger.info("=== Lambda ingest_pdf triggered ===")
-    rec = event["Records"][0]
-    bucket = rec["s3"]["bucket"]["name"]
-    key = rec["s3"]["object"]["key"]
-
+def process_record(bucket: str, key: str) -> dict:
+    """Extract, embed and index one PDF; raises on failure."""
     logger.info(f"S3 Bucket: {bucket}")
     logger.info(f"S3 Key: {key}")
-    # print(bucket, key)
     report_id = os.path.splitext(os.path.basename(key))[0]
 
-    try:
-        # Ensure the index exists
-        index_exists = client.indices.exists(index=INDEX)
-        if not index_exists:
-            logger.warning(
-                f"Index '{INDEX}' does not exist, you may need to create it first"
-            )
+    # Ensure the index exists
+    index_exists = opensearch_client().indices.exists(index=INDEX)
+    if not index_exists:
+        logger.warning(
+            f"Index '{INDEX}' does not exist, you may need to create it first"
+        )
 
-        # Download the PDF file
-        tmp = tempfile.mktemp(suffix=".pdf")
-        s3.download_file(bucket, key, tmp)
+    # Download the PDF file (unique path per record; removed afterwards so a
+    # warm container's /tmp does not fill up)
+    tmp = tempfile.mktemp(suffix=".pdf")
+    try:
+        aws_clients.client("s3").download_file(bucket, key, tmp)
 
         # Process the PDF
         text = extract_text(tmp)
-        chunks = chunk(text)
-        vectors = titan_embed(chunks)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    chunks = chunk(text)
+    vectors = titan_embed(chunks)
 
-        # Upload to OpenSearch
-        upsert(report_id, chunks, vectors)
-        logger.info("Upserted %s chunks for %s", len(chunks), report_id)
-        return {"ok": True, "chunks": len(chunks)}
-    except Exception as e:
-        logger.error(f"Error processing PDF: {str(e)}")
-        return {"ok": False, "error": str(e)}
+    # Upload to OpenSearch
+    upsert(report_id, chunks, vectors)
+    logger.info("Upserted %s chunks for %s", len(chunks), report_id)
+    return {"report_id": report_id, "chunks": len(chunks)}
+
+
+# ==== Lambda handler ====
+def lambda_handler(event, context):
+    logger.info("=== Lambda ingest_pdf triggered ===")
+    # every record, bounded concurrency, per-record failures (s3_batch)
+    results, failures = s3_batch.process_batch(event, process_record)
+    resp = s3_batch.response(results, failures)
+    resp["ok"] = not failures
+    resp["chunks"] = sum(r["result"]["chunks"] for r in results if r["ok"])
+    return resp
@@ -1,26 +1,81 @@
+import io
+import json
+import os
+import sys
 from unittest.mock import patch, MagicMock
-from lambda_function import lambda_handler
 
+import pytest
 
-@patch("boto3.client")
-def test_lambda_handler(mock_boto_client):
-    mock_s3 = MagicMock()
-    mock_boto_client.return_value = mock_s3
+# shared modules live in src/lambda/common (copied into the image at build time)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+
+import aws_clients  # noqa: E402
+from lambda_function import lambda_handler  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def clean_registry():
+    aws_clients.reset()
+    yield
+    aws_clients.reset()
 
-    mock_s3.download_file.return_value = None
 
-    fake_event = {
+def _clients(s3):
+    bedrock = MagicMock()
+    bedrock.invoke_model.side_effect = lambda **kw: {
+        "body": io.BytesIO(json.dumps({"embedding": [0.1, 0.2]}).encode())
+    }
+    return lambda service, *args, **kwargs: {"s3": s3, "bedrock-runtime": bedrock}[service]
+
+
+def _event(*keys):
+    return {
         "Records": [
             {
                 "s3": {
                     "bucket": {"name": "fake-bucket"},
-                    "object": {"key": "fake-file.pdf"},
+                    "object": {"key": key},
                 }
             }
+            for key in keys
         ]
     }
-    fake_context = None
 
-    result = lambda_handler(fake_event, fake_context)
+
+@patch("lambda_function.extract_text", return_value="crack report " * 50)
+@patch("aws_clients.opensearch")
+@patch("aws_clients.client")
+def test_lambda_handler(mock_client, mock_opensearch, mock_extract):
+    mock_s3 = MagicMock()
+    mock_client.side_effect = _clients(mock_s3)
+    mock_s3.download_file.return_value = None
+
+    result = lambda_handler(_event("fake-file.pdf"), None)
 
     print("✅ Lambda result:", result)
+    mock_opensearch.assert_called()
+    mock_s3.download_file.assert_called_once()
+    assert mock_s3.download_file.call_args[0][:2] == ("fake-bucket", "fake-file.pdf")
+    assert result["ok"] and result["statusCode"] == 200
+    assert result["chunks"] == 1
+    assert result["batchItemFailures"] == []
+
+
+@patch("lambda_function.extract_text", return_value="crack report " * 50)
+@patch("aws_clients.opensearch")
+@patch("aws_clients.client")
+def test_lambda_handler_reports_only_failed_record(mock_client, mock_opensearch, mock_extract):
+    mock_s3 = MagicMock()
+    mock_client.side_effect = _clients(mock_s3)
+
+    def download(bucket, key, path):
+        if key == "broken.pdf":
+            raise RuntimeError("NoSuchKey")
+    mock_s3.download_file.side_effect = download
+
+    result = lambda_handler(_event("good.pdf", "broken.pdf"), None)
+
+    assert result["statusCode"] == 207
+    assert result["batchItemFailures"] == [{"itemIdentifier": "fake-bucket/broken.pdf"}]
+    assert not result["ok"]
+    assert result["chunks"] == 1
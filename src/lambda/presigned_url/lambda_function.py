@@ -1,4 +1,3 @@
-import boto3
 import os
 import logging
 import json
@@ -8,9 +7,18 @@ import time
 import base64
 import re
 
+import aws_clients
+
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# ingest 模式：一次請求取得 N 筆 issue 的圖片 + metadata presigned POST
+MAX_INGEST_BATCH = int(os.environ.get('MAX_INGEST_BATCH', '25'))
+INGEST_EXPIRES = int(os.environ.get('INGEST_EXPIRES', '900'))
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+MAX_METADATA_BYTES = 64 * 1024
+ISSUE_ID_PATTERN = re.compile(r'^[A-Za-z0-9_\-]{1,128}$')
+
 
 def extract_issue_id_from_json(json_data):
     """
@@ -46,7 +54,7 @@ def generate_upload_metadata_url(object_key):
     """
     try:
         content_type='application/json'
-        s3_client = boto3.client('s3')
+        s3_client = aws_clients.client('s3')
         bucket_name = os.environ.get('BUCKET_NAME', 'genai-hackthon-20250426-image-bucket')
         folder_path = f"issue/{object_key}/"
         json_extension = '.json'
@@ -92,7 +100,7 @@ def generate_upload_image_url(object_key):
     """
     try:
         content_type='image/jpg'
-        s3_client = boto3.client('s3')
+        s3_client = aws_clients.client('s3')
         bucket_name = os.environ.get('BUCKET_NAME', 'genai-hackthon-20250426-image-bucket')
         folder_path = f"issue/{object_key}/"
         jpg_extension = '.jpg'
@@ -146,6 +154,68 @@ def generate_upload_image_url(object_key):
             'body': json.dumps({'error': str(e)})
         }
 
+def _presigned_post(s3_client, bucket_name, key, content_type, max_bytes):
+    """
+    Presigned POST target restricted to one key, one content type and a size range.
+    """
+    return s3_client.generate_presigned_post(
+        Bucket=bucket_name,
+        Key=key,
+        Fields={'Content-Type': content_type},
+        Conditions=[
+            {'Content-Type': content_type},
+            ['content-length-range', 1, max_bytes]
+        ],
+        ExpiresIn=INGEST_EXPIRES
+    )
+
+def generate_ingest_targets(issue_ids):
+    """
+    Generate image + metadata presigned POST targets for a batch of issues,
+    so the client uploads both objects straight to S3 and this Lambda never
+    proxies the metadata body.
+
+    Parameters:
+        issue_ids: List of issue IDs (also used as object keys)
+    Returns:
+        Dict containing API Gateway response with one target per issue
+    """
+    headers = {
+        'Content-Type': 'application/json',
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
+    }
+    if not isinstance(issue_ids, list) or not issue_ids:
+        return {'statusCode': 400, 'headers': headers,
+                'body': json.dumps({'error': 'ingest must be a non-empty list of issue ids'})}
+    if len(issue_ids) > MAX_INGEST_BATCH:
+        return {'statusCode': 400, 'headers': headers,
+                'body': json.dumps({'error': f'at most {MAX_INGEST_BATCH} issues per ingest request'})}
+    bad = [i for i in issue_ids if not isinstance(i, str) or not ISSUE_ID_PATTERN.match(i)]
+    if bad:
+        return {'statusCode': 400, 'headers': headers,
+                'body': json.dumps({'error': f'invalid issue ids: {bad[:5]}'})}
+    try:
+        s3_client = aws_clients.client('s3')
+        bucket_name = os.environ.get('BUCKET_NAME', 'genai-hackthon-20250426-image-bucket')
+        targets = []
+        for issue_id in issue_ids:
+            # 與舊流程相同的物件路徑：issue/<id>/<id>.jpg 與 issue/<id>/<id>.json
+            image_key = f"issue/{issue_id}/{issue_id}.jpg"
+            metadata_key = f"issue/{issue_id}/{issue_id}.json"
+            targets.append({
+                'id': issue_id,
+                'image': _presigned_post(s3_client, bucket_name, image_key, 'image/jpg', MAX_IMAGE_BYTES),
+                'metadata': _presigned_post(s3_client, bucket_name, metadata_key, 'application/json', MAX_METADATA_BYTES),
+                's3_url': f"https://{bucket_name}.s3.amazonaws.com/{image_key}"
+            })
+        logger.info(f"Generated ingest targets for {len(targets)} issues")
+        return {'statusCode': 200, 'headers': headers,
+                'body': json.dumps({'targets': targets, 'expires_in': INGEST_EXPIRES})}
+    except Exception as e:
+        logger.error(f"Error generating ingest targets: {e}")
+        return {'statusCode': 500, 'headers': headers, 'body': json.dumps({'error': str(e)})}
+
 def upload_to_s3_via_presigned_url(file_content, presigned_url, content_type='application/json'):
     """
     Upload a file to S3 using a presigned URL.
@@ -199,6 +269,12 @@ def upload_to_s3_via_presigned_url(file_content, presigned_url, content_type='ap
 def lambda_handler(event, context):
     """
     Lambda function entry point.
+
+    POST bodies (application/json):
+        {"object_key": k}        → presigned URL for the issue image
+        {"ingest": [id, ...]}    → image + metadata presigned POST targets for up to
+                                   MAX_INGEST_BATCH issues; both objects then go straight to S3
+        metadata JSON with "id"  → legacy path, proxied to S3 by this Lambda
     
     Parameters:
         event: Dict containing the Lambda function event data
@@ -223,6 +299,10 @@ def lambda_handler(event, context):
                 if 'application/json' in content_type.lower():
                     try:
                         json_body = json.loads(event['body']) if isinstance(event['body'], str) else event['body']
+
+                        # ingest 模式：{"ingest": ["issue_...", ...]} → 圖片與 metadata 的 presigned POST
+                        if 'ingest' in json_body and len(json_body) == 1:
+                            return generate_ingest_targets(json_body['ingest'])
                         
                         if 'object_key' in json_body and len(json_body) == 1:
                             object_key = json_body['object_key']
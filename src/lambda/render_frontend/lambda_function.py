@@ -1,9 +1,10 @@
-import boto3
 import json
 import logging
 import os
 from decimal import Decimal
 
+import aws_clients
+
 # 配置日誌
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
@@ -39,7 +40,7 @@ def retrieve_history_report(issue_id):
     Use issue_id to get 3 history reports from DynamoDB
     """
     try:
-        dynamodb = boto3.resource('dynamodb', region_name='us-west-2')
+        dynamodb = aws_clients.resource('dynamodb', 'us-west-2')
         
         # 從環境變量獲取表名，如果未設置則使用默認值 'issues'
         table_name = os.environ.get('DYNAMODB_TABLE_NAME', 'issues')
@@ -90,9 +91,8 @@ def get_all_issues_direct():
     直接從 DynamoDB 獲取所有 issues，不通過 util Lambda
     """
     try:
-        # 使用 boto3 直接查詢 DynamoDB
-        dynamodb = boto3.resource('dynamodb')
-        table = dynamodb.Table(os.environ.get('DYNAMODB_TABLE_NAME', 'issues'))
+        # 使用 boto3 直接查詢 DynamoDB（容器內共用的 Table）
+        table = aws_clients.table(os.environ.get('DYNAMODB_TABLE_NAME', 'issues'))
         
         # 使用 scan 操作取得所有項目
         response = table.scan()
@@ -138,7 +138,7 @@ def get_all_issues():
     """
     try:
         # 調用 util Lambda 獲取數據
-        lambda_client = boto3.client('lambda')
+        lambda_client = aws_clients.client('lambda')
         logger.info(f"Invoking util Lambda function: {os.environ.get('UTIL_FUNCTION_NAME', 'equipment_utils')}")
         
         response = lambda_client.invoke(
@@ -193,9 +193,8 @@ def get_issue_detail(issue_id):
     """
     try:
         print(f"get_issue_detail: {issue_id}")
-        # 使用 boto3 直接查詢 DynamoDB
-        dynamodb = boto3.resource('dynamodb')
-        table = dynamodb.Table(os.environ.get('DYNAMODB_TABLE_NAME', 'issues'))
+        # 使用 boto3 直接查詢 DynamoDB（容器內共用的 Table）
+        table = aws_clients.table(os.environ.get('DYNAMODB_TABLE_NAME', 'issues'))
         
         response = table.get_item(
             Key={'id': issue_id}
@@ -1,14 +1,15 @@
 import json
-import boto3
 import os
 import logging
 
+import aws_clients
+
 def sns_notification(crack_location, report_id, timestamp):
     """
     This function is for sending notifications by using SNS.
     """
     try:
-        sns_client = boto3.client('sns')
+        sns_client = aws_clients.client('sns')
         topic_arn = os.environ.get('SNS_TOPIC_ARN')
 
         cloudfront_url = os.environ.get('CLOUDFRONT_URL')
@@ -1,9 +1,10 @@
-import boto3
 import json
 import os
 import logging
 from datetime import datetime
 
+import aws_clients
+
 # 配置日誌
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
@@ -24,7 +25,7 @@ def retrieve_all_issues_from_dynamodb():
     try:
         # 初始化 DynamoDB 資源，明確指定區域
         region = os.environ.get('AWS_REGION', 'us-west-2')
-        dynamodb = boto3.resource('dynamodb', region_name=region)
+        dynamodb = aws_clients.resource('dynamodb', region)
         
         # 從環境變量獲取表名，如果未設置則使用默認值 'issues'
         table_name = os.environ.get('DYNAMODB_TABLE_NAME', 'issues')
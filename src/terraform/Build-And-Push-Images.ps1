@@ -16,6 +16,9 @@ $LAMBDA_FUNCTIONS = @(
 )
 $NO_RETRY = $env:NO_RETRY -eq "true"  # 控制是否禁用重試機制的環境變量
 
+# 各 Lambda 共用的模組（src/lambda/common），build 前複製進 build context
+$COMMON_MODULES = @("aws_clients.py", "s3_batch.py", "embedding_cache.py")
+
 # 顯示使用方法
 function Show-Usage {
     Write-Host "用法: $($MyInvocation.MyCommand.Name) [函數名稱]"
@@ -30,6 +33,13 @@ function Show-Usage {
     exit 1
 }
 
+# 刪除複製進 build context 的共用模組
+function Remove-CommonModules {
+    foreach ($module in $COMMON_MODULES) {
+        Remove-Item -Path "./$module" -Force -ErrorAction SilentlyContinue
+    }
+}
+
 # 構建和推送單個函數的 Docker 映像
 function Build-And-Push {
     param (
@@ -59,6 +69,11 @@ function Build-And-Push {
     
     # 備份原始 Dockerfile
     Copy-Item -Path "Dockerfile" -Destination "Dockerfile.bak"
+
+    # 複製共用模組到 build context，完成後刪除
+    foreach ($module in $COMMON_MODULES) {
+        Copy-Item -Path "..\common\$module" -Destination "./$module"
+    }
     
     # 修改基礎映像以確保平台兼容性
     $dockerfileContent = Get-Content -Path "Dockerfile" -Raw
@@ -98,6 +113,7 @@ function Build-And-Push {
         Write-Host "為 $functionName 構建 Docker 映像失敗" -ForegroundColor Red
         # 恢復原始 Dockerfile
         Move-Item -Path "Dockerfile.bak" -Destination "Dockerfile" -Force
+        Remove-CommonModules
         Set-Location -Path $originalDir
         return $false
     }
@@ -117,6 +133,7 @@ function Build-And-Push {
     if (-not $tagSuccess) {
         Write-Host "為 $functionName 標記映像失敗" -ForegroundColor Red
         Move-Item -Path "Dockerfile.bak" -Destination "Dockerfile" -Force
+        Remove-CommonModules
         Set-Location -Path $originalDir
         return $false
     }
@@ -181,6 +198,7 @@ function Build-And-Push {
     
     # 恢復原始 Dockerfile
     Move-Item -Path "Dockerfile.bak" -Destination "Dockerfile" -Force
+    Remove-CommonModules
     
     # 返回到原始目錄
     Set-Location -Path $originalDir
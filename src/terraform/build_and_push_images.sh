@@ -26,6 +26,9 @@ FOLDER_MAPPING["analyze_with_llm"]="llm_issue_handler"
 # 如有更多映射，請按照以下格式添加
 # FOLDER_MAPPING["lambda_function_name"]="local_folder_name"
 
+# 各 Lambda 共用的模組（src/lambda/common），build 前複製進 build context
+COMMON_MODULES=("aws_clients.py" "s3_batch.py" "embedding_cache.py")
+
 NO_RETRY=${NO_RETRY:-false}  # 新增: 控制是否禁用重試機制的環境變量
 
 # 顯示使用方法
@@ -74,6 +77,11 @@ build_and_push() {
   
   # 備份原始 Dockerfile
   cp Dockerfile Dockerfile.bak
+
+  # 複製共用模組到 build context，完成後刪除
+  for module in "${COMMON_MODULES[@]}"; do
+    cp "../common/$module" "./$module"
+  done
   
   # 修改基礎映像以確保平台兼容性
   if grep -q "FROM public.ecr.aws/lambda/python" Dockerfile; then
@@ -100,6 +108,7 @@ build_and_push() {
     echo "為 $function_name 構建 Docker 映像失敗"
     # 恢復原始 Dockerfile
     mv Dockerfile.bak Dockerfile
+    rm -f "${COMMON_MODULES[@]}"
     return 1
   fi
   
@@ -108,6 +117,7 @@ build_and_push() {
   if ! docker tag "$ecr_repo_name:latest" "$ECR_URL/$ecr_repo_name:latest"; then
     echo "為 $function_name 標記映像失敗"
     mv Dockerfile.bak Dockerfile
+    rm -f "${COMMON_MODULES[@]}"
     return 1
   fi
   
@@ -127,6 +137,7 @@ build_and_push() {
     else
       echo "推送 $function_name 失敗"
       mv Dockerfile.bak Dockerfile
+      rm -f "${COMMON_MODULES[@]}"
       return 1
     fi
   else
@@ -162,12 +173,14 @@ build_and_push() {
     if [ "$push_success" = false ]; then
       echo "所有推送嘗試都失敗了，請檢查網絡連接和 AWS 憑證"
       mv Dockerfile.bak Dockerfile
+      rm -f "${COMMON_MODULES[@]}"
       return 1
     fi
   fi
   
   # 恢復原始 Dockerfile
   mv Dockerfile.bak Dockerfile
+  rm -f "${COMMON_MODULES[@]}"
   
   # 返回到原始目錄
   cd - > /dev/null
@@ -30,3 +30,20 @@ resource "aws_dynamodb_table" "reports" {
     projection_type = "ALL"
   }
 }
+
+# RAG 查詢 embedding 快取（llm_issue_handler / embedding_cache.py），舊項目由 TTL 清除
+resource "aws_dynamodb_table" "embedding_cache" {
+  name           = "embedding_cache"
+  billing_mode   = "PAY_PER_REQUEST"
+  hash_key       = "key"
+
+  attribute {
+    name = "key"
+    type = "S"
+  }
+
+  ttl {
+    attribute_name = "expires_at"
+    enabled        = true
+  }
+}
@@ -14,6 +14,7 @@ resource "aws_lambda_function" "llm_issue_handler" {
     variables = {
       OPENSEARCH_ENDPOINT = data.aws_opensearchserverless_collection.existing_collection.collection_endpoint
       # BEDROCK_MODEL_ID = var.bedrock_model_id
+      EMBEDDING_CACHE_TABLE = aws_dynamodb_table.embedding_cache.name
     }
   }
 
@@ -248,6 +249,31 @@ resource "aws_iam_role_policy_attachment" "lambda_bedrock_attachment" {
   policy_arn = aws_iam_policy.lambda_bedrock_access.arn
 }
 
+# for embedding cache
+resource "aws_iam_policy" "lambda_embedding_cache_access" {
+  name        = "lambda_embedding_cache_access"
+  description = "Allow Lambda functions to read and write the embedding cache table"
+
+  policy = jsonencode({
+    Version = "2012-10-17",
+    Statement = [
+      {
+        Effect   = "Allow",
+        Action   = [
+          "dynamodb:GetItem",
+          "dynamodb:PutItem"
+        ],
+        Resource = aws_dynamodb_table.embedding_cache.arn
+      }
+    ]
+  })
+}
+
+resource "aws_iam_role_policy_attachment" "lambda_embedding_cache_attachment" {
+  role       = aws_iam_role.lambda_exec.name
+  policy_arn = aws_iam_policy.lambda_embedding_cache_access.arn
+}
+
 # for invoke lambda
 resource "aws_iam_policy" "lambda_invoke_policy" {
   name        = "lambda_invoke_policy"